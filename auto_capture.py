@@ -1,13 +1,18 @@
 from mss import mss
 from PIL import Image
-import time
+import numpy as np
 import os
+import threading
 from datetime import datetime
 import argparse
 from pathlib import Path
 import json
 from typing import List, Optional
 
+from capture_scheduler import CaptureScheduler
+from frame_ring import DEFAULT_RING_SLOTS, FrameRing
+from roi_bundle import ROI_BUNDLE_SUFFIX, ROI_DISPLAYS, RoiBundle, display_rects
+
 # =========================
 # 設定ロード
 # =========================
@@ -56,10 +61,46 @@ parser.add_argument("--left", type=int, help="Left coordinate for manual capture
 parser.add_argument("--top", type=int, help="Top coordinate for manual capture")
 parser.add_argument("--width", type=int, help="Width of capture region")
 parser.add_argument("--height", type=int, help="Height of capture region")
-parser.add_argument("--interval", type=int, default=60, help="Capture interval in seconds")
+parser.add_argument(
+    "--interval",
+    type=float,
+    default=60,
+    help="Capture interval in seconds (sub-second values allowed)",
+)
+parser.add_argument("--encoder-workers", type=int, default=1, help="Background threads encoding/saving frames")
+parser.add_argument(
+    "--max-pending",
+    type=int,
+    default=4,
+    help="Frames that may wait for an encoder before new frames are dropped",
+)
+parser.add_argument(
+    "--stats-interval",
+    type=float,
+    default=600,
+    help="Seconds between capture statistics reports",
+)
+parser.add_argument(
+    "--shm",
+    nargs="?",
+    const="vital_frames",
+    help="Also publish raw BGR frames to this shared-memory ring for vital_reader.py --shm",
+)
+parser.add_argument("--shm-slots", type=int, default=DEFAULT_RING_SLOTS, help="Number of frames kept in the ring")
+parser.add_argument("--no-save", action="store_true", help="Do not write PNG files (requires --shm)")
+parser.add_argument(
+    "--roi-bundle",
+    nargs="?",
+    const="all",
+    choices=ROI_DISPLAYS,
+    help="Save only the bed ROIs (8-split, 4-split or all) as one .npz per frame instead of a PNG",
+)
 args = parser.parse_args()
 
 config = load_config(args.config)
+shm_name = args.shm or os.getenv("FRAME_SHM") or config.get("FRAME_SHM")
+if args.no_save and not shm_name:
+    parser.error("--no-save requires --shm")
 base_dir = resolve_path(
     args.image_folder,
     "IMAGE_FOLDER",
@@ -69,6 +110,13 @@ base_dir = resolve_path(
 )
 base_dir.mkdir(parents=True, exist_ok=True)
 
+def report_stats(scheduler: CaptureScheduler) -> None:
+    while not scheduler.wait_stopped(args.stats_interval):
+        print(f"📊 {scheduler.summary()}")
+
+
+ring = None
+roi_rects = display_rects(args.roi_bundle) if args.roi_bundle else []
 try:
     with mss() as sct:
         if None not in (args.left, args.top, args.width, args.height):
@@ -105,20 +153,57 @@ try:
                 f"📸 モニター{monitor_number}のスクリーンショット開始（{args.interval}秒おき）"
             )
 
-        while True:
-            date_dir = base_dir / datetime.now().strftime("%Y%m%d")
-            date_dir.mkdir(parents=True, exist_ok=True)
-            timestamp = datetime.now().strftime("%H%M%S")
-            filepath = date_dir / f"{timestamp}.png"
-
-            # スクリーンショット取得・保存
+        def grab():
+            # 撮影スレッドでは取得と共有メモリ配信だけを行う
+            global ring
+            captured_at = datetime.now()
             screenshot = sct.grab(monitor)
-            img = Image.frombytes("RGB", screenshot.size, screenshot.rgb)
-            img.save(filepath)
+            frame = None
+            if shm_name or args.roi_bundle:
+                # mss は BGRA なので α を落とすだけで cv2 と同じ BGR になる
+                frame = np.frombuffer(screenshot.raw, dtype=np.uint8).reshape(
+                    screenshot.height, screenshot.width, 4
+                )[:, :, :3]
+            if shm_name:
+                if ring is None:
+                    ring = FrameRing.create(shm_name, frame.shape, slots=args.shm_slots)
+                    print(f"🧠 共有メモリ {shm_name} にフレームを配信します（{args.shm_slots}枠）")
+                ring.write(frame, timestamp_ns=int(captured_at.timestamp() * 1e9))
+            return captured_at, screenshot, frame
 
-            print(f"✅ 保存完了: {filepath}")
+        def save(item):
+            # エンコードと保存はバックグラウンドのスレッドで行う
+            captured_at, screenshot, frame = item
+            date_dir = base_dir / captured_at.strftime("%Y%m%d")
+            date_dir.mkdir(parents=True, exist_ok=True)
+            # 1秒未満の間隔ではファイル名にミリ秒を付ける
+            stamp = captured_at.strftime("%H%M%S_%f")[:-3] if args.interval < 1 else captured_at.strftime("%H%M%S")
+            if args.roi_bundle:
+                filepath = date_dir / f"{stamp}{ROI_BUNDLE_SUFFIX}"
+                RoiBundle.from_frame(frame, roi_rects, timestamp_ns=int(captured_at.timestamp() * 1e9)).save(filepath)
+            else:
+                filepath = date_dir / f"{stamp}.png"
+                Image.frombytes("RGB", screenshot.size, screenshot.rgb).save(filepath)
+            if args.interval >= 1:
+                print(f"✅ 保存完了: {filepath}")
 
-            time.sleep(args.interval)
+        scheduler = CaptureScheduler(
+            args.interval,
+            grab,
+            None if args.no_save else save,
+            workers=args.encoder_workers,
+            max_pending=args.max_pending,
+        )
+        report = threading.Thread(target=report_stats, args=(scheduler,), daemon=True)
+        report.start()
+        try:
+            scheduler.run()
+        finally:
+            scheduler.close()
+            print(f"📊 {scheduler.summary()}")
 
 except KeyboardInterrupt:
     print("\n🛑 中断されました。終了します。")
+finally:
+    if ring is not None:
+        ring.close()
@@ -0,0 +1,84 @@
+"""Per-row cost of save_vitals_to_csv as the vitals history grows.
+
+Example::
+
+    python benchmarks/bench_csv_append.py --sizes 1000,10000,50000 --appends 50
+
+A CSV with the given number of rows (standard vitals plus a drug column) is
+prepared, then ``--appends`` rows are written with the previous
+read-everything-and-rewrite implementation and with the current append path.
+"""
+import argparse
+import csv
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from vitals_csv import ALL_COLUMNS, NON_PERSISTENT_COLUMNS, save_vitals_to_csv  # noqa: E402
+
+
+def rewrite_save(vitals_dict, csv_path):
+    """Previous implementation: read the whole file and write it back."""
+    row = {k: vitals_dict.get(k, '') for k in ALL_COLUMNS}
+    row["timestamp"] = vitals_dict["timestamp"]
+    with open(csv_path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.DictReader(f)
+        fieldnames = list(reader.fieldnames or [])
+        rows = list(reader)
+    for c in fieldnames:
+        if c not in row and c not in NON_PERSISTENT_COLUMNS and rows:
+            row[c] = rows[-1].get(c, '')
+    tmp_path = f"{csv_path}.tmp"
+    with open(tmp_path, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
+        writer.writerow(row)
+    os.replace(tmp_path, csv_path)
+
+
+def make_csv(path, n):
+    fieldnames = ["timestamp"] + ALL_COLUMNS + ["adrenaline"]
+    with open(path, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        for i in range(n):
+            writer.writerow({"timestamp": f"2024-01-01 {i // 3600 % 24:02d}:{i // 60 % 60:02d}:{i % 60:02d}",
+                             "SBP": 100 + i % 20, "HR": 70 + i % 10, "adrenaline": 0.05})
+
+
+def run(fn, path, appends):
+    t0 = time.perf_counter()
+    for i in range(appends):
+        fn({"timestamp": f"2024-01-02 00:00:{i % 60:02d}", "SBP": 120, "HR": 80}, path)
+    return (time.perf_counter() - t0) / appends
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="1000,10000,50000")
+    ap.add_argument("--appends", type=int, default=50)
+    args = ap.parse_args()
+    tmp = tempfile.mkdtemp()
+    try:
+        for n in (int(s) for s in args.sizes.split(",")):
+            base = os.path.join(tmp, f"base_{n}.csv")
+            make_csv(base, n)
+            results = []
+            for name, fn in (("rewrite", rewrite_save), ("append", save_vitals_to_csv)):
+                path = os.path.join(tmp, f"{name}_{n}.csv")
+                shutil.copy(base, path)
+                results.append((name, run(fn, path, args.appends)))
+            cols = " | ".join(f"{name}: {sec * 1000:8.2f} ms/row" for name, sec in results)
+            print(f"{n:7d} rows  {cols}  (x{results[0][1] / results[1][1]:.0f})")
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+    main()
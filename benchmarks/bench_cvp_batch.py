@@ -0,0 +1,71 @@
+"""Latency of per-crop ``model.predict`` versus the batched CVP path.
+
+For 1, 4 and 8 crops, compares calling ``cvp_model.predict`` once per crop
+(the previous behaviour) with one :func:`vital_reader.predict_cvp_batch` call.
+Crops are taken from ``--image`` (CVP region of every bed, repeated as needed)
+or generated randomly.
+
+Example::
+
+    python benchmarks/bench_cvp_batch.py --cvp-model cvp_model.keras --image 093000.png
+"""
+import argparse
+import contextlib
+import io
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import vital_reader as vr  # noqa: E402
+from bed_coords import BED_COORDS_8  # noqa: E402
+from cvp_runtime import KerasCVPModel  # noqa: E402
+
+
+def timed(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            fn()
+        times.append(time.perf_counter() - t0)
+    return statistics.median(times) * 1000
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--cvp-model", required=True)
+    ap.add_argument("--image", help="Screenshot to take CVP crops from (8-split)")
+    ap.add_argument("--repeat", type=int, default=20)
+    args = ap.parse_args()
+
+    vr.cvp_model = KerasCVPModel(args.cvp_model)
+    if args.image:
+        img = vr.cv2.imread(args.image)
+        base = [vr.crop_image(img, c["CVP_COORDS"]) for c in BED_COORDS_8.values()]
+    else:
+        rng = vr.np.random.default_rng(0)
+        base = [rng.integers(0, 256, size=(33, 35, 3), dtype=vr.np.uint8) for _ in range(4)]
+
+    shape = vr.cvp_model.input_shape
+    for n in (1, 4, 8):
+        crops = [base[i % len(base)] for i in range(n)]
+
+        def per_crop():
+            for c in crops:
+                x = vr.preprocess_cvp_crop(c, shape)[vr.np.newaxis]
+                vr.cvp_model.model.predict(x, verbose=0)
+
+        def batched():
+            vr.predict_cvp_batch(crops)
+
+        batched()  # tf.function のトレースを計測から除く
+        a = timed(per_crop, args.repeat)
+        b = timed(batched, args.repeat)
+        print(f"{n} crops: predict per crop {a:8.2f} ms | batched direct call {b:8.2f} ms | x{a / b:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Cold start, latency and memory of the Keras and ONNX CVP backends.
+
+Each backend runs in a fresh subprocess so that import time and resident
+memory are measured in isolation.  Reports the time to import the runtime and
+load the model, the median latency of a single inference at batch sizes 1 and
+8, and the peak RSS of the process.
+
+Example::
+
+    python benchmarks/bench_cvp_runtime.py --keras cvp_model.keras --onnx cvp_model.onnx
+"""
+import argparse
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+CHILD = r"""
+import json, statistics, sys, time
+t0 = time.perf_counter()
+sys.path.insert(0, sys.argv[1])
+import numpy as np
+from cvp_runtime import load_cvp_model
+model = load_cvp_model(sys.argv[2], sys.argv[3])
+cold = time.perf_counter() - t0
+shape = tuple(d or 1 for d in model.input_shape[1:])
+out = {"cold_start_s": cold}
+for n in (1, 8):
+    x = np.random.default_rng(0).random((n,) + shape, dtype=np.float32)
+    model(x)
+    times = []
+    for _ in range(int(sys.argv[4])):
+        t = time.perf_counter()
+        model(x)
+        times.append(time.perf_counter() - t)
+    out[f"batch{n}_ms"] = statistics.median(times) * 1000
+try:
+    import resource
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    out["peak_rss_mb"] = rss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+except ImportError:
+    import psutil
+    out["peak_rss_mb"] = psutil.Process().memory_info().peak_wset / 2**20
+print(json.dumps(out))
+"""
+
+
+def run(path, backend, repeat):
+    proc = subprocess.run(
+        [sys.executable, "-c", CHILD, str(ROOT), str(path), backend, str(repeat)],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--keras", help="cvp_model.keras")
+    ap.add_argument("--onnx", help="cvp_model.onnx (export_cvp_model.py)")
+    ap.add_argument("--repeat", type=int, default=50)
+    args = ap.parse_args()
+
+    targets = [(b, p) for b, p in (("keras", args.keras), ("onnx", args.onnx)) if p]
+    if not targets:
+        ap.error("--keras と --onnx の少なくとも一方を指定してください")
+    print(f"{'backend':8} {'cold start':>11} {'batch 1':>10} {'batch 8':>10} {'peak RSS':>10}")
+    for backend, path in targets:
+        r = run(path, backend, args.repeat)
+        print(
+            f"{backend:8} {r['cold_start_s']:9.2f} s {r['batch1_ms']:7.2f} ms "
+            f"{r['batch8_ms']:7.2f} ms {r['peak_rss_mb']:7.0f} MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
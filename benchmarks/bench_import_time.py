@@ -0,0 +1,84 @@
+"""Cold-start import time of vital_reader and the entry panels.
+
+Example::
+
+    python benchmarks/bench_import_time.py --repeat 5 --baseline HEAD~1
+
+Every import runs in a fresh interpreter, so each sample is a cold start
+(apart from the OS file cache).  With ``--baseline`` the same modules are
+also imported from a ``git archive`` of that revision, giving before/after
+numbers side by side.  The heavy modules that ended up in ``sys.modules``
+are listed for each import.
+"""
+import argparse
+import io
+import json
+import statistics
+import subprocess
+import sys
+import tarfile
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+MODULES = ["vitals_csv", "gas_panel", "ph_risk_panel", "blood_gas_panel", "vital_reader"]
+HEAVY = ["cv2", "torch", "tensorflow", "onnxruntime", "google.cloud.vision", "PIL.Image", "pandas", "numpy"]
+
+PROBE = """
+import json, sys, time
+t0 = time.perf_counter()
+try:
+    __import__({module!r})
+    error = None
+except Exception as e:
+    error = type(e).__name__
+elapsed = time.perf_counter() - t0
+print(json.dumps({{"seconds": elapsed, "error": error, "heavy": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def measure(root, module, repeat):
+    samples = []
+    info = {}
+    for _ in range(repeat):
+        out = subprocess.run(
+            [sys.executable, "-c", PROBE.format(module=module, heavy=HEAVY)],
+            cwd=root, capture_output=True, text=True,
+        )
+        info = json.loads(out.stdout.strip().splitlines()[-1])
+        samples.append(info["seconds"])
+    return statistics.median(samples), info
+
+
+def checkout(rev, dest):
+    data = subprocess.run(["git", "archive", rev], cwd=ROOT, capture_output=True, check=True).stdout
+    with tarfile.open(fileobj=io.BytesIO(data)) as tar:
+        tar.extractall(dest)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--baseline", help="git revision to compare against (e.g. HEAD~1)")
+    ap.add_argument("--modules", default=",".join(MODULES))
+    args = ap.parse_args()
+    modules = args.modules.split(",")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        roots = [("current", ROOT)]
+        if args.baseline:
+            checkout(args.baseline, tmp)
+            roots.insert(0, (args.baseline, Path(tmp)))
+        results = {name: {m: measure(root, m, args.repeat) for m in modules} for name, root in roots}
+
+    for m in modules:
+        cols = []
+        for name, _ in roots:
+            sec, info = results[name][m]
+            note = info["error"] or ", ".join(info["heavy"]) or "-"
+            cols.append(f"{name}: {sec * 1000:7.0f} ms [{note}]")
+        print(f"{m:16s} " + " | ".join(cols))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Effect of dynamic batching in inference_server.py with several readers.
+
+Example::
+
+    python benchmarks/bench_inference_server.py --readers 8 --frames 50 --overhead-ms 8 --per-item-ms 0.5
+
+A fake model costs ``overhead`` per forward pass plus ``per_item`` per crop,
+which is roughly how a small CNN behaves on the CPU.  Every reader process
+sends one CVP crop per frame; the run is repeated with batching disabled
+(``max_batch=1``) and enabled, and the server metrics are printed.
+"""
+import argparse
+import multiprocessing as mp
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np  # noqa: E402
+
+from inference_server import InferenceClient, InferenceServer  # noqa: E402
+
+
+def reader(address, frames, out):
+    client = InferenceClient(address, deadline=5.0)
+    crop = np.zeros((64, 64, 3), dtype=np.uint8)
+    lat = []
+    for _ in range(frames):
+        t0 = time.perf_counter()
+        client.infer("cvp", [crop])
+        lat.append(time.perf_counter() - t0)
+    out.put(lat)
+
+
+def run(args, max_batch):
+    def model(crops):
+        time.sleep(args.overhead_ms / 1000 + args.per_item_ms / 1000 * len(crops))
+        return [np.zeros(16, dtype=np.float32)] * len(crops)
+
+    address = os.path.join(tempfile.mkdtemp(), "bench.sock")
+    server = InferenceServer({"cvp": model}, address, max_batch=max_batch, max_wait=args.max_wait_ms / 1000, deadline=5.0).start()
+    # サーバーのスレッドが動いているので fork ではなく spawn で起動する
+    ctx = mp.get_context("spawn")
+    out = ctx.Queue()
+    procs = [ctx.Process(target=reader, args=(address, args.frames, out)) for _ in range(args.readers)]
+    t0 = time.perf_counter()
+    for p in procs:
+        p.start()
+    lat = sorted(x for _ in procs for x in out.get())
+    for p in procs:
+        p.join()
+    wall = time.perf_counter() - t0
+    m = server.metrics()["cvp"]
+    server.close()
+    print(
+        f"max_batch={max_batch:3d}: {len(lat) / wall:6.0f} crops/s, latency p50 {lat[len(lat) // 2] * 1000:.1f} / "
+        f"p95 {lat[int(0.95 * len(lat))] * 1000:.1f} ms, batches {m['batches']} (mean {m['batch_mean']:.1f})"
+    )
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--readers", type=int, default=8)
+    ap.add_argument("--frames", type=int, default=50)
+    ap.add_argument("--overhead-ms", type=float, default=8.0)
+    ap.add_argument("--per-item-ms", type=float, default=0.5)
+    ap.add_argument("--max-wait-ms", type=float, default=2.0)
+    args = ap.parse_args()
+    for max_batch in (1, 32):
+        run(args, max_batch)
+
+
+if __name__ == "__main__":
+    main()
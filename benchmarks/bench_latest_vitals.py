@@ -0,0 +1,96 @@
+"""get_latest_vitals on long CSV histories: full read versus incremental tail read.
+
+Example::
+
+    python benchmarks/bench_latest_vitals.py --interval 10 --polls 20
+
+Histories of one and seven days (one row every ``--interval`` seconds, with
+a drug column and occasional blank OCR cells) are generated.  Each poll
+appends one row, as ``vital_reader`` does between two main-loop cycles, and
+then reads the forward-filled latest row with a full read (pandas if it is
+installed, otherwise the csv module) and with ``vitals_csv.LatestVitalsReader``.
+The first, cold call of the incremental reader is reported separately.
+"""
+import argparse
+import csv
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from vitals_csv import ALL_COLUMNS, LatestVitalsReader  # noqa: E402
+
+try:
+    import pandas as pd
+    pd.read_csv  # noqa: B018 - 簡易スタブでないことを確認
+except Exception:
+    pd = None
+
+FIELDNAMES = ["timestamp"] + ALL_COLUMNS + ["adrenaline"]
+T0 = datetime(2024, 5, 1, 0, 0)
+
+
+def make_row(i, interval):
+    row = {"timestamp": (T0 + timedelta(seconds=interval * i)).strftime("%Y-%m-%d %H:%M:%S")}
+    if i % 17:  # たまに OCR が全部空欄になる
+        row.update({k: 60 + (i + j) % 40 for j, k in enumerate(ALL_COLUMNS[:24])})
+    if i % 360 == 0:
+        row["adrenaline"] = 0.05
+    return row
+
+
+def full_read(path):
+    if pd is not None:
+        last = pd.read_csv(path).ffill().iloc[-1]
+        return {k: (None if pd.isna(v) else v) for k, v in last.items()}
+    values = {}
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        for row in csv.DictReader(f):
+            values.update({k: v for k, v in row.items() if v != ""})
+    return values
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--interval", type=float, default=10.0, help="seconds between rows")
+    ap.add_argument("--polls", type=int, default=20)
+    ap.add_argument("--days", default="1,7")
+    args = ap.parse_args()
+    print(f"full read: {'pandas' if pd is not None else 'csv module'}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for days in (int(d) for d in args.days.split(",")):
+            n = int(days * 86400 / args.interval)
+            path = os.path.join(tmp, f"vitals_{days}d.csv")
+            with open(path, "w", newline="", encoding="utf-8-sig") as f:
+                writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
+                writer.writeheader()
+                writer.writerows(make_row(i, args.interval) for i in range(n))
+            size_mb = os.path.getsize(path) / 1e6
+
+            reader = LatestVitalsReader()
+            t0 = time.perf_counter()
+            reader.read(path)
+            cold = time.perf_counter() - t0
+
+            full = tail = 0.0
+            for p in range(args.polls):
+                with open(path, "a", newline="", encoding="utf-8") as f:
+                    csv.DictWriter(f, fieldnames=FIELDNAMES).writerow(make_row(n + p, args.interval))
+                t0 = time.perf_counter()
+                full_read(path)
+                full += time.perf_counter() - t0
+                t0 = time.perf_counter()
+                reader.read(path)
+                tail += time.perf_counter() - t0
+            print(
+                f"{days} day(s), {n} rows, {size_mb:.1f} MB: full {full / args.polls * 1000:8.1f} ms | "
+                f"tail {tail / args.polls * 1000:6.3f} ms (cold {cold * 1000:.0f} ms) | x{full / tail:.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
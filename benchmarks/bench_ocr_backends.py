@@ -0,0 +1,129 @@
+"""Per-field accuracy and latency of the local OCR backend against Vision.
+
+Vision results of the recorded screenshots are used as the reference labels
+and cached in ``--labels`` so reruns do not hit the API again.  Templates are
+fitted on the first ``--train-fraction`` of the frames (or loaded from
+``--templates``) and evaluated on the remaining frames.
+
+Example::
+
+    python benchmarks/bench_ocr_backends.py --folder Z:\\image\\20250101 --display 8 \\
+        --labels labels.json --save-templates ocr_templates.npz
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import vital_reader as vr  # noqa: E402
+from bed_coords import BED_COORDS_8  # noqa: E402
+from bed_coords_4 import BED_COORDS_4  # noqa: E402
+from ocr_backends import TemplateDigitBackend  # noqa: E402
+
+
+def load_frames(folder, table, beds, limit):
+    files = sorted(Path(folder).glob("*.png"))[:limit]
+    for f in files:
+        img = vr.cv2.imread(str(f))
+        if img is None:
+            continue
+        crops = {}
+        for bed in beds:
+            for field, crop in vr.prepare_ocr_crops(img, table[bed]).items():
+                crops[f"{bed}/{field}"] = crop
+        yield f.name, crops
+
+
+def vision_labels(frames, labels_path, args, config):
+    labels = {}
+    if labels_path and Path(labels_path).is_file():
+        labels = json.loads(Path(labels_path).read_text(encoding="utf-8"))
+    vision_ms = []
+    missing = [name for name, _ in frames if name not in labels]
+    if missing:
+        sa = vr.resolve_path(
+            args.service_account_file,
+            "SERVICE_ACCOUNT_FILE",
+            config,
+            "SERVICE_ACCOUNT_FILE",
+            candidates=vr.DEFAULT_SA_JSON_CANDIDATES,
+        )
+        credentials = vr.service_account.Credentials.from_service_account_file(str(sa))
+        vr.client = vr.vision.ImageAnnotatorClient(credentials=credentials)
+        for name, crops in frames:
+            if name in labels:
+                continue
+            t0 = time.perf_counter()
+            labels[name] = vr.ocr_crops(crops, mode="batch")
+            vision_ms.append((time.perf_counter() - t0) * 1000 / max(len(crops), 1))
+        if labels_path:
+            Path(labels_path).write_text(json.dumps(labels, ensure_ascii=False), encoding="utf-8")
+    return labels, vision_ms
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--folder", required=True, help="Folder of recorded screenshots (PNG)")
+    ap.add_argument("--display", choices=["4", "8"], default="8")
+    ap.add_argument("--beds", help="Comma separated bed numbers (default: all)")
+    ap.add_argument("--limit", type=int, default=200, help="Maximum number of frames")
+    ap.add_argument("--labels", help="JSON cache of Vision results")
+    ap.add_argument("--train-fraction", type=float, default=0.5)
+    ap.add_argument("--templates", help="Use existing templates instead of fitting")
+    ap.add_argument("--save-templates", help="Write templates fitted on all frames")
+    ap.add_argument("--service-account-file")
+    ap.add_argument("--config")
+    args = ap.parse_args()
+
+    config = vr.load_config(args.config)
+    table = BED_COORDS_4 if args.display == "4" else BED_COORDS_8
+    beds = [int(b) for b in args.beds.split(",")] if args.beds else list(table)
+    frames = list(load_frames(args.folder, table, beds, args.limit))
+    labels, vision_ms = vision_labels(frames, args.labels, args, config)
+
+    split = int(len(frames) * args.train_fraction)
+    if args.templates:
+        backend = TemplateDigitBackend.load(args.templates)
+        evaluate = frames
+    else:
+        backend = TemplateDigitBackend()
+        backend.fit((crop, labels[name][key]) for name, crops in frames[:split] for key, crop in crops.items())
+        evaluate = frames[split:]
+
+    correct = defaultdict(int)
+    total = defaultdict(int)
+    local_ms = []
+    for name, crops in evaluate:
+        for key, crop in crops.items():
+            field = key.split("/", 1)[1]
+            t0 = time.perf_counter()
+            text = backend.read(crop)
+            local_ms.append((time.perf_counter() - t0) * 1000)
+            total[field] += 1
+            correct[field] += int(text == labels[name][key])
+
+    print(f"frames: {len(frames)}  evaluated: {len(evaluate)}  templates: {len(backend.chars)}")
+    print(f"{'field':>8} {'accuracy':>9} {'n':>5}")
+    for field in sorted(total):
+        print(f"{field:>8} {correct[field] / total[field]:9.3f} {total[field]:5d}")
+    overall = sum(correct.values()) / max(sum(total.values()), 1)
+    print(f"{'overall':>8} {overall:9.3f} {sum(total.values()):5d}")
+    if local_ms:
+        print(f"local  : median {statistics.median(local_ms):.2f} ms/crop")
+    if vision_ms:
+        print(f"vision : median {statistics.median(vision_ms):.2f} ms/crop (batched)")
+
+    if args.save_templates:
+        full = TemplateDigitBackend()
+        full.fit((crop, labels[name][key]) for name, crops in frames for key, crop in crops.items())
+        full.save(args.save_templates)
+        print(f"saved templates: {args.save_templates}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Compare per-frame OCR latency of the per-crop and batched Vision paths.
+
+Example::
+
+    python benchmarks/bench_ocr_batch.py --image Z:\\image\\20250101\\093000.png --display 8
+
+Only the Vision OCR of the numeric fields is timed; the CVP model and the
+spontaneous-breathing detector are not involved.
+"""
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import vital_reader as vr  # noqa: E402
+from bed_coords import BED_COORDS_8  # noqa: E402
+from bed_coords_4 import BED_COORDS_4  # noqa: E402
+
+
+class CountingClient:
+    """Proxy around the Vision client that counts API round trips."""
+
+    def __init__(self, inner):
+        self.inner = inner
+        self.calls = 0
+
+    def text_detection(self, *a, **kw):
+        self.calls += 1
+        return self.inner.text_detection(*a, **kw)
+
+    def batch_annotate_images(self, *a, **kw):
+        self.calls += 1
+        return self.inner.batch_annotate_images(*a, **kw)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--image", required=True, help="Monitor screenshot (PNG)")
+    ap.add_argument("--display", choices=["4", "8"], default="8")
+    ap.add_argument("--beds", help="Comma separated bed numbers (default: all)")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--service-account-file")
+    ap.add_argument("--config")
+    args = ap.parse_args()
+
+    config = vr.load_config(args.config)
+    sa = vr.resolve_path(
+        args.service_account_file,
+        "SERVICE_ACCOUNT_FILE",
+        config,
+        "SERVICE_ACCOUNT_FILE",
+        candidates=vr.DEFAULT_SA_JSON_CANDIDATES,
+    )
+    credentials = vr.service_account.Credentials.from_service_account_file(str(sa))
+    counter = CountingClient(vr.vision.ImageAnnotatorClient(credentials=credentials))
+    vr.client = counter
+
+    table = BED_COORDS_4 if args.display == "4" else BED_COORDS_8
+    beds = [int(b) for b in args.beds.split(",")] if args.beds else list(table)
+    img = vr.cv2.imread(args.image)
+    crops = {}
+    for bed in beds:
+        for field, crop in vr.prepare_ocr_crops(img, table[bed]).items():
+            crops[(bed, field)] = crop
+    print(f"{len(beds)} beds, {len(crops)} crops per frame")
+
+    for mode in vr.OCR_MODES:
+        times = []
+        counter.calls = 0
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            vr.ocr_crops(crops, mode=mode)
+            times.append(time.perf_counter() - t0)
+        print(
+            f"{mode:>7}: median {statistics.median(times) * 1000:8.1f} ms/frame"
+            f"  mean {statistics.mean(times) * 1000:8.1f} ms"
+            f"  round trips/frame {counter.calls / args.repeat:.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
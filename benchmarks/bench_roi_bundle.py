@@ -0,0 +1,71 @@
+"""Full-screen PNG versus ROI bundle: file size, write and read time.
+
+Compares what ``auto_capture.py`` writes per frame today (a full-screen
+PNG) with ``--roi-bundle`` (the bed ROIs only, in one ``.npz``), and what
+``vital_reader`` spends decoding each.
+
+Example::
+
+    python benchmarks/bench_roi_bundle.py --image 093000.png
+"""
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import cv2  # noqa: E402
+import numpy as np  # noqa: E402
+
+from roi_bundle import RoiBundle, display_rects  # noqa: E402
+
+
+def timed(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return statistics.median(times) * 1000
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--image", help="Full-screen screenshot (default: synthetic monitor-like frame)")
+    ap.add_argument("--display", default="all", choices=("8", "4", "all"))
+    ap.add_argument("--repeat", type=int, default=10)
+    args = ap.parse_args()
+
+    if args.image:
+        frame = cv2.imread(args.image)
+    else:
+        # 黒背景に数字が並ぶモニター画面の代用（ノイズのみだと PNG が不利すぎる）
+        frame = np.zeros((1440, 1920, 3), dtype=np.uint8)
+        rng = np.random.default_rng(0)
+        for _ in range(400):
+            x, y = int(rng.integers(0, 1880)), int(rng.integers(20, 1440))
+            cv2.putText(frame, str(rng.integers(0, 200)), (x, y), cv2.FONT_HERSHEY_SIMPLEX, 0.8,
+                        tuple(int(c) for c in rng.integers(80, 256, 3)), 2)
+    rects = display_rects(args.display)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        png = Path(tmp) / "frame.png"
+        npz = Path(tmp) / "frame.npz"
+        w_png = timed(lambda: cv2.imwrite(str(png), frame), args.repeat)
+        w_npz = timed(lambda: RoiBundle.from_frame(frame, rects).save(npz), args.repeat)
+        r_png = timed(lambda: cv2.imread(str(png)), args.repeat)
+        r_npz = timed(lambda: RoiBundle.load(npz).to_frame(), args.repeat)
+        s_png, s_npz = png.stat().st_size, npz.stat().st_size
+
+    print(f"{len(rects)} ROIs ({args.display})")
+    print(f"{'':12} {'size':>10} {'write':>10} {'read':>10}")
+    print(f"{'full PNG':12} {s_png / 1024:7.0f} KB {w_png:7.1f} ms {r_png:7.1f} ms")
+    print(f"{'ROI bundle':12} {s_npz / 1024:7.0f} KB {w_npz:7.1f} ms {r_npz:7.1f} ms")
+    print(f"ratio        x{s_png / s_npz:7.1f}    x{w_png / w_npz:7.1f}    x{r_png / r_npz:7.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Per-pixel loop versus vectorised bright-line heuristic.
+
+Times the fallback used by ``detect_spontaneous_breath`` when the CNN is not
+loaded, on the spontaneous-breathing regions of all beds of an 8-split
+frame, and checks that both implementations reach the same decisions.
+
+Example::
+
+    python benchmarks/bench_spont_fallback.py --image 093000.png
+"""
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import vital_reader as vr  # noqa: E402
+from bed_coords import BED_COORDS_8  # noqa: E402
+
+
+def loop_detected(img, coords_list):
+    """The previous implementation: per-pixel loop over the middle row."""
+    for x, y, w, h in coords_list:
+        crop = img[y:y + h, x:x + w]
+        if crop.size == 0:
+            continue
+        if vr._bright_pixels(crop[h // 2]) >= vr.BRIGHT_WIDTH_RATIO * w:
+            return True
+    return False
+
+
+def timed(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return statistics.median(times) * 1000
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--image", help="Screenshot (8-split); default: random frames")
+    ap.add_argument("--repeat", type=int, default=50)
+    args = ap.parse_args()
+
+    regions = [c["SPONT_BREATH_COORDS"] for c in BED_COORDS_8.values()]
+    if args.image:
+        frames = [vr.cv2.imread(args.image)]
+    else:
+        rng = vr.np.random.default_rng(0)
+        frames = [rng.integers(0, 256, size=(1440, 1920, 3), dtype=vr.np.uint8) for _ in range(4)]
+        for f in frames[::2]:
+            for x, y, w, h in (r[0] for r in regions[:2]):
+                f[y + h // 2, x:x + w] = 255
+
+    for img in frames:
+        for coords in regions:
+            assert loop_detected(img, coords) == vr._bright_line_detected(img, coords)
+    print(f"decisions identical on {len(frames)} frames x {len(regions)} beds")
+
+    img = frames[0]
+    a = timed(lambda: [loop_detected(img, c) for c in regions], args.repeat)
+    b = timed(lambda: [vr._bright_line_detected(img, c) for c in regions], args.repeat)
+    c = timed(lambda: [vr._bright_line_detected(img, r, rows=5, min_votes=3) for r in regions], args.repeat)
+    print(f"{len(regions)} beds: per-pixel loop {a:8.3f} ms | vectorised {b:8.3f} ms | x{a / b:.0f}")
+    print(f"vectorised, 5-row vote {c:8.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Latest-value and trend queries: full CSV read versus vitals_store.VitalsStore.
+
+Example::
+
+    python benchmarks/bench_vitals_store.py --rows 10000,50000 --repeat 20
+
+For each history length a wide CSV and a SQLite store with the same rows
+are built.  The CSV side reads the whole file and forward-fills it, as
+``main_surgery.get_latest_vitals`` (with pandas when it is installed) and
+``check_sbp_trend`` do; the store side uses ``latest`` and
+``check_sbp_trend_store``.  Insert cost per row is printed as well.
+"""
+import argparse
+import csv
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from vitals.sbp_trend import check_sbp_trend, check_sbp_trend_store  # noqa: E402
+from vitals_csv import ALL_COLUMNS  # noqa: E402
+from vitals_store import VitalsStore  # noqa: E402
+
+try:
+    import pandas as pd
+    pd.read_csv  # noqa: B018 - 簡易スタブでないことを確認
+except Exception:
+    pd = None
+
+
+def make_rows(n):
+    t0 = datetime(2024, 5, 1, 8, 0)
+    for i in range(n):
+        row = {"timestamp": (t0 + timedelta(seconds=10 * i)).strftime("%Y-%m-%d %H:%M:%S")}
+        row.update({k: 60 + (i + j) % 40 for j, k in enumerate(ALL_COLUMNS[:20])})
+        if i % 50 == 0:
+            row["adrenaline"] = 0.05
+        yield row
+
+
+def csv_latest(path):
+    if pd is not None:
+        df = pd.read_csv(path).ffill()
+        return df.iloc[-1].to_dict()
+    last = {}
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        for row in csv.DictReader(f):
+            last.update({k: v for k, v in row.items() if v != ""})
+    return last
+
+
+def timed(fn, repeat):
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - t0) / repeat * 1000
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", default="10000,50000")
+    ap.add_argument("--repeat", type=int, default=20)
+    args = ap.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in (int(s) for s in args.rows.split(",")):
+            rows = list(make_rows(n))
+            csv_path = os.path.join(tmp, f"vitals_history_{n}.csv")
+            fieldnames = ["timestamp"] + ALL_COLUMNS + ["adrenaline"]
+            with open(csv_path, "w", newline="", encoding="utf-8-sig") as f:
+                writer = csv.DictWriter(f, fieldnames=fieldnames)
+                writer.writeheader()
+                writer.writerows(rows)
+
+            store = VitalsStore(os.path.join(tmp, f"vitals_{n}.db"))
+            t0 = time.perf_counter()
+            for row in rows:
+                store.insert(2, row)
+            insert_ms = (time.perf_counter() - t0) / n * 1000
+
+            results = [
+                ("latest csv", timed(lambda: csv_latest(csv_path), max(1, args.repeat // 10))),
+                ("latest db", timed(lambda: store.latest(2), args.repeat)),
+                ("trend csv", timed(lambda: check_sbp_trend(csv_path), max(1, args.repeat // 10))),
+                ("trend db", timed(lambda: check_sbp_trend_store(store, 2), args.repeat)),
+            ]
+            store.close()
+            cols = " | ".join(f"{name} {ms:8.2f} ms" for name, ms in results)
+            print(f"{n:6d} rows  insert {insert_ms:.2f} ms/row | {cols}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Panel auto-logging: synchronous CSV writes versus the group-commit queue.
+
+Example::
+
+    python benchmarks/bench_write_queue.py --rows 20000 --events 200
+
+A history of ``--rows`` vital rows is generated.  ``--events`` drug-panel
+log entries (each introducing a new drug column every tenth entry) and gas
+panel rows are then written, first synchronously as the panels do without a
+queue, then through :class:`vitals_write_queue.VitalsWriteQueue`.  The time
+spent on the calling (Tk) thread per entry is reported, together with the
+queue's commit count and commit latency.
+"""
+import argparse
+import csv
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import drug_panel  # noqa: E402
+from vitals_csv import ALL_COLUMNS, save_vitals_to_csv  # noqa: E402
+from vitals_write_queue import VitalsWriteQueue  # noqa: E402
+
+T0 = datetime(2024, 5, 1, 0, 0)
+
+
+def make_history(path, rows):
+    with open(path, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.DictWriter(f, fieldnames=["timestamp"] + ALL_COLUMNS)
+        writer.writeheader()
+        for i in range(rows):
+            ts = (T0 + timedelta(seconds=10 * i)).strftime("%Y-%m-%d %H:%M:%S")
+            writer.writerow({"timestamp": ts, **{k: 60 + (i + j) % 40 for j, k in enumerate(ALL_COLUMNS[:24])}})
+
+
+def log_events(path, events, write_queue):
+    panel = drug_panel.DrugPanel.__new__(drug_panel.DrugPanel)
+    panel.csv_path = Path(path)
+    panel.write_queue = write_queue
+    start = T0 + timedelta(days=3)
+    spent = []
+    for i in range(events):
+        t0 = time.perf_counter()
+        if i % 2:
+            panel._append_to_csv(start + timedelta(seconds=i), {f"drug{i // 20}": 0.05})
+        else:
+            save_vitals_to_csv({"timestamp": str(start + timedelta(seconds=i)), "pH": 7.35}, path, write_queue=write_queue)
+        spent.append(time.perf_counter() - t0)
+    return sorted(spent)
+
+
+def report(name, spent):
+    p50 = spent[len(spent) // 2] * 1000
+    p95 = spent[int(len(spent) * 0.95)] * 1000
+    print(f"{name:<6} per entry on caller thread: p50 {p50:8.3f} ms | p95 {p95:8.3f} ms | total {sum(spent):6.2f} s")
+    return p95
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=20000)
+    ap.add_argument("--events", type=int, default=200)
+    ap.add_argument("--window", type=float, default=0.05)
+    args = ap.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        sync_path = os.path.join(tmp, "sync.csv")
+        make_history(sync_path, args.rows)
+        sync_p95 = report("sync", log_events(sync_path, args.events, None))
+
+        queued_path = os.path.join(tmp, "queued.csv")
+        make_history(queued_path, args.rows)
+        write_queue = VitalsWriteQueue(window=args.window)
+        queued_p95 = report("queue", log_events(queued_path, args.events, write_queue))
+        write_queue.close()
+        print(f"queue  {write_queue.summary()}")
+        print(f"p95 x{sync_p95 / queued_p95:.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,7 +9,8 @@ from datetime import datetime
 from pathlib import Path
 
 import bga_protocol
-from vital_reader import save_vitals_to_csv
+from vitals_csv import save_vitals_to_csv
+from vitals_write_queue import VitalsWriteQueue, WriteQueueMixin
 
 try:  # pragma: no cover - optional dependency
     from openpyxl import Workbook
@@ -34,15 +35,22 @@ COLUMNS = [
 ]
 
 
-class BloodGasPanel(tk.Frame):
+class BloodGasPanel(WriteQueueMixin, tk.Frame):
     """血液ガス分析値の入力パネル"""
 
-    def __init__(self, master: tk.Misc, csv_path: Optional[str] = None, **kwargs) -> None:
+    def __init__(
+        self,
+        master: tk.Misc,
+        csv_path: Optional[str] = None,
+        write_queue: Optional[VitalsWriteQueue] = None,
+        **kwargs,
+    ) -> None:
         super().__init__(master, **kwargs)
         self.vars: Dict[str, tk.DoubleVar] = {}
         # 採血記録: key="YYYY-mm-dd HH:MM"
         self.history: Dict[str, Dict[str, float]] = {}
         self.csv_path = Path(csv_path) if csv_path else None
+        self.write_queue = write_queue
         self._build_ui()
         self._select_now()
 
@@ -125,7 +133,7 @@ class BloodGasPanel(tk.Frame):
                 "BE": current.get("abe"),
                 "Alb": current.get("alb"),
             }
-            save_vitals_to_csv(csv_vals, str(self.csv_path))
+            save_vitals_to_csv(csv_vals, str(self.csv_path), write_queue=self.write_queue)
 
     def _export_excel_auto(self) -> None:
         if Workbook is None:
@@ -173,9 +181,10 @@ def run_blood_gas_panel(topmost: bool = False, csv_path: Optional[str] = None) -
             root.attributes("-topmost", True)
         except Exception:
             pass
-    panel = BloodGasPanel(root, csv_path=csv_path)
-    panel.pack(fill="both", expand=True)
-    root.mainloop()
+    with VitalsWriteQueue() as write_queue:
+        panel = BloodGasPanel(root, csv_path=csv_path, write_queue=write_queue)
+        panel.pack(fill="both", expand=True)
+        root.mainloop()
 
 
 def launch_blood_gas_panel(topmost: bool = False, csv_path: Optional[str] = None):
@@ -0,0 +1,164 @@
+"""Drift-free capture loop with background encoding for ``auto_capture.py``.
+
+Grabbing, encoding and saving a frame and then sleeping for ``interval``
+makes the period ``interval + encode time``, so captures drift through the
+day.  :class:`CaptureScheduler` fires at absolute deadlines
+``t0 + k * interval`` and hands each grabbed frame to encoder threads, so a
+slow PNG encode or network write never delays the next grab.
+
+Deadlines that are missed entirely (the grab itself took longer than an
+interval, or the machine stalled) are skipped rather than caught up with a
+burst of frames.  Frames that arrive while every encoder is busy and the
+queue is full are dropped.  Both are counted, together with the capture
+jitter (how late each grab started relative to its deadline).
+"""
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Optional
+
+
+class CaptureScheduler:
+    """Call ``capture()`` every ``interval`` seconds and ``handle(item)`` in the background.
+
+    Parameters
+    ----------
+    interval : float
+        Period in seconds; sub-second values are supported.
+    capture : callable
+        Grabs one frame and returns an item for ``handle``.  Runs in the
+        scheduling thread, so it should be quick.
+    handle : callable, optional
+        Encodes/saves an item; runs on ``workers`` background threads.
+    workers : int, default 1
+        Number of encoder threads.
+    max_pending : int, default 4
+        Frames allowed to wait for an encoder before new frames are dropped.
+    """
+
+    def __init__(
+        self,
+        interval: float,
+        capture: Callable[[], Any],
+        handle: Optional[Callable[[Any], None]] = None,
+        workers: int = 1,
+        max_pending: int = 4,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if interval <= 0:
+            raise ValueError("interval must be > 0")
+        self.interval = float(interval)
+        self.capture = capture
+        self.handle = handle
+        self.clock = clock
+        self.frames = 0
+        self.missed = 0
+        self.dropped = 0
+        self.errors = 0
+        self.encoded = 0
+        self.jitter = deque(maxlen=10_000)
+        self.encode_times = deque(maxlen=10_000)
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_pending)
+        self._workers = [
+            threading.Thread(target=self._encode_loop, name=f"encoder-{i}", daemon=True)
+            for i in range(workers if handle is not None else 0)
+        ]
+        for t in self._workers:
+            t.start()
+
+    # ---- スケジューリング ----
+    def run(self, max_frames: Optional[int] = None) -> None:
+        """Capture until :meth:`stop` is called or ``max_frames`` frames were taken."""
+        t0 = self.clock()
+        k = 0
+        while not self._stop.is_set():
+            if max_frames is not None and self.frames >= max_frames:
+                break
+            deadline = t0 + k * self.interval
+            wait = deadline - self.clock()
+            if wait > 0 and self._stop.wait(wait):
+                break
+            late = self.clock() - deadline
+            if late >= self.interval:
+                # 丸ごと逃した周期は追いかけずに飛ばす
+                skipped = int(late // self.interval)
+                self.missed += skipped
+                k += skipped
+                late -= skipped * self.interval
+            self.jitter.append(late)
+            item = self.capture()
+            self.frames += 1
+            k += 1
+            if self.handle is not None:
+                try:
+                    self._queue.put_nowait(item)
+                except queue.Full:
+                    self.dropped += 1
+                    print("[WARN] エンコードが追いつかないためフレームを破棄しました")
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def wait_stopped(self, timeout: Optional[float] = None) -> bool:
+        """Block until :meth:`stop` is called or ``timeout`` expires."""
+        return self._stop.wait(timeout)
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """Stop capturing and wait for queued frames to be encoded."""
+        self.stop()
+        for _ in self._workers:
+            self._queue.put(None)
+        for t in self._workers:
+            t.join(timeout)
+
+    # ---- エンコード ----
+    def _encode_loop(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            t0 = time.perf_counter()
+            try:
+                self.handle(item)
+            except Exception as e:
+                with self._lock:
+                    self.errors += 1
+                print(f"[WARN] 保存失敗: {e}")
+                continue
+            with self._lock:
+                self.encoded += 1
+                self.encode_times.append(time.perf_counter() - t0)
+
+    # ---- 統計 ----
+    def stats(self) -> Dict[str, float]:
+        jitter = sorted(self.jitter)
+        enc = sorted(self.encode_times)
+
+        def pct(values, q):
+            return values[min(len(values) - 1, int(q * len(values)))] * 1000 if values else 0.0
+
+        return {
+            "frames": self.frames,
+            "missed": self.missed,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "encoded": self.encoded,
+            "jitter_p50_ms": pct(jitter, 0.5),
+            "jitter_p95_ms": pct(jitter, 0.95),
+            "jitter_max_ms": jitter[-1] * 1000 if jitter else 0.0,
+            "encode_p50_ms": pct(enc, 0.5),
+            "encode_p95_ms": pct(enc, 0.95),
+        }
+
+    def summary(self) -> str:
+        st = self.stats()
+        return (
+            f"frames {st['frames']}, missed {st['missed']}, dropped {st['dropped']}, "
+            f"jitter p50 {st['jitter_p50_ms']:.1f} / p95 {st['jitter_p95_ms']:.1f} / "
+            f"max {st['jitter_max_ms']:.1f} ms, encode p50 {st['encode_p50_ms']:.0f} ms"
+        )
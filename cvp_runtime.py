@@ -0,0 +1,80 @@
+"""Inference backends for the CVP digit classifier.
+
+``vital_reader`` only needs a callable that maps a ``(N, H, W, C)`` float32
+batch to class probabilities and exposes ``input_shape``.  Two backends
+provide that:
+
+* :class:`KerasCVPModel` loads ``cvp_model.keras`` with TensorFlow.
+* :class:`OnnxCVPModel` runs the model exported by ``export_cvp_model.py``
+  with ONNX Runtime, which starts much faster and needs far less memory than
+  TensorFlow.
+
+TensorFlow and ONNX Runtime are imported only when the corresponding backend
+is loaded.
+"""
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Optional, Union
+
+try:  # pragma: no cover - optional dependency
+    import numpy as np  # type: ignore
+except Exception:  # pragma: no cover
+    np = None
+
+CVP_BACKENDS = ("auto", "keras", "onnx")
+
+
+class KerasCVPModel:
+    """CVP model loaded with ``tf.keras``, called through a cached ``tf.function``."""
+
+    backend = "keras"
+
+    def __init__(self, path: Union[str, Path]) -> None:
+        import tensorflow as tf  # type: ignore
+
+        self._tf = tf
+        self.model = tf.keras.models.load_model(str(path))
+        self.input_shape = tuple(self.model.input_shape)
+        model = self.model
+        self._infer = tf.function(lambda x: model(x, training=False), reduce_retracing=True)
+
+    def __call__(self, batch):
+        x = self._tf.convert_to_tensor(batch, dtype=self._tf.float32)
+        return np.asarray(self._infer(x))
+
+
+class OnnxCVPModel:
+    """CVP model exported to ONNX and run with ONNX Runtime on the CPU."""
+
+    backend = "onnx"
+
+    def __init__(self, path: Union[str, Path], threads: Optional[int] = None) -> None:
+        import onnxruntime as ort  # type: ignore
+
+        opts = ort.SessionOptions()
+        if threads:
+            opts.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(str(path), sess_options=opts, providers=["CPUExecutionProvider"])
+        inp = self.session.get_inputs()[0]
+        self.input_name = inp.name
+        # 可変次元（バッチ等）は文字列やNoneで返るので None に揃える
+        self.input_shape = tuple(d if isinstance(d, int) else None for d in inp.shape)
+
+    def __call__(self, batch):
+        x = np.ascontiguousarray(batch, dtype=np.float32)
+        return self.session.run(None, {self.input_name: x})[0]
+
+
+def load_cvp_model(path: Union[str, Path], backend: str = "auto", threads: Optional[int] = None):
+    """Load the CVP model at ``path`` with ``backend``.
+
+    ``"auto"`` picks ONNX Runtime for ``.onnx`` files and Keras otherwise.
+    """
+    if backend not in CVP_BACKENDS:
+        raise ValueError(f"unknown CVP backend: {backend}")
+    if backend == "auto":
+        backend = "onnx" if Path(path).suffix.lower() == ".onnx" else "keras"
+    if backend == "onnx":
+        return OnnxCVPModel(path, threads=threads)
+    return KerasCVPModel(path)
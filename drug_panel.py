@@ -6,9 +6,14 @@ from tkinter import ttk, messagebox, filedialog
 from dataclasses import dataclass
 from typing import Callable, Dict, List, Optional
 import csv
+import os
 from datetime import datetime, timedelta
 from pathlib import Path
 
+from vitals_csv import csv_write_lock
+from vitals_store import mirror_row
+from vitals_write_queue import VitalsWriteQueue, WriteQueueMixin
+
 
 @dataclass
 class DrugConfig:
@@ -33,7 +38,7 @@ DEFAULT_DRUGS: List[DrugConfig] = [
     DrugConfig("furosemide_civ", "フロセミドCIV",   "mg/kg/h",   0.0, 1.0, 0.005, 0.0),
 ]
 
-class DrugPanel(tk.Frame):
+class DrugPanel(WriteQueueMixin, tk.Frame):
     """
     薬剤入力用の右サイドパネル。
     - 上部に現在値サマリーを常時表示
@@ -51,6 +56,7 @@ class DrugPanel(tk.Frame):
         topmost: bool = False,
         csv_path: Optional[str] = None,
         auto_log_interval: Optional[int] = 60,
+        write_queue: Optional[VitalsWriteQueue] = None,
         **kwargs
     ) -> None:
         super().__init__(master, **kwargs)
@@ -65,6 +71,7 @@ class DrugPanel(tk.Frame):
         # フロセミド投与記録
         self.furosemide_log: List[tuple[datetime, float]] = []
         self.auto_log_interval = auto_log_interval
+        self.write_queue = write_queue
 
         self._build_ui()
         self._select_now()
@@ -289,35 +296,42 @@ class DrugPanel(tk.Frame):
 
         既存 CSV に新しい列が必要な場合はヘッダーを更新して全体を書き戻す。
         それ以外は追記モードで 1 行だけ追加する。
+        ``write_queue`` があればキューに積むだけで戻る。
         """
         if not self.csv_path:
             return
         row = {"timestamp": ts.strftime("%Y-%m-%d %H:%M:%S")}
         row.update(vals)
+        if self._queue_row(row, carry_forward=False):
+            return
         try:
-            if self.csv_path.exists():
-                with open(self.csv_path, "r", newline="", encoding="utf-8-sig") as f:
-                    reader = csv.DictReader(f)
-                    fieldnames = list(reader.fieldnames or [])
-                    rows = list(reader)
-                missing = [k for k in row.keys() if k not in fieldnames]
-                if missing:
-                    fieldnames.extend(missing)
-                    rows.append(row)
+            with csv_write_lock(self.csv_path):
+                if self.csv_path.exists():
+                    with open(self.csv_path, "r", newline="", encoding="utf-8-sig") as f:
+                        reader = csv.DictReader(f)
+                        fieldnames = list(reader.fieldnames or [])
+                        rows = list(reader)
+                    missing = [k for k in row.keys() if k not in fieldnames]
+                    if missing:
+                        fieldnames.extend(missing)
+                        rows.append(row)
+                        tmp_path = f"{self.csv_path}.tmp"
+                        with open(tmp_path, "w", newline="", encoding="utf-8-sig") as f:
+                            writer = csv.DictWriter(f, fieldnames=fieldnames)
+                            writer.writeheader()
+                            writer.writerows(rows)
+                        os.replace(tmp_path, self.csv_path)
+                    else:
+                        with open(self.csv_path, "a", newline="", encoding="utf-8-sig") as f:
+                            writer = csv.DictWriter(f, fieldnames=fieldnames)
+                            writer.writerow(row)
+                else:
+                    fieldnames = list(row.keys())
                     with open(self.csv_path, "w", newline="", encoding="utf-8-sig") as f:
                         writer = csv.DictWriter(f, fieldnames=fieldnames)
                         writer.writeheader()
-                        writer.writerows(rows)
-                else:
-                    with open(self.csv_path, "a", newline="", encoding="utf-8-sig") as f:
-                        writer = csv.DictWriter(f, fieldnames=fieldnames)
                         writer.writerow(row)
-            else:
-                fieldnames = list(row.keys())
-                with open(self.csv_path, "w", newline="", encoding="utf-8-sig") as f:
-                    writer = csv.DictWriter(f, fieldnames=fieldnames)
-                    writer.writeheader()
-                    writer.writerow(row)
+            mirror_row(self.csv_path, row)
         except Exception as e:
             print(f"[WARN] CSV書き込み失敗: {e}")
 
@@ -478,15 +492,17 @@ def run_drug_panel(
     root = tk.Tk()
     root.title("DrugPanel")
     root.geometry("560x460")
-    panel = DrugPanel(
-        root,
-        drugs=DEFAULT_DRUGS,
-        topmost=topmost,
-        csv_path=csv_path,
-        auto_log_interval=auto_log_interval,
-    )
-    panel.pack(side="right", fill="both", expand=True)
-    root.mainloop()
+    with VitalsWriteQueue() as write_queue:
+        panel = DrugPanel(
+            root,
+            drugs=DEFAULT_DRUGS,
+            topmost=topmost,
+            csv_path=csv_path,
+            auto_log_interval=auto_log_interval,
+            write_queue=write_queue,
+        )
+        panel.pack(side="right", fill="both", expand=True)
+        root.mainloop()
 
 
 def launch_drug_panel(
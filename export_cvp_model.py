@@ -0,0 +1,81 @@
+"""Export ``cvp_model.keras`` to ONNX for the lightweight CVP backend.
+
+``vital_reader`` loads ``.onnx`` models with ONNX Runtime (see
+:mod:`cvp_runtime`), which avoids importing TensorFlow at start-up.  After
+exporting, the labels of both models are compared on sample crops.
+
+Example::
+
+    python export_cvp_model.py cvp_model.keras cvp_model.onnx --samples C:\\path\\to\\CVP
+"""
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+from cvp_runtime import KerasCVPModel, OnnxCVPModel
+
+
+def export_onnx(keras_path, onnx_path, opset=13):
+    """Convert the Keras model at ``keras_path`` and write ``onnx_path``."""
+    import tensorflow as tf
+    import tf2onnx
+
+    model = tf.keras.models.load_model(str(keras_path))
+    spec = (tf.TensorSpec((None,) + tuple(model.input_shape[1:]), tf.float32, name="input"),)
+    tf2onnx.convert.from_keras(model, input_signature=spec, opset=opset, output_path=str(onnx_path))
+    return Path(onnx_path)
+
+
+def load_sample_crops(samples_dir=None, n_random=32):
+    """Return BGR crops from ``samples_dir`` (recursively) or random crops."""
+    if samples_dir:
+        import cv2
+
+        files = sorted(
+            p for p in Path(samples_dir).rglob("*") if p.suffix.lower() in (".png", ".jpg", ".jpeg")
+        )
+        crops = [cv2.imread(str(p)) for p in files]
+        return [c for c in crops if c is not None]
+    rng = np.random.default_rng(0)
+    return [rng.integers(0, 256, size=(33, 35, 3), dtype=np.uint8) for _ in range(n_random)]
+
+
+def check_parity(keras_model, onnx_model, crops, batch_size=32):
+    """Return ``(n_same_label, n_total, max_abs_prob_diff)`` over ``crops``."""
+    from vital_reader import preprocess_cvp_crop
+
+    same = 0
+    max_diff = 0.0
+    for start in range(0, len(crops), batch_size):
+        chunk = crops[start:start + batch_size]
+        x = np.stack([preprocess_cvp_crop(c, keras_model.input_shape) for c in chunk])
+        pk = np.asarray(keras_model(x))
+        po = np.asarray(onnx_model(x))
+        same += int((pk.argmax(axis=1) == po.argmax(axis=1)).sum())
+        max_diff = max(max_diff, float(np.abs(pk - po).max()))
+    return same, len(crops), max_diff
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("keras_model", help="Input model (.keras)")
+    ap.add_argument("onnx_model", nargs="?", help="Output path (default: same name with .onnx)")
+    ap.add_argument("--opset", type=int, default=13)
+    ap.add_argument("--samples", help="Folder of CVP crops for the parity check (default: random crops)")
+    args = ap.parse_args()
+
+    onnx_path = Path(args.onnx_model or Path(args.keras_model).with_suffix(".onnx"))
+    export_onnx(args.keras_model, onnx_path, opset=args.opset)
+    print(f"✅ ONNX出力完了: {onnx_path}")
+
+    same, total, max_diff = check_parity(
+        KerasCVPModel(args.keras_model), OnnxCVPModel(onnx_path), load_sample_crops(args.samples)
+    )
+    print(f"ラベル一致: {same}/{total}  確率の最大差: {max_diff:.2e}")
+    if same != total:
+        raise SystemExit("⚠️ Keras と ONNX の予測ラベルが一致しません")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,7 +7,12 @@ from datetime import datetime, timedelta
 from typing import Dict, Any, Optional
 from pathlib import Path
 import csv
+import os
 import pandas as pd
+
+from vitals_csv import csv_write_lock
+from vitals_store import mirror_row
+from vitals_write_queue import VitalsWriteQueue, WriteQueueMixin
 try:
     from openpyxl import Workbook
 except Exception:  # pragma: no cover - gracefully degrade if not available
@@ -27,7 +32,7 @@ COLUMNS = [
 def _hour_floor(dt: datetime) -> datetime:
     return dt.replace(minute=0, second=0, microsecond=0)
 
-class FluidPanel(tk.Frame):
+class FluidPanel(WriteQueueMixin, tk.Frame):
     """
     1時間ごとの水分管理パネル
     - 時刻は「時単位」で管理（YYYY-mm-dd HH:00）
@@ -35,10 +40,18 @@ class FluidPanel(tk.Frame):
     - 上部にサマリー（現在時刻の値＋直近24h合計・バランス）を常時表示
     - CSV 読み書き対応
     """
-    def __init__(self, master: tk.Misc, topmost: bool = False, csv_path: Optional[str] = None, **kwargs) -> None:
+    def __init__(
+        self,
+        master: tk.Misc,
+        topmost: bool = False,
+        csv_path: Optional[str] = None,
+        write_queue: Optional[VitalsWriteQueue] = None,
+        **kwargs,
+    ) -> None:
         super().__init__(master, **kwargs)
         self.hourly: Dict[str, Dict[str, float]] = {}  # key: "YYYY-mm-dd HH:00"
         self.csv_path = Path(csv_path) if csv_path else None
+        self.write_queue = write_queue
         self._build_ui()
         if topmost:
             try:
@@ -165,13 +178,20 @@ class FluidPanel(tk.Frame):
             return
         row = {"timestamp": f"{hour_key}:00"}
         row.update(rec)
+        if self._queue_row(row, carry_forward=False):
+            return
         try:
-            if self.csv_path.exists():
-                df = pd.read_csv(self.csv_path)
-                df = pd.concat([df, pd.DataFrame([row])], ignore_index=True, sort=False)
-            else:
-                df = pd.DataFrame([row])
-            df.to_csv(self.csv_path, index=False)
+            with csv_write_lock(self.csv_path):
+                if self.csv_path.exists():
+                    df = pd.read_csv(self.csv_path)
+                    df = pd.concat([df, pd.DataFrame([row])], ignore_index=True, sort=False)
+                else:
+                    df = pd.DataFrame([row])
+                # 読み手が書きかけのファイルを見ないよう一時ファイルから置き換える
+                tmp_path = f"{self.csv_path}.tmp"
+                df.to_csv(tmp_path, index=False)
+                os.replace(tmp_path, self.csv_path)
+            mirror_row(self.csv_path, row)
         except Exception:
             pass
 
@@ -348,9 +368,10 @@ def run_fluid_panel(topmost: bool = False, csv_path: Optional[str] = None) -> No
     root = tk.Tk()
     root.title("FluidPanel")
     root.geometry("860x560")
-    panel = FluidPanel(root, topmost=topmost, csv_path=csv_path)
-    panel.pack(fill="both", expand=True)
-    root.mainloop()
+    with VitalsWriteQueue() as write_queue:
+        panel = FluidPanel(root, topmost=topmost, csv_path=csv_path, write_queue=write_queue)
+        panel.pack(fill="both", expand=True)
+        root.mainloop()
 
 def launch_fluid_panel(topmost: bool = False, csv_path: Optional[str] = None):
     """Launch ``FluidPanel`` without blocking the caller.
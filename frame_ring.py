@@ -0,0 +1,309 @@
+"""Shared-memory frame handoff from ``auto_capture.py`` to ``vital_reader``.
+
+Writing every grab as PNG (often to a network drive) and decoding it again
+in ``vital_reader`` puts an encode, a disk round trip and a decode on the
+latency path.  :class:`FrameRing` instead keeps the last few raw BGR frames
+in a :mod:`multiprocessing.shared_memory` block that readers crop from
+directly.
+
+Layout of the block::
+
+    header   int64[8]       magic, slots, height, width, channels, latest seq,
+                            writer generation
+    slots    int64[slots,3] version, seq, capture time (ns since the epoch)
+    data     uint8[slots, height, width, channels]
+
+Each slot is protected by a seqlock: the writer makes ``version`` odd while
+it copies a frame and even again when done, then publishes the frame's
+sequence number in the header.  Readers copy what they need out of a frame
+and check afterwards with :meth:`FrameRing.is_intact` that the slot has not
+been rewritten in the meantime.
+
+Every writer stamps the header with a new generation, and sets the
+generation of a ring it replaces or closes to 0.  A reader still mapping
+the old block (on POSIX the name may already point to a new one) notices
+the change and :class:`RingFrameSource` attaches again.  On Windows a block
+lives as long as any process has it open and cannot be recreated under the
+same name, so a restarted writer reuses it when it is large enough.
+"""
+from __future__ import annotations
+
+import sys
+import time
+from multiprocessing import shared_memory
+from typing import NamedTuple, Optional, Tuple
+
+try:  # pragma: no cover - optional dependency
+    import numpy as np  # type: ignore
+except Exception:  # pragma: no cover
+    np = None
+
+RING_MAGIC = 0x56524E47  # "VRNG"
+DEFAULT_RING_SLOTS = 4
+_HEADER_WORDS = 8
+_GENERATION = 6
+_SLOT_WORDS = 3
+_ALIGN = 4096
+_WINDOWS = sys.platform == "win32"
+
+
+class RingFrame(NamedTuple):
+    seq: int
+    timestamp_ns: int
+    version: int
+    image: "np.ndarray"
+
+
+def _data_offset(slots: int) -> int:
+    meta = 8 * (_HEADER_WORDS + _SLOT_WORDS * slots)
+    return (meta + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+def _retire(shm: shared_memory.SharedMemory) -> None:
+    """Set the generation of the ring in ``shm`` to 0, if it is a ring."""
+    if shm.size < 8 * _HEADER_WORDS:
+        return
+    header = np.ndarray((_HEADER_WORDS,), dtype=np.int64, buffer=shm.buf)
+    if header[0] == RING_MAGIC:
+        header[_GENERATION] = 0
+    del header
+
+
+class FrameRing:
+    """Ring buffer of raw frames in shared memory (one writer, many readers).
+
+    Use :meth:`create` in the capture process and :meth:`attach` in readers.
+    Sequence numbers start at 1; ``latest_seq == 0`` means no frame yet.
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool) -> None:
+        self.shm = shm
+        self.owner = owner
+        self._header = np.ndarray((_HEADER_WORDS,), dtype=np.int64, buffer=shm.buf)
+        if self._header[0] != RING_MAGIC:
+            raise RuntimeError(f"共有メモリ {shm.name} はフレームリングではありません")
+        self.slots, h, w, c = (int(v) for v in self._header[1:5])
+        self.shape = (h, w, c)
+        self._meta = np.ndarray(
+            (self.slots, _SLOT_WORDS), dtype=np.int64, buffer=shm.buf, offset=8 * _HEADER_WORDS
+        )
+        self._data = np.ndarray(
+            (self.slots,) + self.shape, dtype=np.uint8, buffer=shm.buf, offset=_data_offset(self.slots)
+        )
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    @property
+    def generation(self) -> int:
+        """Generation of the writer of this block; 0 once it was closed or replaced."""
+        return int(self._header[_GENERATION])
+
+    # ---- 生成 / 接続 ----
+    @classmethod
+    def create(cls, name: str, shape: Tuple[int, int, int], slots: int = DEFAULT_RING_SLOTS) -> "FrameRing":
+        """Create the ring ``name`` for frames of ``shape`` (height, width, channels)."""
+        if slots < 2:
+            raise ValueError("slots must be >= 2")
+        size = _data_offset(slots) + slots * int(np.prod(shape))
+        try:
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            # 前回の writer の残骸（読み手がまだ開いている場合もある）
+            shm = shared_memory.SharedMemory(name=name)
+            if _WINDOWS and shm.size < size:
+                shm.close()
+                raise RuntimeError(
+                    f"共有メモリ {name} は他のプロセスが開いたままで、サイズが足りないため作り直せません"
+                )
+            _retire(shm)
+            if not _WINDOWS:
+                shm.close()
+                shm.unlink()
+                shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        header = np.ndarray((_HEADER_WORDS,), dtype=np.int64, buffer=shm.buf)
+        header[:] = 0
+        header[1:5] = (slots,) + tuple(shape)
+        np.ndarray((slots, _SLOT_WORDS), dtype=np.int64, buffer=shm.buf, offset=8 * _HEADER_WORDS)[:] = 0
+        header[_GENERATION] = time.time_ns()
+        header[0] = RING_MAGIC
+        del header
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name: str, wait: Optional[float] = None) -> "FrameRing":
+        """Attach to an existing ring without taking ownership of it.
+
+        With ``wait`` (seconds), retry until the writer has created the ring;
+        raises ``FileNotFoundError`` if it does not appear in time.
+        """
+        deadline = None if wait is None else time.monotonic() + wait
+        while True:
+            try:
+                shm = shared_memory.SharedMemory(name=name)
+                break
+            except FileNotFoundError:
+                if deadline is None or time.monotonic() >= deadline:
+                    raise
+                time.sleep(0.2)
+        if not _WINDOWS:
+            # 読み手の終了時に resource_tracker が共有メモリを消さないようにする
+            from multiprocessing import resource_tracker
+
+            resource_tracker.unregister(shm._name, "shared_memory")
+        return cls(shm, owner=False)
+
+    def close(self) -> None:
+        if self.owner:
+            self._header[_GENERATION] = 0  # 読み手に writer の終了を知らせる
+        self._header = self._meta = self._data = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+    def __enter__(self) -> "FrameRing":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    # ---- 書き込み ----
+    def write(self, frame, timestamp_ns: Optional[int] = None) -> int:
+        """Copy ``frame`` into the next slot and publish it; return its sequence number."""
+        frame = np.asarray(frame)
+        if frame.shape != self.shape:
+            raise ValueError(f"frame shape {frame.shape} != ring shape {self.shape}")
+        seq = int(self._header[5]) + 1
+        slot = seq % self.slots
+        meta = self._meta[slot]
+        meta[0] += 1  # 奇数: 書き込み中
+        self._data[slot][...] = frame
+        meta[1] = seq
+        meta[2] = time.time_ns() if timestamp_ns is None else timestamp_ns
+        meta[0] += 1  # 偶数: 完了
+        self._header[5] = seq
+        return seq
+
+    # ---- 読み出し ----
+    @property
+    def latest_seq(self) -> int:
+        return int(self._header[5])
+
+    def read(self, seq: Optional[int] = None) -> Optional[RingFrame]:
+        """Return frame ``seq`` (default: the latest) as a :class:`RingFrame`.
+
+        ``image`` is a view into shared memory, not a copy.  Returns None if
+        the frame is not available (not written yet, already overwritten or
+        being written).  Check :meth:`is_intact` after using the view.
+        """
+        seq = self.latest_seq if seq is None else seq
+        if seq <= 0:
+            return None
+        meta = self._meta[seq % self.slots]
+        version = int(meta[0])
+        if version % 2 or int(meta[1]) != seq:
+            return None
+        return RingFrame(seq, int(meta[2]), version, self._data[seq % self.slots])
+
+    def is_intact(self, frame: RingFrame) -> bool:
+        """True if ``frame`` has not been rewritten since :meth:`read`."""
+        return int(self._meta[frame.seq % self.slots][0]) == frame.version
+
+    def copy(self, seq: Optional[int] = None) -> Optional[RingFrame]:
+        """Like :meth:`read` but with a private copy of the image."""
+        for _ in range(3):
+            frame = self.read(seq)
+            if frame is None:
+                return None
+            image = frame.image.copy()
+            if self.is_intact(frame):
+                return frame._replace(image=image)
+        return None
+
+    def wait_next(self, after: int, timeout: Optional[float] = None, poll: float = 0.005) -> Optional[int]:
+        """Wait for a frame newer than ``after``; return the latest sequence or None."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            seq = self.latest_seq
+            if seq > after:
+                return seq
+            if deadline is not None and time.monotonic() >= deadline:
+                return None
+            time.sleep(poll)
+
+
+class RingFrameSource:
+    """Hand out new sequence numbers of a :class:`FrameRing` in order.
+
+    Mirrors :class:`frame_source.FrameSource`: :meth:`get` returns the next
+    frame to process (here its sequence number).  When the reader falls
+    behind, it jumps to the newest frame and counts the skipped ones.
+
+    While waiting, the writer generation is checked every ``check_interval``
+    seconds.  When the writer was restarted or closed, the source attaches
+    to the ring by name again (waiting for a new writer if necessary) and
+    continues with its newest frame; ``ring`` then refers to the new ring.
+    """
+
+    def __init__(self, ring: FrameRing, include_latest: bool = True, check_interval: float = 1.0) -> None:
+        self.ring = ring
+        self.include_latest = include_latest
+        self.check_interval = check_interval
+        self.name = ring.name
+        self.generation = ring.generation
+        self.last_seq = 0
+        self.stats = {"frames": 0, "skipped": 0, "reattached": 0}
+
+    def start(self) -> "RingFrameSource":
+        latest = self.ring.latest_seq
+        self.last_seq = max(latest - 1, 0) if self.include_latest else latest
+        return self
+
+    def stop(self) -> None:
+        self.ring.close()
+
+    def __enter__(self) -> "RingFrameSource":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def _reattach(self) -> bool:
+        try:
+            ring = FrameRing.attach(self.name)
+        except (FileNotFoundError, RuntimeError):
+            return False  # writer の再起動待ち、または初期化中
+        if ring.generation == 0 or ring.generation == self.generation:
+            ring.close()
+            return False
+        self.ring.close()
+        self.ring = ring
+        self.generation = ring.generation
+        self.stats["reattached"] += 1
+        print(f"[FRAME] auto_capture の再起動を検出し、共有メモリ {self.name} に再接続しました")
+        latest = ring.latest_seq
+        self.last_seq = max(latest - 1, 0)
+        return True
+
+    def get(self, timeout: Optional[float] = None) -> Optional[int]:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self.check_interval
+            if deadline is not None:
+                wait = min(wait, max(0.0, deadline - time.monotonic()))
+            if self.ring.generation != self.generation and not self._reattach():
+                seq = None
+                time.sleep(min(0.2, wait))
+            else:
+                seq = self.ring.wait_next(self.last_seq, timeout=wait)
+            if seq is not None:
+                break
+            if deadline is not None and time.monotonic() >= deadline:
+                return None
+        if self.last_seq and seq > self.last_seq + 1:
+            self.stats["skipped"] += seq - self.last_seq - 1
+            print(f"[WARN] {seq - self.last_seq - 1} フレームを読み飛ばしました")
+        self.last_seq = seq
+        self.stats["frames"] += 1
+        return seq
@@ -0,0 +1,338 @@
+"""Event-driven ingestion of the screenshots written by ``auto_capture.py``.
+
+Scanning the image folder with ``glob`` and ``stat`` on every cycle gets
+slower as the day's 1,440 screenshots accumulate, and picking "the newest
+file" can both repeat and skip frames.  :class:`FrameSource` instead hands
+out every newly *completed* frame exactly once, in file name order
+(``HHMMSS.png``, optionally below ``YYYYMMDD`` folders), so no row of the
+vitals log is lost.  With ``skip_to_latest`` a reader that falls behind
+jumps to the newest frame instead, like :class:`frame_ring.RingFrameSource`.
+
+File system events come from ``watchdog`` (inotify on Linux,
+ReadDirectoryChangesW on Windows) when it is installed; otherwise, or with
+``mode="poll"``, the folder is listed periodically.  Listing only compares
+names against the last handed-out frame and never calls ``stat``.
+"""
+from __future__ import annotations
+
+import fnmatch
+import os
+import re
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Set, Tuple, Union
+
+try:  # pragma: no cover - optional dependency
+    from watchdog.events import FileSystemEventHandler  # type: ignore
+    from watchdog.observers import Observer  # type: ignore
+except Exception:  # pragma: no cover
+    FileSystemEventHandler = object
+    Observer = None
+
+from roi_bundle import ROI_BUNDLE_SUFFIX, is_complete_bundle
+
+FRAME_SOURCE_MODES = ("auto", "watch", "poll")
+FRAME_PATTERNS = ("*.png", "*" + ROI_BUNDLE_SUFFIX)
+FRAME_NAME_RE = re.compile(r"^(\d{6})(?:_(\d{3}))?$")
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+PNG_IEND = b"\x00\x00\x00\x00IEND\xaeB`\x82"
+
+
+def is_complete_png(path: Union[str, Path]) -> bool:
+    """Return True once ``path`` starts with the PNG signature and ends with IEND."""
+    try:
+        with open(path, "rb") as f:
+            if f.read(len(PNG_SIGNATURE)) != PNG_SIGNATURE:
+                return False
+            f.seek(0, os.SEEK_END)
+            if f.tell() < len(PNG_SIGNATURE) + len(PNG_IEND):
+                return False
+            f.seek(-len(PNG_IEND), os.SEEK_END)
+            return f.read() == PNG_IEND
+    except OSError:
+        return False
+
+
+def is_complete_frame(path: Union[str, Path]) -> bool:
+    """Completeness check for screenshots (PNG) and ROI bundles (``.npz``)."""
+    suffix = Path(path).suffix.lower()
+    if suffix == ".png":
+        return is_complete_png(path)
+    if suffix == ROI_BUNDLE_SUFFIX:
+        return is_complete_bundle(path)
+    return Path(path).exists()
+
+
+def frame_time(path: Union[str, Path], day: Optional[str] = None) -> Optional[datetime]:
+    """Capture time of ``path`` from its ``YYYYMMDD`` folder and ``HHMMSS[_mmm]`` name.
+
+    ``day`` defaults to the name of the folder containing ``path``.  Returns
+    None if the name or the folder is not a capture time.
+    """
+    path = Path(path)
+    m = FRAME_NAME_RE.match(path.stem)
+    if m is None:
+        return None
+    try:
+        ts = datetime.strptime((day or path.parent.name) + m.group(1), "%Y%m%d%H%M%S")
+    except ValueError:
+        return None
+    return ts.replace(microsecond=int(m.group(2) or 0) * 1000)
+
+
+class _EventHandler(FileSystemEventHandler):
+    def __init__(self, source: "FrameSource") -> None:
+        super().__init__()
+        self.source = source
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self.source.notify(event.src_path)
+
+    on_modified = on_created
+    on_closed = on_created
+
+    def on_moved(self, event):
+        if not event.is_directory:
+            self.source.notify(event.dest_path)
+
+
+class FrameSource:
+    """Yield newly completed screenshots of ``folder`` in order, each once.
+
+    Parameters
+    ----------
+    folder : path
+        Folder that ``auto_capture.py`` writes to.
+    pattern : str or sequence of str, default ``"*.png"``
+        File name pattern(s) of frames, e.g. :data:`FRAME_PATTERNS` to also
+        accept ROI bundles.
+    recursive : bool, default False
+        Also watch one level of sub-folders (the ``YYYYMMDD`` day folders),
+        so that reading continues across midnight.
+    mode : {"auto", "watch", "poll"}
+        ``"auto"`` uses watchdog when installed and polling otherwise.
+    poll_interval : float, default 1.0
+        Listing interval in seconds for ``"poll"``.
+    rescan_interval : float, default 30.0
+        Safety listing interval in ``"watch"`` mode, for missed events.
+    incomplete_timeout : float, default 10.0
+        A frame that is still incomplete after this many seconds is dropped.
+    include_latest : bool, default True
+        Hand out the newest frame already present at :meth:`start`; older
+        existing frames are never handed out.
+    skip_to_latest : bool, default False
+        Return the newest completed pending frame and drop the older pending
+        ones (counted in ``stats["skipped"]``), for readers that must keep
+        up with fast capture rather than record every frame.
+
+    Only frames whose key (relative path) sorts after the last handed-out
+    frame are accepted, so a frame is never processed twice.  By default
+    :meth:`get` returns the oldest pending frame and waits while it is
+    still being written.
+    """
+
+    def __init__(
+        self,
+        folder: Union[str, Path],
+        pattern: Union[str, Sequence[str]] = "*.png",
+        recursive: bool = False,
+        mode: str = "auto",
+        poll_interval: float = 1.0,
+        rescan_interval: float = 30.0,
+        incomplete_timeout: float = 10.0,
+        include_latest: bool = True,
+        skip_to_latest: bool = False,
+    ) -> None:
+        if mode not in FRAME_SOURCE_MODES:
+            raise ValueError(f"unknown frame source mode: {mode}")
+        if mode == "watch" and Observer is None:
+            raise RuntimeError("watchdog がインストールされていません")
+        self.folder = Path(folder)
+        self.patterns = (pattern,) if isinstance(pattern, str) else tuple(pattern)
+        self.recursive = recursive
+        self.mode = "watch" if mode == "watch" or (mode == "auto" and Observer is not None) else "poll"
+        self.poll_interval = poll_interval
+        self.rescan_interval = rescan_interval
+        self.incomplete_timeout = incomplete_timeout
+        self.include_latest = include_latest
+        self.skip_to_latest = skip_to_latest
+        self.last_key: Optional[str] = None
+        self.stats = {"frames": 0, "skipped": 0, "dropped_incomplete": 0, "late": 0, "scans": 0}
+        self._pending: Dict[str, Tuple[Path, float]] = {}
+        self._dropped: Set[str] = set()
+        self._cond = threading.Condition()
+        self._observer = None
+        self._next_scan = 0.0
+
+    # ---- 開始 / 停止 ----
+    def start(self) -> "FrameSource":
+        existing = self._list_keys()
+        if existing:
+            latest = existing[-1]
+            if self.include_latest:
+                self.last_key = existing[-2] if len(existing) > 1 else ""
+                self._pending[latest] = (self.folder / latest, time.monotonic())
+            else:
+                self.last_key = latest
+        if self.mode == "watch":
+            self._observer = Observer()
+            self._observer.schedule(_EventHandler(self), str(self.folder), recursive=self.recursive)
+            self._observer.start()
+        self._next_scan = time.monotonic() + self._scan_period()
+        return self
+
+    def stop(self) -> None:
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+            self._observer = None
+
+    def __enter__(self) -> "FrameSource":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    # ---- 入力 ----
+    def _key(self, path: Path) -> Optional[str]:
+        try:
+            rel = path.relative_to(self.folder)
+        except ValueError:
+            return None
+        if len(rel.parts) > (2 if self.recursive else 1):
+            return None
+        if not self._matches(rel.name):
+            return None
+        return rel.as_posix()
+
+    def _matches(self, name: str) -> bool:
+        return any(fnmatch.fnmatch(name, p) for p in self.patterns)
+
+    def notify(self, path: Union[str, Path]) -> None:
+        """Register a created or modified file (called by the watcher)."""
+        path = Path(path)
+        key = self._key(path)
+        if key is None:
+            return
+        with self._cond:
+            self._add_locked(key, path)
+            self._cond.notify_all()
+
+    def _add_locked(self, key: str, path: Path) -> None:
+        if key in self._pending or key in self._dropped:
+            return
+        if self.last_key is not None and key <= self.last_key:
+            # 既に処理済み、または後から現れた古いフレーム
+            if key != self.last_key:
+                self.stats["late"] += 1
+            return
+        self._pending[key] = (path, time.monotonic())
+
+    def _list_keys(self) -> List[str]:
+        keys = []
+        after = self.last_key or ""
+        after_dir = after.split("/")[0] if "/" in after else ""
+        try:
+            entries = list(os.scandir(self.folder))
+        except OSError:
+            return []
+        for entry in entries:
+            if entry.is_dir():
+                if not self.recursive or entry.name < after_dir:
+                    continue
+                try:
+                    names = [e.name for e in os.scandir(entry.path) if e.is_file()]
+                except OSError:
+                    continue
+                keys.extend(
+                    f"{entry.name}/{n}" for n in names if self._matches(n)
+                )
+            elif self._matches(entry.name):
+                keys.append(entry.name)
+        return sorted(k for k in keys if k > after)
+
+    def scan(self) -> None:
+        """List the folder and register frames newer than the last one."""
+        keys = self._list_keys()
+        self.stats["scans"] += 1
+        with self._cond:
+            for key in keys:
+                self._add_locked(key, self.folder / key)
+
+    def _scan_period(self) -> float:
+        return self.poll_interval if self.mode == "poll" else self.rescan_interval
+
+    # ---- 出力 ----
+    def _pop_ready_locked(self) -> Optional[Path]:
+        if self.skip_to_latest:
+            return self._pop_latest_locked()
+        while self._pending:
+            key = min(self._pending)
+            path, first_seen = self._pending[key]
+            if is_complete_frame(path):
+                return self._hand_out_locked(key, path)
+            if time.monotonic() - first_seen < self.incomplete_timeout:
+                # 書き込み中の古いフレームより新しいものは先に出さない
+                return None
+            self._drop_incomplete_locked(key, path)
+        return None
+
+    def _pop_latest_locked(self) -> Optional[Path]:
+        # 新しい順に見て、書き込みが完了している最新のフレームを返す
+        for key in sorted(self._pending, reverse=True):
+            path, first_seen = self._pending[key]
+            if is_complete_frame(path):
+                older = [k for k in self._pending if k < key]
+                for k in older:
+                    del self._pending[k]
+                if older:
+                    self.stats["skipped"] += len(older)
+                    print(f"[WARN] {len(older)} フレームを読み飛ばしました")
+                return self._hand_out_locked(key, path)
+            if time.monotonic() - first_seen >= self.incomplete_timeout:
+                self._drop_incomplete_locked(key, path)
+        return None
+
+    def _hand_out_locked(self, key: str, path: Path) -> Path:
+        del self._pending[key]
+        self.last_key = key
+        self._dropped = {k for k in self._dropped if k > key}
+        self.stats["frames"] += 1
+        return path
+
+    def _drop_incomplete_locked(self, key: str, path: Path) -> None:
+        del self._pending[key]
+        self._dropped.add(key)  # 次の走査で拾い直さない
+        self.stats["dropped_incomplete"] += 1
+        print(f"[WARN] 書き込みが完了しない画像をスキップ: {path}")
+
+    def get(self, timeout: Optional[float] = None) -> Optional[Path]:
+        """Return the next completed frame, or None after ``timeout`` seconds."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            now = time.monotonic()
+            if now >= self._next_scan:
+                self.scan()
+                self._next_scan = now + self._scan_period()
+            with self._cond:
+                path = self._pop_ready_locked()
+                if path is not None:
+                    return path
+                now = time.monotonic()
+                if deadline is not None and now >= deadline:
+                    return None
+                wake = self._next_scan
+                if self._pending:
+                    # 書き込み中のファイルは短い間隔で完了を確認する
+                    wake = min(wake, now + 0.02)
+                if deadline is not None:
+                    wake = min(wake, deadline)
+                self._cond.wait(max(0.0, wake - now))
+
+    def __iter__(self) -> Iterator[Path]:
+        while True:
+            yield self.get()
@@ -0,0 +1,101 @@
+"""Detect frozen screens before paying for OCR.
+
+When the bedside monitor or the remote-display session freezes,
+``auto_capture.py`` keeps saving identical screenshots.  The digits of a
+stable patient may not change for minutes, but the respiratory waveform of
+a live monitor always scrolls, so an exact fingerprint of the downsampled
+waveform strip (``SPONT_BREATH_COORDS``) that keeps repeating means the
+screen for that bed is frozen.  After ``warn_after`` repeats
+``vital_reader`` skips OCR for the bed and writes a row marked as stale.
+
+Beds without a waveform rectangle (``BED_COORDS_4``) are never treated as
+frozen, nor are frames whose strip is uniform, e.g. an ROI bundle that
+does not contain it.
+"""
+from __future__ import annotations
+
+import hashlib
+from typing import Dict, Hashable, Optional, Tuple
+
+from lazy_import import available, lazy_import
+from roi_bundle import iter_rects
+
+cv2 = lazy_import("cv2")
+
+Rect = Tuple[int, int, int, int]
+WAVEFORM_KEY = "SPONT_BREATH_COORDS"
+
+
+def waveform_region(coords) -> Optional[Rect]:
+    """Bounding box ``(x, y, w, h)`` of the waveform rectangles of one bed, or None."""
+    rects = list(iter_rects(coords.get(WAVEFORM_KEY, [])))
+    if not rects:
+        return None
+    x0 = min(x for x, _, _, _ in rects)
+    y0 = min(y for _, y, _, _ in rects)
+    x1 = max(x + w for x, _, w, _ in rects)
+    y1 = max(y + h for _, y, _, h in rects)
+    return x0, y0, x1 - x0, y1 - y0
+
+
+def frame_fingerprint(img, region: Rect, scale: int = 4) -> Optional[str]:
+    """Hash of ``region`` of ``img`` after downsampling by ``scale``.
+
+    Downsampling is deterministic, so identical frames always give the same
+    fingerprint while hashing a fraction of the pixels.  Returns None for an
+    empty or uniform region, which says nothing about the screen being live.
+    """
+    x, y, w, h = region
+    crop = img[y:y + h, x:x + w]
+    if not crop.size or (crop == crop.flat[0]).all():
+        return None
+    if scale > 1 and available(cv2):
+        crop = cv2.resize(
+            crop, (max(1, crop.shape[1] // scale), max(1, crop.shape[0] // scale)),
+            interpolation=cv2.INTER_AREA,
+        )
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr(crop.shape).encode())
+    digest.update(crop.tobytes())
+    return digest.hexdigest()
+
+
+class FrozenFrameDetector:
+    """Count consecutive identical waveform strips per bed.
+
+    :meth:`check` returns 0 for a changed (or first) frame and ``n`` for the
+    ``n``-th repeat of the same frame; it always returns 0 for a bed without
+    a waveform rectangle or with a uniform strip.  :meth:`is_frozen` is true
+    from ``warn_after`` repeats on; a warning is printed then and every
+    ``warn_after`` repeats after that.
+    """
+
+    def __init__(self, warn_after: int = 3, scale: int = 4) -> None:
+        self.warn_after = warn_after
+        self.scale = scale
+        self._last: Dict[Hashable, Tuple[str, int]] = {}
+        self._regions: Dict[Hashable, Optional[Rect]] = {}
+        self.skipped = 0
+
+    def is_frozen(self, repeats: int) -> bool:
+        return repeats > 0 and repeats >= self.warn_after
+
+    def check(self, bed: Hashable, img, coords) -> int:
+        if bed not in self._regions:
+            self._regions[bed] = waveform_region(coords)
+        region = self._regions[bed]
+        fp = frame_fingerprint(img, region, self.scale) if region is not None else None
+        if fp is None:
+            self._last.pop(bed, None)
+            return 0
+        last = self._last.get(bed)
+        repeats = last[1] + 1 if last is not None and last[0] == fp else 0
+        self._last[bed] = (fp, repeats)
+        if self.is_frozen(repeats):
+            self.skipped += 1
+            if self.warn_after and repeats % self.warn_after == 0:
+                print(f"[WARN] ベッド{bed}: 画面が{repeats}回連続で変化していません（画面フリーズの可能性）")
+        return repeats
+
+    def reset(self) -> None:
+        self._last.clear()
@@ -10,16 +10,24 @@ from pathlib import Path
 from tkinter import ttk, messagebox
 from typing import Dict, Optional
 
-from vital_reader import save_vitals_to_csv
+from vitals_csv import save_vitals_to_csv
+from vitals_write_queue import VitalsWriteQueue, WriteQueueMixin
 
 
-class GasPanel(tk.Frame):
+class GasPanel(WriteQueueMixin, tk.Frame):
     """Panel with entry boxes for FiO2, NO, and nitrogen."""
 
-    def __init__(self, master: tk.Misc, csv_path: Optional[str] = None, **kwargs) -> None:
+    def __init__(
+        self,
+        master: tk.Misc,
+        csv_path: Optional[str] = None,
+        write_queue: Optional[VitalsWriteQueue] = None,
+        **kwargs,
+    ) -> None:
         super().__init__(master, **kwargs)
         self.vars: Dict[str, tk.DoubleVar] = {}
         self.history: Dict[str, Dict[str, float]] = {}
+        self.write_queue = write_queue
         # Use ``VITALS_PATH`` if explicit ``csv_path`` is not provided
         path = csv_path or os.getenv("VITALS_PATH")
         self.csv_path = Path(path) if path else None
@@ -77,7 +85,7 @@ class GasPanel(tk.Frame):
         row = {"timestamp": ts.strftime("%Y-%m-%d %H:%M:%S")}
         row.update(vals)
         try:
-            save_vitals_to_csv(row, str(self.csv_path))
+            save_vitals_to_csv(row, str(self.csv_path), write_queue=self.write_queue)
         except Exception as e:  # pragma: no cover - defensive
             print(f"[WARN] CSV書き込み失敗: {e}")
 
@@ -91,6 +99,7 @@ def run_gas_panel(topmost: bool = False, csv_path: Optional[str] = None) -> None
             root.attributes("-topmost", True)
         except Exception:
             pass
-    panel = GasPanel(root, csv_path=csv_path)
-    panel.pack(fill="both", expand=True)
-    root.mainloop()
+    with VitalsWriteQueue() as write_queue:
+        panel = GasPanel(root, csv_path=csv_path, write_queue=write_queue)
+        panel.pack(fill="both", expand=True)
+        root.mainloop()
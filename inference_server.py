@@ -0,0 +1,561 @@
+"""Shared local inference service for the CVP and spontaneous-breathing models.
+
+One ``vital_reader`` process per bed would each load the CVP model (and the
+torch model) and warm it up on its own.  ``inference_server.py`` loads each
+model once, warms it up and serves every reader over local IPC
+(``multiprocessing.connection``: a Unix socket on POSIX, a named pipe on
+Windows)::
+
+    python inference_server.py --cvp-model cvp_model.onnx
+    python vital_reader.py --inference-server
+
+Readers send raw BGR crops.  Requests for the same model are merged by a
+:class:`DynamicBatcher` into one forward pass: a batch closes when it holds
+``max_batch`` crops or ``max_wait`` seconds after its first request.  A
+request still queued after its deadline is answered with an error and the
+reader falls back (CVP ``"na"``, bright-line heuristic), so a busy server
+never stalls the capture cycle.  Batch sizes, queue wait and inference time
+are kept per model and returned by the ``"metrics"`` request.
+
+``multiprocessing.connection`` unpickles every message, so only the user
+running the server may connect.  The default socket lives in a per-user
+directory (mode 0700, see :func:`runtime_dir`), and connections are
+authenticated with a random key that the server writes to a file only its
+owner can read (:func:`load_authkey`); ``INFERENCE_AUTHKEY`` overrides it.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import queue
+import secrets
+import stat
+import sys
+import threading
+import time
+from collections import deque
+from multiprocessing.connection import Client, Listener
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+DEFAULT_DEADLINE = 0.5
+
+
+def runtime_dir() -> str:
+    """Per-user directory for the socket (POSIX) and the key file (Windows)."""
+    if sys.platform == "win32":
+        return os.path.join(os.getenv("LOCALAPPDATA") or os.path.expanduser("~"), "vital_inference")
+    base = os.getenv("XDG_RUNTIME_DIR")
+    if base:
+        return os.path.join(base, "vital_inference")
+    return f"/tmp/vital_inference-{os.getuid()}"
+
+
+def _default_address() -> str:
+    if sys.platform == "win32":
+        user = os.getenv("USERNAME") or "user"
+        return rf"\\.\pipe\vital_inference-{user}"
+    return os.path.join(runtime_dir(), "inference.sock")
+
+
+DEFAULT_ADDRESS = _default_address()
+
+
+def ensure_private_dir(path: str) -> None:
+    """Create ``path`` with mode 0700, refusing one another user could enter."""
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    if sys.platform == "win32":
+        return
+    st = os.lstat(path)
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid():
+        raise RuntimeError(f"{path} は別のユーザーのものです")
+    if st.st_mode & 0o077:
+        os.chmod(path, 0o700)
+
+
+def authkey_path(address: str) -> str:
+    """Key file of the server at ``address`` (``INFERENCE_AUTHKEY_FILE`` overrides it)."""
+    override = os.getenv("INFERENCE_AUTHKEY_FILE")
+    if override:
+        return override
+    if sys.platform == "win32":
+        return os.path.join(runtime_dir(), address.rsplit("\\", 1)[-1] + ".key")
+    return address + ".key"
+
+
+def load_authkey(address: str, create: bool = False) -> Optional[bytes]:
+    """Authentication key for ``address``; ``None`` when there is none yet.
+
+    ``INFERENCE_AUTHKEY`` takes precedence.  Otherwise the key is read from
+    :func:`authkey_path`; with ``create`` (the server) a random key is
+    written there first if the file does not exist, readable by its owner
+    only.  A key file other users can read is rejected.
+    """
+    env = os.getenv("INFERENCE_AUTHKEY")
+    if env:
+        return env.encode()
+    path = authkey_path(address)
+    if create and not os.path.exists(path):
+        if os.path.dirname(path) == runtime_dir():
+            ensure_private_dir(runtime_dir())
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            pass  # 同時に起動した別のサーバーが作った
+        else:
+            with os.fdopen(fd, "w") as f:
+                f.write(secrets.token_hex(32))
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except FileNotFoundError:
+        return None
+    with os.fdopen(fd) as f:
+        if sys.platform != "win32":
+            st = os.fstat(f.fileno())
+            if st.st_uid != os.getuid() or st.st_mode & 0o077:
+                raise RuntimeError(f"認証キーのファイルを他のユーザーが読めます: {path}")
+        key = f.read().strip()
+    return key.encode() if key else None
+
+
+class InferenceUnavailable(RuntimeError):
+    """The server could not be reached or did not answer in time."""
+
+
+def _pct(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+
+class _Job:
+    __slots__ = ("items", "enqueued", "deadline", "done", "result", "error")
+
+    def __init__(self, items, deadline):
+        self.items = items
+        self.enqueued = time.monotonic()
+        self.deadline = self.enqueued + deadline
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class DynamicBatcher:
+    """Merge concurrent requests for one model into batched calls.
+
+    Parameters
+    ----------
+    run_batch : callable
+        Maps a list of crops to a sequence with one result per crop.
+    max_batch : int, default 32
+        Crops per forward pass; a single larger request still runs alone.
+    max_wait : float, default 0.005
+        Seconds a batch stays open for more requests after the first one.
+    """
+
+    def __init__(self, name: str, run_batch: Callable[[List], Sequence], max_batch: int = 32, max_wait: float = 0.005) -> None:
+        self.name = name
+        self.run_batch = run_batch
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.counts = {"requests": 0, "items": 0, "batches": 0, "expired": 0, "errors": 0}
+        self.batch_sizes = deque(maxlen=10_000)
+        self.queue_wait = deque(maxlen=10_000)
+        self.infer_time = deque(maxlen=10_000)
+        self._queue: "queue.Queue[Optional[_Job]]" = queue.Queue()
+        self._carry: Optional[_Job] = None
+        self._stopping = False
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._loop, name=f"batcher-{name}", daemon=True)
+        self._thread.start()
+
+    def submit(self, items: List, deadline: float = DEFAULT_DEADLINE) -> _Job:
+        job = _Job(list(items), deadline)
+        self._queue.put(job)
+        return job
+
+    def close(self) -> None:
+        self._queue.put(None)
+        self._thread.join(5)
+
+    def _collect(self, first: _Job) -> List[_Job]:
+        jobs, n = [first], len(first.items)
+        close_at = first.enqueued + self.max_wait
+        while n < self.max_batch:
+            try:
+                job = self._queue.get(timeout=max(0.0, close_at - time.monotonic()))
+            except queue.Empty:
+                break
+            if job is None:
+                self._stopping = True
+                break
+            if n + len(job.items) > self.max_batch:
+                # 溢れる要求は次のバッチの先頭にする
+                self._carry = job
+                break
+            jobs.append(job)
+            n += len(job.items)
+        return jobs
+
+    def _loop(self) -> None:
+        while True:
+            first, self._carry = self._carry, None
+            if first is None:
+                if self._stopping:
+                    return
+                first = self._queue.get()
+                if first is None:
+                    return
+            jobs = self._collect(first)
+            now = time.monotonic()
+            live = []
+            for job in jobs:
+                if now > job.deadline:
+                    job.error = "deadline exceeded in queue"
+                    job.done.set()
+                    with self._lock:
+                        self.counts["expired"] += 1
+                else:
+                    live.append(job)
+            if not live:
+                continue
+            items = [item for job in live for item in job.items]
+            t0 = time.perf_counter()
+            try:
+                results = list(self.run_batch(items))
+                error = None
+            except Exception as e:
+                results, error = None, f"{type(e).__name__}: {e}"
+            elapsed = time.perf_counter() - t0
+            with self._lock:
+                self.counts["requests"] += len(live)
+                self.counts["items"] += len(items)
+                self.counts["batches"] += 1
+                self.batch_sizes.append(len(items))
+                self.infer_time.append(elapsed)
+                self.queue_wait.extend(now - job.enqueued for job in live)
+                if error:
+                    self.counts["errors"] += 1
+            start = 0
+            for job in live:
+                if error:
+                    job.error = error
+                else:
+                    job.result = results[start:start + len(job.items)]
+                start += len(job.items)
+                job.done.set()
+
+    def metrics(self) -> Dict[str, float]:
+        with self._lock:
+            sizes = list(self.batch_sizes)
+            return {
+                **self.counts,
+                "batch_mean": sum(sizes) / len(sizes) if sizes else 0.0,
+                "batch_max": max(sizes) if sizes else 0,
+                "queue_p50_ms": _pct(self.queue_wait, 0.5) * 1000,
+                "queue_p95_ms": _pct(self.queue_wait, 0.95) * 1000,
+                "infer_p50_ms": _pct(self.infer_time, 0.5) * 1000,
+                "infer_p95_ms": _pct(self.infer_time, 0.95) * 1000,
+            }
+
+
+class InferenceServer:
+    """Serve ``models`` (``{name: run_batch}``) to local clients.
+
+    ``info`` is returned to clients on connect (e.g. the spontaneous-
+    breathing threshold).  Each connection is handled by its own thread;
+    requests from all connections meet in the per-model batchers.
+    Without ``authkey`` the key of :func:`load_authkey` is used (and created).
+    """
+
+    def __init__(
+        self,
+        models: Dict[str, Callable[[List], Sequence]],
+        address: str = DEFAULT_ADDRESS,
+        authkey: Optional[bytes] = None,
+        info: Optional[dict] = None,
+        max_batch: int = 32,
+        max_wait: float = 0.005,
+        deadline: float = DEFAULT_DEADLINE,
+    ) -> None:
+        if sys.platform != "win32" and os.path.dirname(address) == runtime_dir():
+            ensure_private_dir(runtime_dir())
+        self.address = address
+        self.authkey = authkey or load_authkey(address, create=True)
+        self.info = dict(info or {}, models=sorted(models))
+        self.deadline = deadline
+        self.batchers = {name: DynamicBatcher(name, fn, max_batch, max_wait) for name, fn in models.items()}
+        if sys.platform != "win32" and os.path.exists(address):
+            os.unlink(address)  # 前回の異常終了で残ったソケット
+        self._listener = Listener(address, backlog=32, authkey=self.authkey)
+        self._closed = threading.Event()
+        self._thread = None
+
+    def serve_forever(self) -> None:
+        while not self._closed.is_set():
+            try:
+                conn = self._listener.accept()
+            except Exception:
+                if self._closed.is_set():
+                    return
+                continue  # 認証失敗など
+            threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def start(self) -> "InferenceServer":
+        """Serve on a background thread (for tests and embedding)."""
+        self._thread = threading.Thread(target=self.serve_forever, name="inference-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self) -> None:
+        self._closed.set()
+        self._listener.close()
+        for batcher in self.batchers.values():
+            batcher.close()
+        if sys.platform != "win32" and os.path.exists(self.address):
+            os.unlink(self.address)
+
+    def _handle(self, conn) -> None:
+        with conn:
+            while True:
+                try:
+                    msg = conn.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    reply = self._reply(msg)
+                except Exception as e:
+                    reply = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+                try:
+                    conn.send(reply)
+                except (EOFError, OSError):
+                    return
+
+    def _reply(self, msg: dict) -> dict:
+        op = msg.get("op")
+        if op == "info":
+            return {"ok": True, "info": self.info}
+        if op == "metrics":
+            return {"ok": True, "metrics": self.metrics()}
+        if op != "infer":
+            return {"ok": False, "error": f"unknown op: {op}"}
+        batcher = self.batchers.get(msg.get("model"))
+        if batcher is None:
+            return {"ok": False, "error": f"model not loaded: {msg.get('model')}"}
+        deadline = float(msg.get("deadline") or self.deadline)
+        job = batcher.submit(msg["items"], deadline)
+        # キューの期限切れは batcher が返すので、ここでは推論時間の余裕を見て待つ
+        if not job.done.wait(deadline + 30):
+            return {"ok": False, "error": "timeout"}
+        if job.error:
+            return {"ok": False, "error": job.error}
+        return {"ok": True, "result": job.result}
+
+    def metrics(self) -> Dict[str, Dict[str, float]]:
+        return {name: b.metrics() for name, b in self.batchers.items()}
+
+    def summary(self) -> str:
+        parts = []
+        for name, m in self.metrics().items():
+            parts.append(
+                f"{name}: {m['requests']} req / {m['batches']} batches (mean {m['batch_mean']:.1f}, max {m['batch_max']}), "
+                f"queue p95 {m['queue_p95_ms']:.1f} ms, infer p50 {m['infer_p50_ms']:.1f} / p95 {m['infer_p95_ms']:.1f} ms, "
+                f"expired {m['expired']}"
+            )
+        return "; ".join(parts)
+
+
+class InferenceClient:
+    """Client used by ``vital_reader`` (thread-safe, one connection).
+
+    Failures raise :class:`InferenceUnavailable`.  After a failed connect the
+    client does not try again for ``retry_interval`` seconds, so a stopped
+    server costs the readers nothing but the fallback.  Without ``authkey``
+    the server's key file is read on every connect, so a restarted server
+    with a new key is picked up.
+    """
+
+    def __init__(
+        self,
+        address: str = DEFAULT_ADDRESS,
+        authkey: Optional[bytes] = None,
+        deadline: float = DEFAULT_DEADLINE,
+        timeout: float = 10.0,
+        retry_interval: float = 5.0,
+    ) -> None:
+        self.address = address
+        self.authkey = authkey
+        self.deadline = deadline
+        self.timeout = timeout
+        self.retry_interval = retry_interval
+        self.info: Dict[str, Any] = {}
+        self._conn = None
+        self._next_connect = 0.0
+        self._lock = threading.Lock()
+
+    def _connect_locked(self) -> None:
+        if self._conn is not None:
+            return
+        if time.monotonic() < self._next_connect:
+            raise InferenceUnavailable("inference server unavailable (retrying later)")
+        try:
+            authkey = self.authkey or load_authkey(self.address)
+            if authkey is None:
+                raise FileNotFoundError(f"認証キーがありません: {authkey_path(self.address)}")
+            self._conn = Client(self.address, authkey=authkey)
+            self._conn.send({"op": "info"})
+            self.info = self._conn.recv()["info"]
+        except Exception as e:
+            self._close_locked()
+            self._next_connect = time.monotonic() + self.retry_interval
+            raise InferenceUnavailable(f"cannot connect to {self.address}: {e}") from e
+
+    def _close_locked(self) -> None:
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except OSError:
+                pass
+        self._conn = None
+
+    def request(self, msg: dict) -> dict:
+        with self._lock:
+            self._connect_locked()
+            try:
+                self._conn.send(msg)
+                if not self._conn.poll(self.timeout):
+                    raise TimeoutError("no reply")
+                reply = self._conn.recv()
+            except Exception as e:
+                # 応答が途中の接続は使い回せない
+                self._close_locked()
+                raise InferenceUnavailable(f"inference request failed: {e}") from e
+        if not reply.get("ok"):
+            raise InferenceUnavailable(reply.get("error", "error"))
+        return reply
+
+    def wait_ready(self, timeout: float = 30.0) -> bool:
+        """Connect, retrying until ``timeout``; True once the server answered."""
+        end = time.monotonic() + timeout
+        while True:
+            with self._lock:
+                self._next_connect = 0.0
+                try:
+                    self._connect_locked()
+                    return True
+                except InferenceUnavailable:
+                    pass
+            if time.monotonic() >= end:
+                return False
+            time.sleep(0.2)
+
+    def has_model(self, name: str) -> bool:
+        return name in self.info.get("models", ())
+
+    def infer(self, model: str, items: Sequence) -> list:
+        return self.request({"op": "infer", "model": model, "items": list(items), "deadline": self.deadline})["result"]
+
+    def metrics(self) -> dict:
+        return self.request({"op": "metrics"})["metrics"]
+
+    def close(self) -> None:
+        with self._lock:
+            self._close_locked()
+
+
+# =========================
+# サーバー起動
+# =========================
+
+
+def build_models(cvp_model_path=None, cvp_backend="auto", spont_model_path=None, spont_meta_path=None, threads=None):
+    """Load the models through ``vital_reader`` and return ``(models, info)``."""
+    import vital_reader as vr
+
+    models, info = {}, {}
+    if cvp_model_path:
+        vr.cvp_model = vr.load_cvp_model(cvp_model_path, cvp_backend, threads=threads)
+        models["cvp"] = lambda crops: list(vr.cvp_probabilities(crops))
+        info["cvp_backend"] = getattr(vr.cvp_model, "backend", "")
+    if spont_model_path and spont_meta_path:
+        vr.load_spont_breath_model(spont_model_path, spont_meta_path, threads)
+        models["spont"] = vr.spont_breath_probabilities
+        info["spont_threshold"] = float(vr.spont_breath_meta.get("threshold", 0.5))
+    return models, info
+
+
+def warm_up(models, shape=(64, 64, 3), batch=4) -> None:
+    import numpy as np
+
+    crops = [np.zeros(shape, dtype=np.uint8) for _ in range(batch)]
+    for name, fn in models.items():
+        t0 = time.perf_counter()
+        fn(crops)
+        print(f"[INFO] {name} ウォームアップ完了 ({(time.perf_counter() - t0) * 1000:.0f} ms)")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Shared CVP / spontaneous-breathing inference server")
+    parser.add_argument("--config", help="Path to config JSON file")
+    parser.add_argument("--address", help=f"待ち受けアドレス（既定: {DEFAULT_ADDRESS}）")
+    parser.add_argument("--cvp-model", help="Path to CVP model (.keras or .onnx)")
+    parser.add_argument("--cvp-backend", default=None, help="auto / keras / onnx")
+    parser.add_argument("--spont-breath-model", help="Path to spontaneous-breathing model weights (.pt)")
+    parser.add_argument("--spont-breath-meta", help="Path to spontaneous-breathing model metadata (JSON)")
+    parser.add_argument("--threads", type=int, help="推論のCPUスレッド数")
+    parser.add_argument("--max-batch", type=int, default=32, help="1回の推論にまとめるクロップ数の上限")
+    parser.add_argument("--max-wait-ms", type=float, default=5.0, help="バッチを締め切るまでの待ち時間 (ms)")
+    parser.add_argument("--deadline-ms", type=float, default=DEFAULT_DEADLINE * 1000, help="キュー待ちの期限 (ms)")
+    parser.add_argument("--stats-interval", type=float, default=600, help="統計を表示する間隔（秒）")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    import vital_reader as vr
+
+    args = parse_args(argv)
+    config = vr.load_config(args.config)
+    cvp_path = vr.resolve_path(
+        args.cvp_model, "CVP_MODEL_PATH", config, "CVP_MODEL_PATH", candidates=vr.DEFAULT_CVP_MODEL_CANDIDATES
+    )
+    try:
+        spont_path = vr.resolve_path(
+            args.spont_breath_model, "SPONT_BREATH_MODEL_PATH", config, "SPONT_BREATH_MODEL_PATH",
+            candidates=vr.DEFAULT_SPONT_BREATH_MODEL_CANDIDATES,
+        )
+        spont_meta = vr.resolve_path(
+            args.spont_breath_meta, "SPONT_BREATH_META_PATH", config, "SPONT_BREATH_META_PATH",
+            candidates=vr.DEFAULT_SPONT_BREATH_META_CANDIDATES,
+        )
+    except ValueError:
+        spont_path = spont_meta = None
+    models, info = build_models(
+        cvp_path,
+        args.cvp_backend or os.getenv("CVP_BACKEND") or config.get("CVP_BACKEND") or "auto",
+        spont_path,
+        spont_meta,
+        args.threads,
+    )
+    warm_up(models)
+    address = args.address or os.getenv("INFERENCE_SERVER") or config.get("INFERENCE_SERVER") or DEFAULT_ADDRESS
+    server = InferenceServer(
+        models,
+        address,
+        info=info,
+        max_batch=args.max_batch,
+        max_wait=args.max_wait_ms / 1000,
+        deadline=args.deadline_ms / 1000,
+    ).start()
+    print(f"🧠 推論サーバーを起動しました: {address}（モデル: {', '.join(sorted(models))}）")
+    try:
+        while True:
+            time.sleep(args.stats_interval)
+            print(f"📊 {server.summary()}")
+    except KeyboardInterrupt:
+        print("\n🛑 中断されました。終了します。")
+    finally:
+        print(f"📊 {server.summary()}")
+        server.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,63 @@
+"""Deferred import of heavy optional dependencies.
+
+``vital_reader`` and the OCR helpers need OpenCV, torch and the Google
+Vision client, but many importers (the panels, tests, ``replay --help``)
+never touch them.  ``cv2 = lazy_import("cv2")`` binds a placeholder that
+imports the module on first attribute access, so the import cost is only
+paid by code paths that use it.  A missing module behaves like the
+``name = None`` fallback of an eager ``try: import`` once checked with
+:func:`available`.
+"""
+from __future__ import annotations
+
+import importlib
+from typing import Any
+
+_MISSING = object()
+
+
+class LazyModule:
+    """Placeholder that imports ``name`` when an attribute is first used."""
+
+    def __init__(self, name: str) -> None:
+        object.__setattr__(self, "_name", name)
+        object.__setattr__(self, "_module", None)
+
+    def load(self) -> Any:
+        """Return the module, importing it now if needed; None if unavailable."""
+        module = self._module
+        if module is None:
+            try:
+                module = importlib.import_module(self._name)
+            except Exception:
+                module = _MISSING
+            object.__setattr__(self, "_module", module)
+        return None if module is _MISSING else module
+
+    def __getattr__(self, attr: str) -> Any:
+        module = self.load()
+        if module is None:
+            raise ImportError(f"{self._name} is not installed")
+        return getattr(module, attr)
+
+    def __setattr__(self, attr: str, value: Any) -> None:
+        # テストの monkeypatch などは実体のモジュールに反映する
+        setattr(self.load(), attr, value)
+
+    def __delattr__(self, attr: str) -> None:
+        delattr(self.load(), attr)
+
+    def __repr__(self) -> str:
+        state = "not loaded" if self._module is None else ("missing" if self._module is _MISSING else "loaded")
+        return f"<lazy module {self._name!r} ({state})>"
+
+
+def lazy_import(name: str) -> LazyModule:
+    return LazyModule(name)
+
+
+def available(module: Any) -> bool:
+    """True if ``module`` (a module, :class:`LazyModule` or None) can be used."""
+    if isinstance(module, LazyModule):
+        return module.load() is not None
+    return module is not None
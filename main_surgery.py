@@ -23,7 +23,9 @@ from vitals.bpup_logic import evaluate_bpup
 from vitals.bpdown_logic import evaluate_bpdown
 from vitals.bleed_logic import evaluate_bleed
 from vitals.transfusion_logic import evaluate_transfusion
-from vitals.sbp_trend import check_sbp_trend
+from vitals.sbp_trend import check_sbp_trend, check_sbp_trend_store
+from vitals_csv import LatestVitalsReader
+from vitals_store import bed_for_path, day_start_for_path, default_store
 from common.tree_parser import load_tree
 
 # パネルUI
@@ -117,6 +119,12 @@ def resolve_path(
 
 VITALS_BASE_DIR = resolve_path("VITALS_BASE_DIR", "VITALS_BASE_DIR", DEFAULT_VITALS_BASE_CANDIDATES, must_exist=False)
 
+# SQLite のバイタルストア（任意）。パネルの子プロセスにも環境変数で引き継ぐ
+VITALS_DB = os.getenv("VITALS_DB") or CONFIG.get("VITALS_DB")
+
+# CSV の追記分だけを読む get_latest_vitals 用のリーダー（パスごとに状態を保持）
+LATEST_VITALS_READER = LatestVitalsReader()
+
 DEFAULT_PAUSE_MIN = 10  # 予備のデフォルト（Treeに数値が無い等のとき）
 
 # ---------------- ユーティリティ ----------------
@@ -259,16 +267,24 @@ def evaluate_all(vitals: dict, tree_df, thresholds, phase='a', bpup_tree_df=None
 
 # ---------------- データ取得 ----------------
 
+def stale_frames(vitals: dict) -> int:
+    """Frames the monitor screen had been frozen for when ``vitals`` was written (0 if live)."""
+    try:
+        return int(float(vitals.get("Stale") or 0))
+    except (TypeError, ValueError):
+        return 0
+
 def get_latest_vitals(path: Union[Path, str]):
-    if pd is None:
-        print("[!] pandas が利用できないため CSV を読み込めません")
-        return None
+    # CSV が主記録。VITALS_DB は設定後に書かれた行しか持たず値も数値化されるので、ここでは使わない
     try:
         path = Path(path)
-        if path.suffix.lower() in (".xls", ".xlsx"):
-            df = pd.read_excel(path)
-        else:
-            df = pd.read_csv(path)
+        if path.suffix.lower() not in (".xls", ".xlsx"):
+            # CSV は前回からの追記行だけを読み、列ごとの最新値を保持して前方補完する
+            return LATEST_VITALS_READER.read(path)
+        if pd is None:
+            print("[!] pandas が利用できないため Excel を読み込めません")
+            return None
+        df = pd.read_excel(path)
         if df.empty:
             return None
         # Forward-fill missing values so that failed OCR or partial updates
@@ -402,6 +418,13 @@ def main_loop(
         if vitals is None or 'timestamp' not in vitals:
             print("[!] バイタル情報が不完全、再試行します")
             time.sleep(10); continue
+        stale = stale_frames(vitals)
+        if stale:
+            # 画面が固まった行は空欄を前方補完すると古い値が現在値に見えるので判定しない
+            if vitals['timestamp'] != last_timestamp:
+                print(f"[!] {vitals['timestamp']}: モニター画面が {stale} フレーム変化していません。判定を保留します")
+                last_timestamp = vitals['timestamp']
+            time.sleep(10); continue
 
         print("【判定直前しきい値】", thresholds)
         print("【判定直前バイタル】", vitals)
@@ -416,7 +439,13 @@ def main_loop(
         if last_timestamp is None or vitals['timestamp'] != last_timestamp:
             print(f"\n--- {vitals['timestamp']} の判定 ---")
 
-            trend = check_sbp_trend(vitals_path)
+            store = default_store()
+            if store is not None:
+                trend = check_sbp_trend_store(
+                    store, bed_for_path(vitals_path), since=day_start_for_path(vitals_path), csv_path=vitals_path
+                )
+            else:
+                trend = check_sbp_trend(vitals_path)
             if trend:
                 print(
                     f"[{datetime.now().strftime('%H:%M:%S')}] ALARM ΔSBP={trend['change']:+.0f}: {trend['instruction']}"
@@ -686,6 +715,8 @@ def main_loop(
         time.sleep(60)
 
 if __name__ == '__main__':
+    if VITALS_DB:
+        os.environ["VITALS_DB"] = str(Path(VITALS_DB).expanduser())
     vitals_path = select_bed_and_csv(VITALS_BASE_DIR)
     thresholds = prompt_thresholds()
     manager = None
@@ -0,0 +1,200 @@
+"""Pluggable OCR backends for the numeric fields read by ``vital_reader``.
+
+``vital_reader`` talks to Google Vision by default.  The classes here provide
+a common :class:`OCRBackend` interface and a local, CPU-only
+:class:`TemplateDigitBackend` that recognises the fixed monitor fonts by
+segmenting a crop into glyphs and matching each glyph against templates
+learnt from previously OCR'd crops.
+"""
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+try:  # pragma: no cover - optional dependency
+    import numpy as np  # type: ignore
+except Exception:  # pragma: no cover
+    np = None
+
+from lazy_import import lazy_import
+
+cv2 = lazy_import("cv2")
+
+
+class OCRBackend:
+    """Interface shared by all OCR backends.
+
+    Subclasses implement :meth:`read_batch`; :meth:`read` and
+    :meth:`read_with_confidence` have generic fallbacks.  ``name`` and
+    ``version`` identify the backend, e.g. for result caches.
+    """
+
+    name = "base"
+    version = "1"
+
+    def read(self, img) -> str:
+        return self.read_batch([img])[0]
+
+    def read_batch(self, images: Sequence) -> List[str]:
+        raise NotImplementedError
+
+    def read_with_confidence(self, img) -> Tuple[str, float]:
+        """Return ``(text, confidence)``; backends without a score report 1.0."""
+        return self.read(img), 1.0
+
+
+# 認識対象の文字（モニター表示で使われるもの）
+GLYPH_CHARS = "0123456789.:/()-"
+GLYPH_H = 24
+GLYPH_W = 16
+
+
+def binarize(img):
+    """Return a uint8 mask where text pixels are 255 (bright-on-dark or not)."""
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+    gray = cv2.normalize(gray, None, 0, 255, cv2.NORM_MINMAX)
+    _, mask = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    # 文字は背景より面積が小さい前提で、多数派を背景とみなす
+    if np.count_nonzero(mask) > mask.size / 2:
+        mask = cv2.bitwise_not(mask)
+    return mask
+
+
+def segment_glyphs(img, min_pixels: int = 2) -> List:
+    """Split a crop into per-character glyph images, left to right.
+
+    Glyphs are separated on empty columns of the binarised crop.  Every glyph
+    keeps the vertical extent of the whole text line so that small marks such
+    as ``.`` and ``:`` stay distinguishable from digits, and is padded to a
+    fixed aspect ratio before being resized to ``GLYPH_H`` x ``GLYPH_W``.
+    """
+    mask = binarize(img)
+    rows = np.flatnonzero(mask.any(axis=1))
+    if rows.size == 0:
+        return []
+    line = mask[rows[0]:rows[-1] + 1]
+    cols = line.any(axis=0)
+    glyphs = []
+    x = 0
+    width = cols.size
+    while x < width:
+        if not cols[x]:
+            x += 1
+            continue
+        start = x
+        while x < width and cols[x]:
+            x += 1
+        glyph = line[:, start:x]
+        if np.count_nonzero(glyph) < min_pixels:
+            continue
+        glyphs.append(_normalize_glyph(glyph))
+    return glyphs
+
+
+def _normalize_glyph(glyph):
+    h, w = glyph.shape
+    target_w = max(w, int(round(h * GLYPH_W / GLYPH_H)))
+    pad = target_w - w
+    glyph = cv2.copyMakeBorder(glyph, 0, 0, pad // 2, pad - pad // 2, cv2.BORDER_CONSTANT, value=0)
+    glyph = cv2.resize(glyph, (GLYPH_W, GLYPH_H), interpolation=cv2.INTER_AREA)
+    vec = glyph.astype(np.float32).ravel()
+    vec -= vec.mean()
+    norm = float(np.linalg.norm(vec))
+    return vec / norm if norm > 0 else vec
+
+
+class TemplateDigitBackend(OCRBackend):
+    """Offline recogniser for the fixed fonts of the bedside monitors.
+
+    Each glyph is compared against every stored template with normalised
+    cross-correlation; the best match gives the character and its score.  The
+    confidence of a crop is the lowest glyph score, and an empty crop reads as
+    ``""`` with confidence 0.
+    """
+
+    name = "template"
+    version = "1"
+
+    def __init__(self, chars: Sequence[str] = (), templates=None, max_per_char: int = 20) -> None:
+        self.chars = list(chars)
+        self.templates = (
+            np.asarray(templates, dtype=np.float32).reshape(len(self.chars), -1)
+            if templates is not None and len(self.chars)
+            else np.zeros((0, GLYPH_H * GLYPH_W), dtype=np.float32)
+        )
+        self.max_per_char = max_per_char
+
+    # ---- 学習 / 保存 ----
+    def fit(self, samples: Iterable[Tuple[object, str]]) -> Dict[str, int]:
+        """Add templates from ``(crop, text)`` pairs, e.g. crops OCR'd by Vision.
+
+        Only samples whose glyph count matches the length of ``text`` (after
+        dropping unsupported characters) are used.  Returns the number of
+        templates per character.
+        """
+        buckets: Dict[str, List] = {c: [] for c in self.chars}
+        for c, t in zip(self.chars, self.templates):
+            buckets.setdefault(c, []).append(t)
+        for crop, text in samples:
+            text = "".join(ch for ch in (text or "") if ch in GLYPH_CHARS)
+            if not text:
+                continue
+            glyphs = segment_glyphs(crop)
+            if len(glyphs) != len(text):
+                continue
+            for ch, g in zip(text, glyphs):
+                bucket = buckets.setdefault(ch, [])
+                if len(bucket) < self.max_per_char:
+                    bucket.append(g)
+        self.chars = [c for c, ts in buckets.items() for _ in ts]
+        rows = [t for ts in buckets.values() for t in ts]
+        self.templates = (
+            np.stack(rows).astype(np.float32)
+            if rows
+            else np.zeros((0, GLYPH_H * GLYPH_W), dtype=np.float32)
+        )
+        return {c: len(ts) for c, ts in buckets.items() if ts}
+
+    def save(self, path: Union[str, Path]) -> None:
+        np.savez_compressed(
+            str(path),
+            chars=np.array(self.chars),
+            templates=self.templates,
+            glyph_shape=np.array([GLYPH_H, GLYPH_W]),
+        )
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "TemplateDigitBackend":
+        with np.load(str(path)) as data:
+            if tuple(data["glyph_shape"]) != (GLYPH_H, GLYPH_W):
+                raise ValueError(f"template glyph size mismatch: {path}")
+            return cls([str(c) for c in data["chars"]], data["templates"])
+
+    # ---- 認識 ----
+    def read_with_confidence(self, img) -> Tuple[str, float]:
+        if img is None or getattr(img, "size", 0) == 0 or not len(self.chars):
+            return "", 0.0
+        glyphs = segment_glyphs(img)
+        if not glyphs:
+            return "", 0.0
+        scores = np.stack(glyphs) @ self.templates.T
+        best = scores.argmax(axis=1)
+        text = "".join(self.chars[i] for i in best)
+        confidence = float(scores[np.arange(len(best)), best].min())
+        return text, max(confidence, 0.0)
+
+    def read(self, img) -> str:
+        return self.read_with_confidence(img)[0]
+
+    def read_batch(self, images: Sequence) -> List[str]:
+        return [self.read(img) for img in images]
+
+
+def load_template_backend(path: Optional[Union[str, Path]]) -> TemplateDigitBackend:
+    """Load templates from ``path``; raise ``RuntimeError`` with context on failure."""
+    if not path:
+        raise RuntimeError("OCR_TEMPLATES が指定されていません")
+    try:
+        return TemplateDigitBackend.load(path)
+    except Exception as e:
+        raise RuntimeError(f"OCRテンプレート読み込み失敗: {path} -> {e}")
@@ -0,0 +1,224 @@
+"""Caches that let ``vital_reader`` skip OCR for crops it has already read.
+
+:class:`RoiOCRCache` remembers, per region of interest, the digest of the
+last preprocessed crop and its OCR text.  Settings such as PEEPset, VTset or
+FiO2 stay unchanged for hours, so most fields hit the cache and never reach
+the OCR backend.
+
+:class:`PersistentOCRCache` is a content-addressed SQLite store mapping
+``(crop digest, backend, version)`` to the OCR text.  Identical digit crops
+recur across beds and days, and the store survives restarts of
+``vital_reader``.
+"""
+from __future__ import annotations
+
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Hashable, Optional, Tuple, Union
+
+
+def crop_digest(img) -> str:
+    """Return an exact content hash of ``img`` (shape and pixel bytes)."""
+    h = hashlib.blake2b(digest_size=16)
+    if hasattr(img, "tobytes"):
+        h.update(repr((img.shape, str(img.dtype))).encode())
+        h.update(img.tobytes())
+    else:
+        h.update(repr(img).encode())
+    return h.hexdigest()
+
+
+def _field_name(key: Hashable) -> str:
+    # ``(bed, field)`` のキーはフィールド名で集計する
+    return str(key[-1]) if isinstance(key, tuple) else str(key)
+
+
+class RoiOCRCache:
+    """Reuse the previous OCR result of a ROI while its pixels are unchanged.
+
+    Only non-empty texts are stored so that a failed or timed-out read is
+    retried on the next frame.  Hits and misses are counted per field name.
+    """
+
+    def __init__(self) -> None:
+        self._entries: Dict[Hashable, Tuple[str, str]] = {}
+        self.hits: Counter = Counter()
+        self.misses: Counter = Counter()
+
+    def lookup(self, key: Hashable, digest: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == digest:
+            self.hits[_field_name(key)] += 1
+            return entry[1]
+        self.misses[_field_name(key)] += 1
+        return None
+
+    def store(self, key: Hashable, digest: str, text: str) -> None:
+        if text:
+            self._entries[key] = (digest, text)
+        else:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Return ``{field: {"hits", "misses", "hit_rate"}}``."""
+        out = {}
+        for field in sorted(set(self.hits) | set(self.misses)):
+            hits, misses = self.hits[field], self.misses[field]
+            out[field] = {"hits": hits, "misses": misses, "hit_rate": hits / (hits + misses)}
+        return out
+
+    def summary(self) -> str:
+        hits, misses = sum(self.hits.values()), sum(self.misses.values())
+        total = hits + misses
+        rate = hits / total if total else 0.0
+        return f"hits {hits} / misses {misses} (hit rate {rate:.0%})"
+
+
+class PersistentOCRCache:
+    """Disk-backed LRU cache of OCR results keyed by crop content.
+
+    Entries are keyed by ``(digest, backend, version)`` so that results of
+    different backends, or of a retrained local model, never mix.  A hit only
+    records its ``last_used`` time in memory; the times are written in one
+    batch on the next :meth:`put`, once ``touch_batch`` hits are pending or
+    ``touch_interval`` seconds have passed, and on :meth:`close`, so reads
+    never write to the database.  Every 1 % of ``max_entries`` puts the rows
+    are counted, and once the table has grown 10 % past ``max_entries`` the
+    least recently used rows are evicted.  The connection is shared between
+    threads behind a lock and uses WAL mode so several reader processes can
+    open the same file.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        max_entries: int = 200_000,
+        touch_batch: int = 1000,
+        touch_interval: float = 30.0,
+    ) -> None:
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.touch_batch = touch_batch
+        self.touch_interval = touch_interval
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._touched: Dict[Tuple[str, str, str], float] = {}
+        self._touched_since = time.monotonic()
+        self._puts_since_count = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS ocr_cache (
+                digest TEXT NOT NULL,
+                backend TEXT NOT NULL,
+                version TEXT NOT NULL,
+                text TEXT NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (digest, backend, version)
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ocr_cache_last_used ON ocr_cache(last_used)")
+        self._conn.commit()
+
+    def get(self, digest: str, backend: str, version: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT text FROM ocr_cache WHERE digest=? AND backend=? AND version=?",
+                (digest, backend, version),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._touched[(digest, backend, version)] = time.time()
+            if (
+                len(self._touched) >= self.touch_batch
+                or time.monotonic() - self._touched_since >= self.touch_interval
+            ):
+                self._flush_touches_locked()
+                self._conn.commit()
+            return row[0]
+
+    def put(self, digest: str, backend: str, version: str, text: str) -> None:
+        """Store ``text``; empty results are not cached so they get retried."""
+        if not text:
+            return
+        with self._lock:
+            self._touched.pop((digest, backend, version), None)
+            self._flush_touches_locked()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO ocr_cache(digest, backend, version, text, last_used) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (digest, backend, version, text, time.time()),
+            )
+            # 件数は他プロセスの書き込みも含めて数え直す（put のたびには数えない）
+            self._puts_since_count += 1
+            if self._puts_since_count >= max(1, self.max_entries // 100):
+                self._puts_since_count = 0
+                self._evict_locked()
+            self._conn.commit()
+
+    def flush(self) -> None:
+        """Write the pending ``last_used`` times of recent hits."""
+        with self._lock:
+            self._flush_touches_locked()
+            self._conn.commit()
+
+    def _flush_touches_locked(self) -> None:
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE ocr_cache SET last_used=? WHERE digest=? AND backend=? AND version=?",
+                [(used, *key) for key, used in self._touched.items()],
+            )
+            self._touched.clear()
+        self._touched_since = time.monotonic()
+
+    def _evict_locked(self) -> None:
+        # 上限を 1 割超えたらまとめて古いものから削除（毎回 DELETE しない）
+        count = self._conn.execute("SELECT COUNT(*) FROM ocr_cache").fetchone()[0]
+        if count <= self.max_entries * 1.1:
+            return
+        excess = count - self.max_entries
+        self._conn.execute(
+            "DELETE FROM ocr_cache WHERE rowid IN "
+            "(SELECT rowid FROM ocr_cache ORDER BY last_used LIMIT ?)",
+            (excess,),
+        )
+        self.evictions += excess
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM ocr_cache").fetchone()[0]
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "evictions": self.evictions,
+            "entries": len(self),
+        }
+
+    def summary(self) -> str:
+        st = self.stats()
+        return (
+            f"hits {st['hits']} / misses {st['misses']} (hit rate {st['hit_rate']:.0%}), "
+            f"{st['entries']} entries, {st['evictions']} evicted"
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            self._flush_touches_locked()
+            self._conn.commit()
+            self._conn.close()
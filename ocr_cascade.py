@@ -0,0 +1,140 @@
+"""Confidence-gated OCR cascade: a local recogniser first, Vision on doubt.
+
+Every field is first read by a fast local backend such as
+:class:`ocr_backends.TemplateDigitBackend`.  Only crops whose confidence is
+below the field's threshold, or whose text fails the field's format check
+(for example a BP crop that :func:`vital_reader.parse_bp_map` cannot
+split), are sent to the remote tier in one call.  Per field the cascade
+counts escalations by reason and keeps the latency of each tier.
+"""
+from __future__ import annotations
+
+import re
+import time
+from collections import Counter, defaultdict
+from typing import Callable, Dict, Hashable, Mapping, Optional
+
+from ocr_backends import OCRBackend
+
+NUMBER_RE = re.compile(r"^\d+(\.\d+)?$")
+RATIO_RE = re.compile(r"^\d+(\.\d+)?:\d+(\.\d+)?$")
+
+
+def is_number(text: str) -> bool:
+    return bool(NUMBER_RE.match(text or ""))
+
+
+def field_name(key: Hashable) -> str:
+    """Field name of a crop key (``"HR"`` or ``(bed, "HR")``)."""
+    return str(key[-1]) if isinstance(key, tuple) else str(key)
+
+
+class OCRCascade:
+    """Read crops locally and escalate doubtful ones to ``escalate``.
+
+    Parameters
+    ----------
+    local : OCRBackend
+        First tier; must provide :meth:`OCRBackend.read_with_confidence`.
+    thresholds : mapping, optional
+        Minimum confidence per field name; ``"default"`` applies to the
+        other fields.
+    validators : mapping, optional
+        ``{field: fn(text) -> bool}`` format checks; fields without an entry
+        must read as a plain number.
+
+    :meth:`read` takes the remote tier as a callable mapping
+    ``{key: crop}`` to ``{key: text}``.  If the remote tier returns nothing
+    for a field (empty response, Vision down or rejected by the circuit
+    breaker), the local text is kept only if it passes the format check,
+    i.e. it was merely below the confidence threshold; otherwise the field
+    is left blank and counted in ``blanked``.
+    """
+
+    def __init__(
+        self,
+        local: OCRBackend,
+        thresholds: Optional[Mapping[str, float]] = None,
+        validators: Optional[Mapping[str, Callable[[str], bool]]] = None,
+        default_threshold: float = 0.85,
+    ) -> None:
+        self.local = local
+        self.thresholds = dict(thresholds or {})
+        self.default_threshold = float(self.thresholds.pop("default", default_threshold))
+        self.validators = dict(validators or {})
+        self.reads: Counter = Counter()
+        self.escalations: Dict[str, Counter] = defaultdict(Counter)
+        self.blanked: Counter = Counter()
+        self.tier_time = {"local": 0.0, "remote": 0.0}
+        self.tier_calls = {"local": 0, "remote": 0}
+
+    def threshold(self, field: str) -> float:
+        return float(self.thresholds.get(field, self.default_threshold))
+
+    def valid(self, field: str, text: str) -> bool:
+        return self.validators.get(field, is_number)(text)
+
+    def read(self, crops: Mapping[Hashable, object], escalate: Callable[[Dict], Dict]) -> Dict[Hashable, str]:
+        """Return ``{key: text}`` for ``crops``, escalating doubtful fields."""
+        texts: Dict[Hashable, str] = {}
+        doubtful: Dict[Hashable, object] = {}
+        t0 = time.perf_counter()
+        for key, crop in crops.items():
+            field = field_name(key)
+            text, confidence = self.local.read_with_confidence(crop)
+            texts[key] = text
+            self.reads[field] += 1
+            if confidence < self.threshold(field):
+                self.escalations[field]["low_confidence"] += 1
+                doubtful[key] = crop
+            elif not self.valid(field, text):
+                self.escalations[field]["invalid"] += 1
+                doubtful[key] = crop
+        self.tier_time["local"] += time.perf_counter() - t0
+        self.tier_calls["local"] += len(crops)
+
+        if doubtful:
+            t0 = time.perf_counter()
+            remote = escalate(doubtful)
+            self.tier_time["remote"] += time.perf_counter() - t0
+            self.tier_calls["remote"] += 1
+            for key in doubtful:
+                if remote.get(key):
+                    texts[key] = remote[key]
+                elif not self.valid(field_name(key), texts[key]):
+                    # 形式の合わないローカルの読みは臨床データに残さない
+                    texts[key] = ""
+                    self.blanked[field_name(key)] += 1
+        return {key: texts[key] for key in crops}
+
+    # ---- 統計 ----
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Per field: ``reads``, ``escalated``, ``rate``, ``blanked`` and counts per reason."""
+        out = {}
+        for field in sorted(self.reads):
+            esc = self.escalations.get(field, Counter())
+            n = sum(esc.values())
+            out[field] = {
+                "reads": self.reads[field],
+                "escalated": n,
+                "rate": n / self.reads[field],
+                "blanked": self.blanked[field],
+                **esc,
+            }
+        return out
+
+    def summary(self) -> str:
+        reads = sum(self.reads.values())
+        escalated = sum(sum(c.values()) for c in self.escalations.values())
+        local_ms = self.tier_time["local"] / self.tier_calls["local"] * 1000 if self.tier_calls["local"] else 0.0
+        remote_ms = self.tier_time["remote"] / self.tier_calls["remote"] * 1000 if self.tier_calls["remote"] else 0.0
+        rate = escalated / reads if reads else 0.0
+        worst = sorted(self.stats().items(), key=lambda kv: -kv[1]["rate"])[:3]
+        worst_str = ", ".join(f"{f} {s['rate']:.0%}" for f, s in worst if s["escalated"])
+        blanked = sum(self.blanked.values())
+        return (
+            f"local {reads} crops ({local_ms:.1f} ms/crop), escalated {escalated} ({rate:.0%}) "
+            f"in {self.tier_calls['remote']} calls ({remote_ms:.0f} ms/call)"
+            + (f", {blanked} left blank" if blanked else "")
+            + (f"; top: {worst_str}" if worst_str else "")
+        )
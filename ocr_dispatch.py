@@ -0,0 +1,142 @@
+"""Concurrent OCR dispatch with bounded in-flight requests and deadlines.
+
+``vital_reader`` reads ~20 fields per bed.  Issuing the Vision requests one
+after another lets a single slow response stall the whole capture cycle.
+:class:`ConcurrentOCRDispatcher` runs the requests on a thread pool, keeps at
+most ``max_in_flight`` of them outstanding, gives every attempt its own
+deadline and retries failed or timed-out fields.  The whole frame has a
+deadline as well, so hung workers cannot stall it.  Fields that still have
+no result are returned as ``""`` so a frame always completes.
+"""
+from __future__ import annotations
+
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Hashable, Mapping, Optional
+
+
+class _Attempt:
+    __slots__ = ("key", "started")
+
+    def __init__(self, key: Hashable) -> None:
+        self.key = key
+        self.started: Optional[float] = None
+
+    def run(self, read_fn: Callable[[Any], str], crop: Any) -> str:
+        self.started = time.monotonic()
+        return read_fn(crop)
+
+
+class ConcurrentOCRDispatcher:
+    """Run ``read_fn(crop)`` for many crops in parallel.
+
+    Parameters
+    ----------
+    read_fn : callable
+        Function returning the OCR text of one crop.
+    max_in_flight : int, default 8
+        Maximum number of outstanding requests.
+    timeout : float, default 5.0
+        Deadline in seconds for a single attempt.
+    retries : int, default 1
+        Additional attempts after an error or a timeout.
+    frame_timeout : float, optional
+        Deadline in seconds for a whole :meth:`dispatch` call; defaults to
+        ``timeout * (retries + 1)``.  Fields still waiting for a worker or
+        running then are left blank and counted in ``stats["expired"]``.
+
+    An attempt's deadline starts when a worker picks it up, so time spent
+    waiting for a free worker does not count against it; only the frame
+    deadline bounds that wait.  A timed-out attempt
+    cannot be interrupted; it is abandoned and its result ignored, and it keeps
+    its worker until ``read_fn`` returns.  The pool has exactly
+    ``max_in_flight`` workers, so stragglers delay new attempts instead of
+    adding threads.
+    """
+
+    def __init__(
+        self,
+        read_fn: Callable[[Any], str],
+        max_in_flight: int = 8,
+        timeout: float = 5.0,
+        retries: int = 1,
+        frame_timeout: Optional[float] = None,
+    ) -> None:
+        if max_in_flight < 1:
+            raise ValueError("max_in_flight must be >= 1")
+        self.read_fn = read_fn
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self.retries = retries
+        self.frame_timeout = timeout * (retries + 1) if frame_timeout is None else frame_timeout
+        self._pool = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="ocr")
+        self.stats = {"requests": 0, "timeouts": 0, "errors": 0, "retries": 0, "blank": 0, "expired": 0}
+
+    def dispatch(self, crops: Mapping[Hashable, Any]) -> Dict[Hashable, str]:
+        """Return ``{key: text}`` for every key of ``crops``, in input order."""
+        frame_deadline = time.monotonic() + self.frame_timeout
+        pending = deque(crops)
+        attempts = {k: 0 for k in crops}
+        results: Dict[Hashable, str] = {}
+        running: Dict[Any, _Attempt] = {}
+
+        def failed(key: Hashable) -> None:
+            if attempts[key] <= self.retries:
+                self.stats["retries"] += 1
+                pending.append(key)
+
+        while pending or running:
+            while pending and len(running) < self.max_in_flight:
+                key = pending.popleft()
+                attempts[key] += 1
+                self.stats["requests"] += 1
+                attempt = _Attempt(key)
+                running[self._pool.submit(attempt.run, self.read_fn, crops[key])] = attempt
+
+            # 開始前の試行は締め切りが未定なので、最長でも timeout ごとに見直す
+            now = time.monotonic()
+            started = [a.started for a in running.values() if a.started is not None]
+            nearest = min(min(started + [now]) + self.timeout, frame_deadline)
+            done, _ = wait(
+                list(running),
+                timeout=max(0.0, nearest - now),
+                return_when=FIRST_COMPLETED,
+            )
+            for fut in done:
+                key = running.pop(fut).key
+                try:
+                    results[key] = fut.result()
+                except Exception as e:
+                    self.stats["errors"] += 1
+                    print(f"[WARN] OCR失敗 ({key}): {e}")
+                    failed(key)
+
+            now = time.monotonic()
+            for fut, attempt in list(running.items()):
+                if attempt.started is not None and attempt.started + self.timeout <= now:
+                    key = running.pop(fut).key
+                    fut.cancel()
+                    self.stats["timeouts"] += 1
+                    print(f"[WARN] OCRタイムアウト ({key})")
+                    failed(key)
+
+            if now >= frame_deadline and (pending or running):
+                # 全ワーカーが応答しなくてもフレームは締め切りで打ち切る
+                expired = list(pending) + [a.key for a in running.values()]
+                for fut in running:
+                    fut.cancel()
+                pending.clear()
+                running.clear()
+                self.stats["expired"] += len(expired)
+                print(f"[WARN] OCRフレーム締め切り超過、{len(expired)} 項目を空欄にします")
+
+        out = {}
+        for key in crops:
+            if key not in results:
+                self.stats["blank"] += 1
+            out[key] = results.get(key, "")
+        return out
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=False)
@@ -49,6 +49,14 @@ def run_drug_fluid_tabs(
     root.title("Drug & Fluid Panels")
     notebook = ttk.Notebook(root)
     notebook.pack(fill="both", expand=True)
+    # CSV へ書く各パネルで 1 つの書き込みキューを共有し、Tk スレッドでは書かない
+    write_queue = None
+    try:
+        from vitals_write_queue import VitalsWriteQueue
+
+        write_queue = VitalsWriteQueue()
+    except Exception:  # pragma: no cover - defensive
+        pass
 
     if surgery_state is not None:
         try:
@@ -70,6 +78,7 @@ def run_drug_fluid_tabs(
             topmost=topmost,
             csv_path=drug_csv_path,
             auto_log_interval=auto_log_interval,
+            write_queue=write_queue,
         )
         notebook.add(drug, text="薬剤")
     except Exception as e:  # pragma: no cover - defensive
@@ -86,6 +95,7 @@ def run_drug_fluid_tabs(
             notebook,
             topmost=topmost,
             csv_path=fluid_csv_path,
+            write_queue=write_queue,
         )
         notebook.add(fluid, text="水分")
     except Exception as e:  # pragma: no cover - defensive
@@ -98,7 +108,7 @@ def run_drug_fluid_tabs(
     try:
         from gas_panel import GasPanel
 
-        notebook.add(GasPanel(notebook), text="ガス")
+        notebook.add(GasPanel(notebook, write_queue=write_queue), text="ガス")
     except Exception as e:  # pragma: no cover - defensive
         notebook.add(
             _error_tab(notebook, f"ガスパネルを読み込めませんでした: {e}"),
@@ -109,7 +119,7 @@ def run_drug_fluid_tabs(
     try:
         from blood_gas_panel import BloodGasPanel
 
-        notebook.add(BloodGasPanel(notebook, csv_path=drug_csv_path), text="BGA")
+        notebook.add(BloodGasPanel(notebook, csv_path=drug_csv_path, write_queue=write_queue), text="BGA")
     except Exception as e:  # pragma: no cover - defensive
         notebook.add(
             _error_tab(notebook, f"BGAパネルを読み込めませんでした: {e}"),
@@ -120,7 +130,7 @@ def run_drug_fluid_tabs(
     try:
         from ph_risk_panel import PHRiskPanel
 
-        notebook.add(PHRiskPanel(notebook), text="PHリスク")
+        notebook.add(PHRiskPanel(notebook, write_queue=write_queue), text="PHリスク")
     except Exception as e:  # pragma: no cover - defensive
         notebook.add(
             _error_tab(notebook, f"PHリスクパネルを読み込めませんでした: {e}"),
@@ -201,6 +211,9 @@ def run_drug_fluid_tabs(
             pass
 
     root.mainloop()
+    if write_queue is not None:
+        write_queue.close()
+        print(f"[CSV] {write_queue.summary()}")
 
 
 def launch_drug_fluid_tabs(
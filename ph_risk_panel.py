@@ -9,7 +9,8 @@ import tkinter as tk
 from tkinter import ttk, messagebox
 from typing import Dict, Tuple, Optional
 
-from vital_reader import save_vitals_to_csv
+from vitals_csv import save_vitals_to_csv
+from vitals_write_queue import VitalsWriteQueue, WriteQueueMixin
 
 
 def score_pre_ph(
@@ -55,13 +56,20 @@ def score_current_ph(
     return total
 
 
-class PHRiskPanel(tk.Frame):
+class PHRiskPanel(WriteQueueMixin, tk.Frame):
     """Simple UI for pulmonary hypertension risk assessment."""
 
-    def __init__(self, master: tk.Misc, csv_path: Optional[str] = None, **kwargs) -> None:
+    def __init__(
+        self,
+        master: tk.Misc,
+        csv_path: Optional[str] = None,
+        write_queue: Optional[VitalsWriteQueue] = None,
+        **kwargs,
+    ) -> None:
         super().__init__(master, **kwargs)
         path = csv_path or os.getenv("VITALS_PATH")
         self.csv_path = Path(path) if path else None
+        self.write_queue = write_queue
         self.history: Dict[str, Dict[str, int]] = {}
         self.time_var = tk.StringVar()
         self._build_ui()
@@ -127,7 +135,7 @@ class PHRiskPanel(tk.Frame):
             "PH_current": current,
         }
         try:
-            save_vitals_to_csv(row, str(self.csv_path))
+            save_vitals_to_csv(row, str(self.csv_path), write_queue=self.write_queue)
         except Exception as e:  # pragma: no cover - defensive
             print(f"[WARN] CSV書き込み失敗: {e}")
 
@@ -180,9 +188,10 @@ def run_ph_risk_panel(topmost: bool = False, csv_path: Optional[str] = None) ->
             root.attributes("-topmost", True)
         except Exception:
             pass
-    panel = PHRiskPanel(root, csv_path=csv_path)
-    panel.pack(fill="both", expand=True)
-    root.mainloop()
+    with VitalsWriteQueue() as write_queue:
+        panel = PHRiskPanel(root, csv_path=csv_path, write_queue=write_queue)
+        panel.pack(fill="both", expand=True)
+        root.mainloop()
 
 
 def launch_ph_risk_panel(topmost: bool = False, csv_path: Optional[str] = None):
@@ -0,0 +1,245 @@
+"""Replay an archived ``YYYYMMDD`` screenshot folder through the OCR pipeline.
+
+Usage::
+
+    python vital_reader.py replay Z:\\image\\20250101 --bed 3 --ocr-backend mock
+    python vital_reader.py replay Z:\\image\\20250101 --beds 2,3,5 --speed 60
+
+Frames (``HHMMSS.png``, ``HHMMSS_mmm.png`` or ROI bundles) are processed in
+timestamp order, as fast as possible or ``--speed`` times faster than they
+were captured.  Each bed's rows are appended to a vitals CSV stamped with
+the capture time, so the replay doubles as a backfill, and a per-frame
+timing report is written next to it.
+
+``--ocr-backend mock`` replaces OCR with :class:`MockOCRBackend` and, without
+``--cvp-model``, CVP with :class:`MockCVPModel`, so the pipeline runs without
+any network access or model files.
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import hashlib
+import statistics
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+import vital_reader as vr
+from bed_coords import BED_COORDS_8
+from bed_coords_4 import BED_COORDS_4
+from frame_source import FRAME_PATTERNS, frame_time
+from ocr_backends import OCRBackend, load_template_backend
+from vitals_store import set_default_store
+
+REPLAY_BACKENDS = ("mock", "template", "vision")
+REPORT_COLUMNS = ["frame", "captured_at", "beds", "process_ms", "lag_ms"]
+
+
+class MockOCRBackend(OCRBackend):
+    """Deterministic stand-in for OCR: a number derived from the crop's pixels.
+
+    Identical crops always give the same text, so CSVs of two replays can be
+    diffed.  ``latency`` seconds per call emulate a remote backend.
+    """
+
+    name = "mock"
+
+    def __init__(self, latency: float = 0.0) -> None:
+        self.latency = latency
+
+    def read_batch(self, images: Sequence) -> List[str]:
+        if self.latency:
+            time.sleep(self.latency)
+        return [str(int(hashlib.blake2b(img.tobytes(), digest_size=2).hexdigest(), 16) % 200) for img in images]
+
+
+class MockCVPModel:
+    """CVP model returning uniform probabilities, i.e. always ``"na"``."""
+
+    backend = "mock"
+    input_shape = (None, 64, 64, 1)
+
+    def __call__(self, batch):
+        n = max(len(vr.index_to_label), 1)
+        return vr.np.full((len(batch), n), 1.0 / n, dtype=vr.np.float32)
+
+
+def iter_frames(folder: Path, start: Optional[str] = None, end: Optional[str] = None) -> Iterator[Tuple[Path, datetime]]:
+    """Yield ``(path, capture_time)`` for the frames of ``folder`` in time order.
+
+    ``start``/``end`` (``HHMMSS``) restrict the replay to part of the day.
+    """
+    day = folder.name
+    frames = []
+    for pattern in FRAME_PATTERNS:
+        for path in folder.glob(pattern):
+            ts = frame_time(path, day)
+            if ts is None:
+                continue
+            hms = ts.strftime("%H%M%S")
+            if (start and hms < start) or (end and hms > end):
+                continue
+            frames.append((ts, path))
+    for ts, path in sorted(frames):
+        yield path, ts
+
+
+def replay(
+    folder: Path,
+    coords_by_bed: dict,
+    csv_paths: dict,
+    report_path: Optional[Path] = None,
+    speed: Optional[float] = None,
+    mode: str = "batch",
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    limit: Optional[int] = None,
+) -> List[dict]:
+    """Run every frame of ``folder`` through the pipeline and return the timing rows.
+
+    A single bed goes through :func:`vital_reader.ocr_vitals_from_image`,
+    several beds through :func:`vital_reader.ocr_beds_from_frame` with one
+    decode per frame.  With ``speed`` the frames are paced ``speed`` times
+    faster than real time and ``lag_ms`` records how late each one started.
+    """
+    for path in csv_paths.values():
+        vr.create_empty_vitals_csv(str(path))
+    timings = []
+    wall0 = first = None
+    report = None
+    if report_path is not None:
+        report = open(report_path, "w", newline="", encoding="utf-8-sig")
+        writer = csv.DictWriter(report, fieldnames=REPORT_COLUMNS)
+        writer.writeheader()
+    try:
+        for path, ts in iter_frames(folder, start, end):
+            if limit is not None and len(timings) >= limit:
+                break
+            lag = 0.0
+            if speed:
+                if wall0 is None:
+                    wall0, first = time.perf_counter(), ts
+                due = wall0 + (ts - first).total_seconds() / speed
+                wait = due - time.perf_counter()
+                if wait > 0:
+                    time.sleep(wait)
+                lag = max(0.0, time.perf_counter() - due)
+            t0 = time.perf_counter()
+            try:
+                if len(coords_by_bed) == 1:
+                    ((bed, coords),) = coords_by_bed.items()
+                    results = {bed: vr.ocr_vitals_from_image(path, coords, mode=mode)}
+                else:
+                    img = vr.load_frame(path, coords_by_bed)
+                    results = vr.ocr_beds_from_frame(img, coords_by_bed, mode=mode) if img is not None else {}
+            except Exception as e:
+                # 壊れた画像が1枚あっても残りの再生は続ける
+                print(f"[WARN] {path.name} の読み取りに失敗: {e}")
+                results = {}
+            elapsed = time.perf_counter() - t0
+            stamp = ts.strftime("%Y-%m-%d %H:%M:%S")
+            for bed, vitals in results.items():
+                vitals["timestamp"] = stamp
+                vr.save_vitals_to_csv(vitals, csv_paths[bed])
+            row = {
+                "frame": path.name,
+                "captured_at": stamp,
+                "beds": len(results),
+                "process_ms": round(elapsed * 1000, 2),
+                "lag_ms": round(lag * 1000, 2),
+            }
+            timings.append(row)
+            if report is not None:
+                writer.writerow(row)
+    finally:
+        if report is not None:
+            report.close()
+    return timings
+
+
+def summarize(timings: List[dict], wall: float) -> str:
+    if not timings:
+        return "no frames"
+    ms = sorted(t["process_ms"] for t in timings)
+    p95 = ms[min(len(ms) - 1, int(0.95 * len(ms)))]
+    return (
+        f"{len(ms)} frames in {wall:.1f} s ({len(ms) / wall:.2f} frames/s), "
+        f"per frame p50 {statistics.median(ms):.0f} / p95 {p95:.0f} / max {ms[-1]:.0f} ms"
+    )
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="vital_reader.py replay", description=__doc__.split("\n\n")[0])
+    parser.add_argument("folder", help="YYYYMMDD の画像フォルダ")
+    parser.add_argument("--display", choices=["4", "8"], default="8", help="画面分割 (既定: 8)")
+    parser.add_argument("--bed", help="対象ベッド番号（1ベッド）")
+    parser.add_argument("--beds", help="対象ベッド番号（例: 2,3,5、all で全ベッド）")
+    parser.add_argument("--speed", type=float, help="撮影時の何倍速で再生するか（省略時: 最速）")
+    parser.add_argument("--ocr-backend", choices=REPLAY_BACKENDS, default="mock", help="既定: mock（ネットワーク不要）")
+    parser.add_argument("--ocr-mode", choices=vr.OCR_MODES, default="batch")
+    parser.add_argument("--ocr-templates", help="--ocr-backend template のテンプレート (.npz)")
+    parser.add_argument("--mock-latency", type=float, default=0.0, help="mock: 1回のOCR呼び出しの擬似遅延（秒）")
+    parser.add_argument("--cvp-model", help="CVPモデル（省略時は mock で常に na）")
+    parser.add_argument("--service-account-file", help="--ocr-backend vision のサービスアカウント")
+    parser.add_argument("--config", help="Path to config JSON file")
+    parser.add_argument("--start", help="開始時刻 HHMMSS")
+    parser.add_argument("--end", help="終了時刻 HHMMSS")
+    parser.add_argument("--limit", type=int, help="処理するフレーム数の上限")
+    parser.add_argument("--out-dir", help="CSVとタイミングレポートの出力先（既定: ./replay_YYYYMMDD）")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    folder = Path(args.folder).expanduser()
+    if not folder.is_dir():
+        print(f"フォルダが見つかりません: {folder}")
+        return 1
+    table = BED_COORDS_4 if args.display == "4" else BED_COORDS_8
+    if args.beds == "all":
+        beds = sorted(table)
+    elif args.beds:
+        beds = [int(b) for b in args.beds.split(",")]
+    elif args.bed:
+        beds = [int(args.bed)]
+    else:
+        beds = [sorted(table)[0]]
+    coords_by_bed = {bed: table[bed] for bed in beds}
+
+    config = vr.load_config(args.config)
+    # 再生した行を運用中の VITALS_DB に混ぜない
+    set_default_store(None)
+    if args.cvp_model:
+        vr.cvp_model = vr.load_cvp_model(Path(args.cvp_model))
+    else:
+        vr.cvp_model = MockCVPModel()
+    if args.ocr_backend == "mock":
+        vr.ocr_backend = MockOCRBackend(args.mock_latency)
+    elif args.ocr_backend == "template":
+        vr.ocr_backend = load_template_backend(
+            vr.resolve_path(args.ocr_templates, "OCR_TEMPLATES", config, "OCR_TEMPLATES",
+                            candidates=vr.DEFAULT_OCR_TEMPLATE_CANDIDATES)
+        )
+    else:
+        sa = vr.resolve_path(args.service_account_file, "SERVICE_ACCOUNT_FILE", config, "SERVICE_ACCOUNT_FILE",
+                             candidates=vr.DEFAULT_SA_JSON_CANDIDATES)
+        credentials = vr.service_account.Credentials.from_service_account_file(str(sa))
+        vr.client = vr.ResilientVisionClient(vr.vision.ImageAnnotatorClient(credentials=credentials))
+
+    out_dir = Path(args.out_dir) if args.out_dir else Path(f"replay_{folder.name}")
+    out_dir.mkdir(parents=True, exist_ok=True)
+    csv_paths = {bed: str(out_dir / f"vitals_history_{bed}.csv") for bed in beds}
+    report_path = out_dir / "replay_timing.csv"
+    print(f"[REPLAY] {folder} -> {out_dir} (beds {beds}, OCR {args.ocr_backend}, "
+          f"{'最速' if not args.speed else f'{args.speed}倍速'})")
+
+    t0 = time.perf_counter()
+    timings = replay(
+        folder, coords_by_bed, csv_paths, report_path,
+        speed=args.speed, mode=args.ocr_mode, start=args.start, end=args.end, limit=args.limit,
+    )
+    print(f"[REPLAY] {summarize(timings, time.perf_counter() - t0)}")
+    print(f"[REPLAY] タイミングレポート: {report_path}")
+    return 0
@@ -0,0 +1,160 @@
+"""Per-frame bundles holding only the regions ``vital_reader`` reads.
+
+Only the rectangles of ``bed_coords.py`` and ``bed_coords_4.py`` are ever
+OCR'd, yet a full-screen PNG is written, copied to the share and decoded
+for every frame.  ``auto_capture.py --roi-bundle`` instead crops those
+rectangles at capture time and stores them in one ``.npz`` file:
+
+``frame_shape``
+    ``(height, width, channels)`` of the captured screen.
+``rects``
+    ``int32[N, 4]`` rectangles ``(x, y, w, h)``, clipped to the screen.
+``data``
+    The crops' BGR pixels, flattened and concatenated in ``rects`` order.
+``timestamp_ns``
+    Capture time in nanoseconds since the epoch.
+
+:meth:`RoiBundle.to_frame` pastes the crops into an otherwise black frame,
+so the regular cropping code in ``vital_reader`` works unchanged.
+"""
+from __future__ import annotations
+
+import os
+import time
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+try:  # pragma: no cover - optional dependency
+    import numpy as np  # type: ignore
+except Exception:  # pragma: no cover
+    np = None
+
+from bed_coords import BED_COORDS_8
+from bed_coords_4 import BED_COORDS_4
+
+ROI_BUNDLE_SUFFIX = ".npz"
+ROI_DISPLAYS = ("8", "4", "all")
+_ZIP_EOCD = b"PK\x05\x06"
+
+Rect = Tuple[int, int, int, int]
+
+
+def iter_rects(coords) -> Iterator[Rect]:
+    """Yield every ``(x, y, w, h)`` rectangle in a bed coordinate table."""
+    if isinstance(coords, dict):
+        for value in coords.values():
+            yield from iter_rects(value)
+    elif isinstance(coords, (list, tuple)):
+        if len(coords) == 4 and all(isinstance(v, int) for v in coords):
+            yield tuple(coords)
+        else:
+            for value in coords:
+                yield from iter_rects(value)
+
+
+def display_rects(display: str = "all") -> List[Rect]:
+    """Return the unique rectangles of all beds of ``display`` ("8", "4" or "all")."""
+    if display not in ROI_DISPLAYS:
+        raise ValueError(f"unknown display: {display}")
+    tables = {"8": [BED_COORDS_8], "4": [BED_COORDS_4], "all": [BED_COORDS_8, BED_COORDS_4]}[display]
+    return sorted({r for table in tables for r in iter_rects(table)})
+
+
+def _clip(rect: Rect, height: int, width: int) -> Optional[Rect]:
+    x, y, w, h = rect
+    x0, y0 = max(x, 0), max(y, 0)
+    x1, y1 = min(x + w, width), min(y + h, height)
+    if x1 <= x0 or y1 <= y0:
+        return None
+    return x0, y0, x1 - x0, y1 - y0
+
+
+class RoiBundle:
+    """Crops of a set of rectangles taken from one captured frame."""
+
+    def __init__(self, frame_shape, rects, data, timestamp_ns: int = 0) -> None:
+        self.frame_shape = tuple(int(v) for v in frame_shape)
+        self.rects = np.asarray(rects, dtype=np.int32).reshape(-1, 4)
+        self.data = np.asarray(data, dtype=np.uint8).ravel()
+        self.timestamp_ns = int(timestamp_ns)
+
+    @classmethod
+    def from_frame(cls, frame, rects: Iterable[Rect], timestamp_ns: Optional[int] = None) -> "RoiBundle":
+        """Crop ``rects`` out of the BGR ``frame``."""
+        height, width = frame.shape[:2]
+        kept = [c for c in (_clip(r, height, width) for r in rects) if c is not None]
+        parts = [frame[y:y + h, x:x + w].ravel() for x, y, w, h in kept]
+        data = np.concatenate(parts) if parts else np.zeros(0, dtype=np.uint8)
+        return cls(frame.shape, kept, data, time.time_ns() if timestamp_ns is None else timestamp_ns)
+
+    def crops(self) -> Iterator[Tuple[Rect, "np.ndarray"]]:
+        channels = self.frame_shape[2:] if len(self.frame_shape) > 2 else ()
+        offset = 0
+        for x, y, w, h in self.rects.tolist():
+            size = h * w * int(np.prod(channels, dtype=np.int64))
+            yield (x, y, w, h), self.data[offset:offset + size].reshape((h, w) + channels)
+            offset += size
+
+    def covers(self, rects: Iterable[Rect]) -> bool:
+        """True if every rectangle of ``rects`` lies inside a stored crop."""
+        stored = self.rects.tolist()
+        for x, y, w, h in rects:
+            if not any(
+                sx <= x and sy <= y and x + w <= sx + sw and y + h <= sy + sh
+                for sx, sy, sw, sh in stored
+            ):
+                return False
+        return True
+
+    def to_frame(self):
+        """Return a full-size frame with the crops pasted onto black."""
+        frame = np.zeros(self.frame_shape, dtype=np.uint8)
+        for (x, y, w, h), crop in self.crops():
+            frame[y:y + h, x:x + w] = crop
+        return frame
+
+    def save(self, path: Union[str, Path], compress: bool = True) -> Path:
+        """Write the bundle atomically (temporary file, then rename)."""
+        path = Path(path)
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "wb") as f:
+            (np.savez_compressed if compress else np.savez)(
+                f,
+                frame_shape=np.asarray(self.frame_shape, dtype=np.int32),
+                rects=self.rects,
+                data=self.data,
+                timestamp_ns=np.asarray(self.timestamp_ns, dtype=np.int64),
+            )
+        os.replace(tmp, path)
+        return path
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "RoiBundle":
+        with np.load(str(path)) as z:
+            return cls(z["frame_shape"], z["rects"], z["data"], int(z["timestamp_ns"]))
+
+
+def is_complete_bundle(path: Union[str, Path]) -> bool:
+    """Return True once ``path`` ends with the zip end-of-central-directory record."""
+    try:
+        with open(path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() < 22:
+                return False
+            f.seek(-22, os.SEEK_END)
+            return f.read(4) == _ZIP_EOCD
+    except OSError:
+        return False
+
+
+def bed_rects(coords_by_bed) -> List[Rect]:
+    """Rectangles read by ``vital_reader`` for ``{bed: coords}``."""
+    return [r for coords in coords_by_bed.values() for r in iter_rects(coords)]
+
+
+def load_frame(path: Union[str, Path], required: Sequence[Rect] = ()):
+    """Load a bundle as a full-size frame; warn if ``required`` is not covered."""
+    bundle = RoiBundle.load(path)
+    if required and not bundle.covers(required):
+        print(f"[WARN] ROIバンドルに必要な領域が含まれていません: {path}")
+    return bundle.to_frame()
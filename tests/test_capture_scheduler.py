@@ -0,0 +1,54 @@
+import threading
+import time
+
+from capture_scheduler import CaptureScheduler
+
+
+def test_deadlines_do_not_drift_with_slow_encoder():
+    starts = []
+    encoded = []
+
+    def capture():
+        starts.append(time.monotonic())
+        return len(starts)
+
+    def handle(item):
+        time.sleep(0.08)  # 周期より長いエンコードでも撮影は遅れない
+        encoded.append(item)
+
+    sched = CaptureScheduler(0.05, capture, handle, workers=2, max_pending=20)
+    sched.run(max_frames=10)
+    sched.close()
+    elapsed = starts[-1] - starts[0]
+    # 同期保存なら 10 * (0.05 + 0.08) 秒かかる
+    assert 9 * 0.05 - 0.01 < elapsed < 9 * 0.05 + 0.05
+    assert sorted(encoded) == list(range(1, 11))
+    st = sched.stats()
+    assert st["frames"] == 10 and st["dropped"] == 0
+    assert st["jitter_p50_ms"] < 20
+
+
+def test_missed_deadlines_are_skipped_not_bunched():
+    calls = []
+
+    def capture():
+        calls.append(time.monotonic())
+        if len(calls) == 2:
+            time.sleep(0.055)  # 次の周期を丸ごと逃す撮影
+        return None
+
+    sched = CaptureScheduler(0.02, capture)
+    sched.run(max_frames=4)
+    assert sched.missed >= 1
+    # 遅れを連写で取り戻さず、元の時刻グリッド (t0 + k*interval) に戻る
+    assert abs((calls[3] - calls[0]) - 4 * 0.02) < 0.01
+
+
+def test_full_queue_drops_frames():
+    release = threading.Event()
+    sched = CaptureScheduler(0.005, lambda: 1, lambda item: release.wait(2), workers=1, max_pending=1)
+    sched.run(max_frames=6)
+    release.set()
+    sched.close()
+    assert sched.dropped >= 3
+    assert sched.encoded + sched.dropped == 6
@@ -0,0 +1,86 @@
+import csv
+import importlib.machinery
+import multiprocessing as mp
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+from vitals_csv import csv_write_lock, save_vitals_to_csv
+
+ROWS = 60
+
+
+def write_rows(kind, path, barrier):
+    """One writer process: the reader, the gas panel, the drug panel or the fluid panel."""
+    path = Path(path)
+    barrier.wait()
+    for i in range(ROWS):
+        if kind == "reader":
+            save_vitals_to_csv({"timestamp": f"R{i:03d}", "SBP": 100 + i}, str(path))
+        elif kind == "gas":
+            # 5 行ごとに新しい列を足して書き直し（compaction）も起こす
+            save_vitals_to_csv({"timestamp": f"G{i:03d}", "pH": 7.3, f"gas{i // 5}": i}, str(path))
+        elif kind == "drug":
+            import drug_panel
+
+            panel = drug_panel.DrugPanel.__new__(drug_panel.DrugPanel)
+            panel.csv_path = path
+            panel._append_to_csv(datetime(2024, 1, 1) + timedelta(seconds=i), {f"drug{i // 5}": 0.1})
+        else:
+            import fluid_panel
+
+            panel = fluid_panel.FluidPanel.__new__(fluid_panel.FluidPanel)
+            panel.csv_path = path
+            panel._append_to_csv(f"F{i:03d}", {"in_total": float(i)})
+
+
+def test_lock_is_reentrant_and_excludes_other_threads(tmp_path):
+    path = tmp_path / "vitals.csv"
+    order = []
+
+    def other():
+        with csv_write_lock(path):
+            order.append("other")
+
+    with csv_write_lock(path):
+        with csv_write_lock(str(path)):
+            t = threading.Thread(target=other)
+            t.start()
+            time.sleep(0.1)
+            order.append("main")
+    t.join(5)
+    assert order == ["main", "other"]
+    assert (tmp_path / "vitals.csv.lock").exists()
+
+
+def test_concurrent_writers_lose_no_rows(tmp_path):
+    if importlib.machinery.PathFinder.find_spec("pandas") is None:
+        pytest.skip("fluid_panel needs pandas")
+    path = tmp_path / "vitals_history_2.csv"
+    kinds = ["reader", "gas", "drug", "fluid"]
+    # 子プロセスはスタブではない本物のモジュールを読み込むよう spawn で起動する
+    ctx = mp.get_context("spawn")
+    barrier = ctx.Barrier(len(kinds))
+    procs = [ctx.Process(target=write_rows, args=(kind, str(path), barrier)) for kind in kinds]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join(120)
+        assert p.exitcode == 0
+
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.DictReader(f)
+        rows = list(reader)
+        header = reader.fieldnames
+    expected = (
+        {f"R{i:03d}" for i in range(ROWS)}
+        | {f"G{i:03d}" for i in range(ROWS)}
+        | {(datetime(2024, 1, 1) + timedelta(seconds=i)).strftime("%Y-%m-%d %H:%M:%S") for i in range(ROWS)}
+        | {f"F{i:03d}:00" for i in range(ROWS)}
+    )
+    assert sorted(r["timestamp"] for r in rows) == sorted(expected)
+    assert {"gas3", "drug3", "in_total"} <= set(header)
+    assert not path.with_name(path.name + ".tmp").exists()
@@ -0,0 +1,44 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("cv2")
+
+import vital_reader
+
+
+class FakeCVPModel:
+    input_shape = (None, 64, 64, 3)
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, batch):
+        self.calls.append(batch.shape)
+        probs = np.full((len(batch), 16), 0.01, dtype=np.float32)
+        for i, img in enumerate(batch):
+            # 明るい画素が多いほど大きいクラスにする（平均値でクラスを決める）
+            probs[i, min(int(img.mean() * 15), 15)] = 0.85 if i % 2 == 0 else 0.5
+        return probs
+
+
+def test_predict_cvp_batch_single_forward_pass(monkeypatch):
+    model = FakeCVPModel()
+    monkeypatch.setattr(vital_reader, "cvp_model", model)
+    monkeypatch.setattr(vital_reader, "index_to_label", {i: str(i) for i in range(16)})
+    rng = np.random.default_rng(0)
+    crops = [rng.integers(0, 256, size=(33, 35, 3), dtype=np.uint8) for _ in range(4)]
+
+    out = vital_reader.predict_cvp_batch(crops)
+
+    assert model.calls == [(4, 64, 64, 3)]
+    assert len(out) == 4
+    assert out[0][1] == pytest.approx(0.85)
+    assert out[1] == ("na", pytest.approx(0.5))
+    assert vital_reader.predict_cvp_from_image(crops[0]) == out[0][0]
+    assert vital_reader.predict_cvp_batch([]) == []
+
+
+def test_predict_cvp_batch_requires_4d_model(monkeypatch):
+    monkeypatch.setattr(vital_reader, "cvp_model", object())
+    with pytest.raises(RuntimeError):
+        vital_reader.predict_cvp_batch([np.zeros((4, 4, 3), dtype=np.uint8)])
@@ -0,0 +1,76 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("cv2")
+
+import vital_reader
+from cvp_runtime import load_cvp_model
+
+
+def make_onnx_classifier(path, h=8, w=8, c=1, classes=16):
+    onnx = pytest.importorskip("onnx")
+    pytest.importorskip("onnxruntime")
+    from onnx import TensorProto, helper, numpy_helper
+
+    rng = np.random.default_rng(0)
+    weights = rng.normal(size=(h * w * c, classes)).astype(np.float32)
+    graph = helper.make_graph(
+        [
+            helper.make_node("Flatten", ["input"], ["flat"], axis=1),
+            helper.make_node("MatMul", ["flat", "W"], ["logits"]),
+            helper.make_node("Softmax", ["logits"], ["probs"], axis=1),
+        ],
+        "cvp",
+        [helper.make_tensor_value_info("input", TensorProto.FLOAT, ["N", h, w, c])],
+        [helper.make_tensor_value_info("probs", TensorProto.FLOAT, ["N", classes])],
+        initializer=[numpy_helper.from_array(weights, "W")],
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)])
+    model.ir_version = 8
+    onnx.save(model, str(path))
+    return weights
+
+
+def test_onnx_backend_selected_by_suffix_and_batched(tmp_path, monkeypatch):
+    path = tmp_path / "cvp_model.onnx"
+    weights = make_onnx_classifier(path)
+    model = load_cvp_model(path)
+    assert model.backend == "onnx"
+    assert model.input_shape == (None, 8, 8, 1)
+
+    rng = np.random.default_rng(1)
+    crops = [rng.integers(0, 256, size=(33, 35, 3), dtype=np.uint8) for _ in range(3)]
+    x = np.stack([vital_reader.preprocess_cvp_crop(c, model.input_shape) for c in crops])
+    probs = model(x)
+    assert probs.shape == (3, 16)
+    np.testing.assert_allclose(probs.sum(axis=1), 1.0, rtol=1e-5)
+    assert (probs.argmax(axis=1) == (x.reshape(3, -1) @ weights).argmax(axis=1)).all()
+
+    monkeypatch.setattr(vital_reader, "cvp_model", model)
+    monkeypatch.setattr(vital_reader, "CVP_CONFIDENCE_THRESHOLD", 0.0)
+    labels = [label for label, _ in vital_reader.predict_cvp_batch(crops)]
+    assert labels == [vital_reader.index_to_label.get(int(i), "") for i in probs.argmax(axis=1)]
+
+
+def test_keras_and_onnx_labels_match(tmp_path):
+    tf = pytest.importorskip("tensorflow")
+    pytest.importorskip("tf2onnx")
+    pytest.importorskip("onnxruntime")
+    from export_cvp_model import check_parity, export_onnx, load_sample_crops
+
+    model = tf.keras.Sequential([
+        tf.keras.layers.Input(shape=(64, 64, 3)),
+        tf.keras.layers.Conv2D(4, (3, 3), activation="relu"),
+        tf.keras.layers.MaxPooling2D(2, 2),
+        tf.keras.layers.Flatten(),
+        tf.keras.layers.Dense(16, activation="softmax"),
+    ])
+    keras_path = tmp_path / "cvp_model.keras"
+    model.save(keras_path)
+    onnx_path = export_onnx(keras_path, tmp_path / "cvp_model.onnx")
+
+    same, total, max_diff = check_parity(
+        load_cvp_model(keras_path), load_cvp_model(onnx_path), load_sample_crops(n_random=16)
+    )
+    assert same == total == 16
+    assert max_diff < 1e-4
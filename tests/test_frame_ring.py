@@ -0,0 +1,164 @@
+import multiprocessing
+import uuid
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from frame_ring import FrameRing
+
+
+def ring_name():
+    return f"vr_test_{uuid.uuid4().hex[:8]}"
+
+
+def test_write_read_and_overwrite():
+    with FrameRing.create(ring_name(), (4, 6, 3), slots=2) as ring:
+        assert ring.latest_seq == 0
+        assert ring.read() is None
+        first = np.full((4, 6, 3), 1, dtype=np.uint8)
+        assert ring.write(first, timestamp_ns=123) == 1
+        frame = ring.read()
+        assert (frame.seq, frame.timestamp_ns) == (1, 123)
+        assert (frame.image == 1).all()
+        assert not frame.image.flags.owndata  # 共有メモリ上のビュー
+
+        ring.write(first * 2)
+        assert ring.is_intact(frame)
+        ring.write(first * 3)  # スロット数2なので seq 1 は上書きされる
+        assert not ring.is_intact(frame)
+        assert ring.read(1) is None
+        assert (ring.copy().image == 3).all()
+        with pytest.raises(ValueError):
+            ring.write(np.zeros((2, 2, 3), dtype=np.uint8))
+
+
+def _writer(name, ready, done, n):
+    with FrameRing.create(name, (8, 8, 3), slots=4) as ring:
+        for i in range(1, n + 1):
+            ring.write(np.full((8, 8, 3), i, dtype=np.uint8))
+        ready.set()
+        done.wait(10)
+
+
+def test_reader_in_other_process_sees_frames_in_order():
+    name = ring_name()
+    ctx = multiprocessing.get_context("spawn")
+    ready, done = ctx.Event(), ctx.Event()
+    proc = ctx.Process(target=_writer, args=(name, ready, done, 3))
+    proc.start()
+    try:
+        assert ready.wait(10)
+        ring = FrameRing.attach(name, wait=5)
+        assert ring.wait_next(2, timeout=5) == 3
+        frame = ring.read()
+        assert frame.image[0, 0, 0] == 3
+        assert ring.is_intact(frame)
+        del frame
+        ring.close()
+    finally:
+        done.set()
+        proc.join(10)
+    assert proc.exitcode == 0
+
+
+def test_ring_source_and_reader_crop_from_shared_memory(tmp_path, monkeypatch):
+    pytest.importorskip("cv2")
+    import vital_reader
+    from frame_ring import RingFrameSource
+
+    monkeypatch.setattr(
+        vital_reader,
+        "ocr_beds_from_frame",
+        lambda img, coords_by_bed, mode: {bed: {"HR": str(int(img[0, 0, 0]))} for bed in coords_by_bed},
+    )
+    ring = FrameRing.create(ring_name(), (4, 4, 3), slots=4)
+    ring.write(np.full((4, 4, 3), 7, dtype=np.uint8), timestamp_ns=1_700_000_000 * 10**9)
+    with RingFrameSource(ring) as source:
+        seq = source.get(timeout=0)
+        assert seq == 1
+        assert source.get(timeout=0) is None
+        csv_path = str(tmp_path / "vitals.csv")
+        results = vital_reader.read_beds_from_ring(ring, seq, {2: {"CVP_COORDS": (0, 0, 2, 2)}}, {2: csv_path})
+        assert results[2]["HR"] == "7"
+        with open(csv_path, encoding="utf-8-sig") as f:
+            assert "7" in f.read()
+
+        ring.write(np.zeros((4, 4, 3), dtype=np.uint8))
+        ring.write(np.zeros((4, 4, 3), dtype=np.uint8))
+        assert source.get(timeout=0) == 3
+        assert source.stats == {"frames": 2, "skipped": 1, "reattached": 0}
+
+
+def test_reader_keeps_results_when_slot_is_rewritten_during_ocr(tmp_path, monkeypatch):
+    pytest.importorskip("cv2")
+    import vital_reader
+
+    ring = FrameRing.create(ring_name(), (4, 4, 3), slots=2)
+
+    def slow_ocr(img, coords_by_bed, mode):
+        # OCR 中に writer がリングを一周してスロットを上書きする
+        for _ in range(2):
+            ring.write(np.zeros((4, 4, 3), dtype=np.uint8))
+        return {bed: {"HR": str(int(img[0, 0, 0]))} for bed in coords_by_bed}
+
+    monkeypatch.setattr(vital_reader, "ocr_beds_from_frame", slow_ocr)
+    seq = ring.write(np.full((4, 4, 3), 9, dtype=np.uint8))
+    csv_path = str(tmp_path / "vitals.csv")
+    results = vital_reader.read_beds_from_ring(ring, seq, {2: {"CVP_COORDS": (0, 0, 2, 2)}}, {2: csv_path})
+    assert results[2]["HR"] == "9"
+    ring.close()
+
+
+def test_source_reattaches_after_writer_restart(monkeypatch):
+    from frame_ring import RingFrameSource
+
+    name = ring_name()
+    crashed = FrameRing.create(name, (4, 4, 3), slots=2)
+    crashed.write(np.full((4, 4, 3), 1, dtype=np.uint8))
+    source = RingFrameSource(FrameRing.attach(name), check_interval=0.05).start()
+    assert source.get(timeout=0) == 1
+
+    # writer が close せずに落ち、同じ名前で再起動した
+    restarted = FrameRing.create(name, (4, 4, 3), slots=2)
+    assert crashed.generation == 0
+    restarted.write(np.full((4, 4, 3), 5, dtype=np.uint8))
+    assert source.get(timeout=2) == 1
+    assert source.ring.generation == restarted.generation
+    assert source.ring.read(1).image[0, 0, 0] == 5
+    assert source.stats["reattached"] == 1
+
+    # 正常終了したあと再起動した場合も追従する
+    restarted.close()
+    assert source.get(timeout=0.2) is None
+    again = FrameRing.create(name, (4, 4, 3), slots=2)
+    again.write(np.full((4, 4, 3), 9, dtype=np.uint8))
+    assert source.get(timeout=2) == 1
+    assert source.ring.read(1).image[0, 0, 0] == 9
+    assert source.stats["reattached"] == 2
+    source.stop()
+    again.close()
+    crashed.owner = False
+    crashed.close()
+
+
+def test_windows_writer_reuses_existing_block(monkeypatch):
+    import frame_ring
+
+    monkeypatch.setattr(frame_ring, "_WINDOWS", True)
+    name = ring_name()
+    old = FrameRing.create(name, (4, 4, 3), slots=2)
+    old.write(np.full((4, 4, 3), 1, dtype=np.uint8))
+    reader = FrameRing.attach(name)
+    # unlink できない環境では同じブロックを初期化し直して使う
+    new = FrameRing.create(name, (4, 4, 3), slots=2)
+    assert new.generation != 0 and new.latest_seq == 0
+    assert reader.generation == new.generation
+    with pytest.raises(RuntimeError):
+        FrameRing.create(name, (64, 64, 3), slots=2)
+    assert new.generation != 0
+    reader.close()
+    new.owner = False
+    new.close()
+    monkeypatch.setattr(frame_ring, "_WINDOWS", False)
+    old.close()
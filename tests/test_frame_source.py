@@ -0,0 +1,112 @@
+import threading
+import time
+from datetime import datetime
+
+import pytest
+
+from frame_source import PNG_IEND, PNG_SIGNATURE, FrameSource, frame_time, is_complete_png
+
+
+def write_png(path, complete=True):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(PNG_SIGNATURE + b"\x00" * 32 + (PNG_IEND if complete else b""))
+
+
+def test_is_complete_png(tmp_path):
+    write_png(tmp_path / "a.png", complete=False)
+    assert not is_complete_png(tmp_path / "a.png")
+    write_png(tmp_path / "a.png")
+    assert is_complete_png(tmp_path / "a.png")
+    assert not is_complete_png(tmp_path / "missing.png")
+
+
+def test_poll_source_hands_out_frames_in_order(tmp_path):
+    write_png(tmp_path / "090000.png")
+    write_png(tmp_path / "090100.png")
+    src = FrameSource(tmp_path, mode="poll", poll_interval=0.01).start()
+    assert src.get(timeout=0.5).name == "090100.png"
+
+    # 溜まったフレームは読み飛ばさず古い順に出す
+    for name in ("090200.png", "090300.png", "090400.png"):
+        write_png(tmp_path / name)
+    assert [src.get(timeout=0.5).name for _ in range(3)] == ["090200.png", "090300.png", "090400.png"]
+    assert src.stats["skipped"] == 0
+
+    # 古いフレームが書き込み中なら、完了済みの新しいフレームも待たせる
+    write_png(tmp_path / "090500.png", complete=False)
+    write_png(tmp_path / "090600.png")
+    assert src.get(timeout=0.1) is None
+    write_png(tmp_path / "090500.png")
+    assert src.get(timeout=0.5).name == "090500.png"
+    assert src.get(timeout=0.5).name == "090600.png"
+    assert src.get(timeout=0.05) is None
+    assert src.stats["frames"] == 6
+
+
+def test_poll_source_skips_to_newest_without_repeats(tmp_path):
+    write_png(tmp_path / "090000.png")
+    write_png(tmp_path / "090100.png")
+    src = FrameSource(tmp_path, mode="poll", poll_interval=0.01, skip_to_latest=True).start()
+    # 起動時は最新の1枚だけ
+    assert src.get(timeout=0.5).name == "090100.png"
+    assert src.get(timeout=0.05) is None
+
+    # 処理が遅れて溜まったら最新まで読み飛ばす
+    for name in ("090200.png", "090300.png", "090400.png"):
+        write_png(tmp_path / name)
+    assert src.get(timeout=0.5).name == "090400.png"
+    assert src.stats["skipped"] == 2
+
+    # 最新がまだ書き込み中なら完了済みの方を先に出し、完了後に最新を出す
+    write_png(tmp_path / "090600.png", complete=False)
+    write_png(tmp_path / "090500.png")
+    assert src.get(timeout=0.5).name == "090500.png"
+    write_png(tmp_path / "090600.png")
+    assert src.get(timeout=0.5).name == "090600.png"
+
+    write_png(tmp_path / "085900.png")  # 遅れて現れた古いフレーム
+    (tmp_path / "090600.png").touch()
+    assert src.get(timeout=0.05) is None
+    assert src.stats["frames"] == 4
+
+
+def test_incomplete_frame_is_dropped_after_timeout(tmp_path):
+    src = FrameSource(tmp_path, mode="poll", poll_interval=0.01, incomplete_timeout=0.05).start()
+    write_png(tmp_path / "100100.png", complete=False)
+    assert src.get(timeout=0.3) is None
+    assert src.stats["dropped_incomplete"] == 1
+    write_png(tmp_path / "100200.png")
+    assert src.get(timeout=1.0).name == "100200.png"
+
+
+def test_frame_time_from_day_folder_and_name(tmp_path):
+    assert frame_time(tmp_path / "20240101" / "235959.png") == datetime(2024, 1, 1, 23, 59, 59)
+    assert frame_time(tmp_path / "20240101" / "090000_250.npz") == datetime(2024, 1, 1, 9, 0, 0, 250000)
+    assert frame_time(tmp_path / "090000.png", day="20240102") == datetime(2024, 1, 2, 9, 0)
+    assert frame_time(tmp_path / "images" / "090000.png") is None
+    assert frame_time(tmp_path / "20240101" / "latest.png") is None
+
+
+def test_recursive_source_follows_day_folders(tmp_path):
+    write_png(tmp_path / "20240101" / "235900.png")
+    src = FrameSource(tmp_path, mode="poll", poll_interval=0.01, recursive=True).start()
+    assert src.get(timeout=0.5) == tmp_path / "20240101" / "235900.png"
+    write_png(tmp_path / "20240102" / "000000.png")
+    assert src.get(timeout=0.5) == tmp_path / "20240102" / "000000.png"
+
+
+def test_watch_source_reacts_quickly(tmp_path):
+    pytest.importorskip("watchdog")
+    with FrameSource(tmp_path, mode="watch", rescan_interval=60) as src:
+        t0 = []
+
+        def writer():
+            time.sleep(0.1)
+            t0.append(time.monotonic())
+            write_png(tmp_path / "120000.png")
+
+        threading.Thread(target=writer).start()
+        path = src.get(timeout=5)
+        latency = time.monotonic() - t0[0]
+    assert path.name == "120000.png"
+    assert latency < 0.5
@@ -0,0 +1,93 @@
+import csv
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("cv2")
+
+import vital_reader
+from bed_coords import BED_COORDS_8
+from bed_coords_4 import BED_COORDS_4
+from frozen_frame import FrozenFrameDetector, waveform_region
+from roi_bundle import RoiBundle, display_rects
+
+
+def screen(seed=0):
+    return np.random.default_rng(seed).integers(0, 255, (1440, 1920, 3), dtype=np.uint8)
+
+
+def scroll_waveform(img, bed, value):
+    x, y, w, h = waveform_region(BED_COORDS_8[bed])
+    img = img.copy()
+    img[y:y + h, x:x + w] = value
+    img[y + h // 2, x + w // 2] = 255 - value
+    return img
+
+
+def test_detector_counts_repeats_per_bed(capsys):
+    det = FrozenFrameDetector(warn_after=2)
+    coords = BED_COORDS_8[2]
+    img = screen()
+    assert [det.check(2, img, coords) for _ in range(3)] == [0, 1, 2]
+    assert [det.is_frozen(n) for n in (0, 1, 2)] == [False, False, True]
+    assert "画面フリーズ" in capsys.readouterr().out
+
+    x, y, w, h = waveform_region(coords)
+    img2 = img.copy()
+    img2[y + h // 2, x + w // 2] ^= 255  # 波形の1画素でも変われば別フレーム
+    assert det.check(2, img2, coords) == 0
+    assert det.check(3, img2, BED_COORDS_8[3]) == 0
+
+
+def test_digits_outside_waveform_do_not_count():
+    det = FrozenFrameDetector(warn_after=1)
+    img = screen()
+    x, y, w, h = BED_COORDS_8[2]["vital_crop"]["HR"]
+    changed = img.copy()
+    changed[y:y + h, x:x + w] ^= 255
+    assert det.check(2, img, BED_COORDS_8[2]) == 0
+    assert det.check(2, changed, BED_COORDS_8[2]) == 1  # 数字だけ変わっても波形が同じならフリーズ
+
+
+def test_frozen_bed_skips_ocr_and_writes_stale_row_after_warn_after(tmp_path, monkeypatch):
+    read = []
+    monkeypatch.setattr(
+        vital_reader,
+        "_read_live_beds",
+        lambda img, coords_by_bed, mode: read.append(sorted(coords_by_bed)) or {b: {"HR": "60"} for b in coords_by_bed},
+    )
+    monkeypatch.setattr(vital_reader, "frozen_detector", FrozenFrameDetector(warn_after=2))
+    coords = {2: BED_COORDS_8[2], 3: BED_COORDS_8[3]}
+    csv_paths = vital_reader.prepare_bed_csvs(tmp_path, [2, 3])
+    img = screen()
+    frames = [img, img, scroll_waveform(img, 3, 10), scroll_waveform(scroll_waveform(img, 3, 10), 2, 20)]
+
+    for frame in frames:
+        for bed, vitals in vital_reader.ocr_beds_from_frame(frame, coords).items():
+            vital_reader.save_vitals_to_csv(vitals, csv_paths[bed])
+
+    # 1回目の繰り返しではまだ読む。warn_after 回続いたベッド2だけ省略する
+    assert read == [[2, 3], [2, 3], [3], [2, 3]]
+    with open(csv_paths[2], newline="", encoding="utf-8-sig") as f:
+        rows = list(csv.DictReader(f))
+    assert [r["HR"] for r in rows] == ["60", "60", "", "60"]
+    assert [r["Stale"] for r in rows] == ["", "", "2", ""]  # 次の通常行には引き継がれない
+    with open(csv_paths[3], newline="", encoding="utf-8-sig") as f:
+        assert [r.get("Stale", "") for r in csv.DictReader(f)] == ["", "", "", ""]
+
+
+def test_bundles_with_unchanged_digits_stay_live(monkeypatch):
+    monkeypatch.setattr(vital_reader, "_read_live_beds", lambda img, coords_by_bed, mode: {b: {"HR": "60"} for b in coords_by_bed})
+    monkeypatch.setattr(vital_reader, "frozen_detector", FrozenFrameDetector(warn_after=1))
+    img = screen()
+    # 安定した患者: 数字は同じで波形だけが流れる
+    bundles = [
+        RoiBundle.from_frame(scroll_waveform(img, 2, v), display_rects("8")).to_frame() for v in (10, 20, 30, 40)
+    ]
+    for frame in bundles:
+        assert vital_reader.ocr_beds_from_frame(frame, {2: BED_COORDS_8[2]}) == {2: {"HR": "60"}}
+
+    # 波形の領域がない 4 分割画面では判定しない
+    bundle4 = RoiBundle.from_frame(img, display_rects("4")).to_frame()
+    for _ in range(4):
+        assert vital_reader.ocr_beds_from_frame(bundle4, {1: BED_COORDS_4[1]}) == {1: {"HR": "60"}}
@@ -0,0 +1,152 @@
+import os
+import stat
+import sys
+import threading
+import time
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import vital_reader
+import inference_server
+from inference_server import DynamicBatcher, InferenceClient, InferenceServer, InferenceUnavailable, load_authkey
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="Unix socket address")
+
+
+def test_concurrent_requests_are_merged_into_batches():
+    sizes = []
+
+    def run(items):
+        sizes.append(len(items))
+        time.sleep(0.02)
+        return [x * 2 for x in items]
+
+    batcher = DynamicBatcher("m", run, max_batch=8, max_wait=0.05)
+    jobs = [batcher.submit([i, i + 100]) for i in range(8)]
+    for job in jobs:
+        assert job.done.wait(2)
+    batcher.close()
+    assert [job.result for job in jobs] == [[2 * i, 2 * (i + 100)] for i in range(8)]
+    assert max(sizes) == 8 and sum(sizes) == 16
+    assert len(sizes) < 8
+    m = batcher.metrics()
+    assert m["requests"] == 8 and m["batch_max"] == 8
+
+
+def test_request_past_its_queueing_deadline_is_rejected():
+    release = threading.Event()
+
+    def run(items):
+        release.wait(2)
+        return items
+
+    batcher = DynamicBatcher("m", run, max_batch=1, max_wait=0.0)
+    first = batcher.submit([1], deadline=5)
+    late = batcher.submit([2], deadline=0.05)
+    time.sleep(0.1)
+    release.set()
+    assert first.done.wait(2) and late.done.wait(2)
+    batcher.close()
+    assert first.result == [1]
+    assert late.error and "deadline" in late.error
+    assert batcher.metrics()["expired"] == 1
+
+
+@pytest.fixture
+def server(tmp_path):
+    calls = []
+
+    def cvp(crops):
+        calls.append(len(crops))
+        # 画素値の平均をクラス番号として one-hot を返す
+        out = np.zeros((len(crops), 16), dtype=np.float32)
+        for i, c in enumerate(crops):
+            out[i, int(c.mean()) % 16] = 1.0
+        return list(out)
+
+    srv = InferenceServer(
+        {"cvp": cvp, "spont": lambda crops: [0.9] * len(crops)},
+        address=str(tmp_path / "s.sock"),
+        info={"spont_threshold": 0.5},
+        max_wait=0.02,
+    ).start()
+    srv.calls = calls
+    yield srv
+    srv.close()
+
+
+def test_clients_share_one_model(server):
+    results = {}
+
+    def reader(i):
+        client = InferenceClient(server.address)
+        crops = [np.full((8, 8, 3), i, dtype=np.uint8)]
+        results[i] = int(np.argmax(client.infer("cvp", crops)[0]))
+        client.close()
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results == {i: i for i in range(6)}
+    assert sum(server.calls) == 6 and len(server.calls) < 6
+
+    client = InferenceClient(server.address)
+    metrics = client.metrics()
+    assert metrics["cvp"]["requests"] == 6
+    assert client.info["spont_threshold"] == 0.5 and client.has_model("spont")
+    with pytest.raises(InferenceUnavailable):
+        client.infer("unknown", [1])
+
+
+def test_vital_reader_uses_server_and_falls_back(server, monkeypatch):
+    client = InferenceClient(server.address, retry_interval=60)
+    monkeypatch.setattr(vital_reader, "inference_client", client)
+    monkeypatch.setattr(vital_reader, "cvp_model", None)
+    crops = [np.full((8, 8, 3), 3, dtype=np.uint8), np.full((8, 8, 3), 5, dtype=np.uint8)]
+    labels = [label for label, _ in vital_reader.predict_cvp_batch(crops)]
+    assert labels == [vital_reader.index_to_label[3], vital_reader.index_to_label[5]]
+    assert vital_reader._spont_breath_cnn_ready()
+
+    server.close()
+    client.close()
+    assert vital_reader.predict_cvp_batch(crops) == [("na", 0.0), ("na", 0.0)]
+
+
+def test_client_without_server_fails_fast(tmp_path):
+    client = InferenceClient(str(tmp_path / "none.sock"), retry_interval=60)
+    with pytest.raises(InferenceUnavailable):
+        client.infer("cvp", [1])
+    t0 = time.monotonic()
+    with pytest.raises(InferenceUnavailable, match="retrying later"):
+        client.infer("cvp", [1])
+    assert time.monotonic() - t0 < 0.05
+    assert not client.wait_ready(timeout=0.1)
+
+
+def test_socket_dir_and_key_are_private_to_the_user(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path))
+    monkeypatch.delenv("INFERENCE_AUTHKEY", raising=False)
+    address = os.path.join(inference_server.runtime_dir(), "inference.sock")
+    srv = InferenceServer({"spont": lambda crops: [0.9] * len(crops)}, address=address).start()
+    try:
+        assert stat.S_IMODE(os.stat(tmp_path / "vital_inference").st_mode) == 0o700
+        assert stat.S_IMODE(os.stat(address + ".key").st_mode) == 0o600
+        assert len(srv.authkey) == 64 and srv.authkey == load_authkey(address)
+
+        client = InferenceClient(address)
+        assert client.wait_ready(timeout=2) and client.has_model("spont")
+        client.close()
+        # 固定の鍵（旧既定値）では接続できない
+        intruder = InferenceClient(address, authkey=b"vital-inference", retry_interval=60)
+        with pytest.raises(InferenceUnavailable):
+            intruder.infer("spont", [1])
+    finally:
+        srv.close()
+
+    os.chmod(address + ".key", 0o644)
+    with pytest.raises(RuntimeError):
+        load_authkey(address)
@@ -0,0 +1,86 @@
+import pytest
+
+from vitals_csv import LatestVitalsReader, save_vitals_to_csv
+
+
+def write(path, text, mode="w"):
+    with open(path, mode, newline="", encoding="utf-8") as f:
+        f.write(text)
+
+
+def test_forward_fill_and_only_new_lines_are_parsed(tmp_path, monkeypatch):
+    path = tmp_path / "vitals.csv"
+    write(path, "timestamp,SBP,HR,I_E\n2024-05-01 10:00:00,120,80,1:2\n2024-05-01 10:01:00,,NaN,\n")
+    reader = LatestVitalsReader()
+    assert reader.read(path) == {"timestamp": "2024-05-01 10:01:00", "SBP": 120, "HR": 80, "I_E": "1:2"}
+
+    parsed = []
+    apply = LatestVitalsReader._apply
+    monkeypatch.setattr(LatestVitalsReader, "_apply", staticmethod(lambda s, data, v: parsed.append(data) or apply(s, data, v)))
+    write(path, "2024-05-01 10:02:00,118.5,,\n", "a")
+    assert reader.read(path)["SBP"] == 118.5
+    assert parsed == [b"2024-05-01 10:02:00,118.5,,\n"]
+    assert reader.read(path)["timestamp"] == "2024-05-01 10:02:00"
+    assert parsed[1:] == []
+
+
+def test_unterminated_last_line_is_read_again(tmp_path):
+    path = tmp_path / "vitals.csv"
+    write(path, "timestamp,SBP\nt0,100\nt1,1")
+    reader = LatestVitalsReader()
+    assert reader.read(path) == {"timestamp": "t1", "SBP": 1}
+    write(path, "05\n", "a")
+    assert reader.read(path) == {"timestamp": "t1", "SBP": 105}
+
+
+def test_header_only_or_empty_file_has_no_latest_row(tmp_path):
+    path = tmp_path / "vitals.csv"
+    write(path, "")
+    reader = LatestVitalsReader()
+    assert reader.read(path) is None
+    write(path, "timestamp\n")
+    assert reader.read(path) is None
+    write(path, "t0\n", "a")
+    assert reader.read(path) == {"timestamp": "t0"}
+
+
+def test_rewritten_files_are_reloaded(tmp_path):
+    path = tmp_path / "vitals.csv"
+    reader = LatestVitalsReader()
+    save_vitals_to_csv({"timestamp": "t0", "SBP": 100}, path)
+    assert reader.read(path)["SBP"] == 100
+    # 新しい列による書き直し（os.replace）
+    save_vitals_to_csv({"timestamp": "t1", "adrenaline": 0.05}, path)
+    latest = reader.read(path)
+    assert latest["SBP"] == 100 and latest["adrenaline"] == 0.05
+
+    # 同じヘッダーのまま内容が書き換えられた場合
+    write(path, "timestamp,SBP\nt0,90\nt1,91\n")
+    assert reader.read(path) == {"timestamp": "t1", "SBP": 91}
+    write(path, "timestamp,SBP\nt0,80\nt1,81\nt2,\n")
+    assert reader.read(path) == {"timestamp": "t2", "SBP": 81}
+
+
+def test_matches_pandas_forward_fill(tmp_path):
+    pd = pytest.importorskip("pandas")
+    if not hasattr(pd, "DataFrame"):
+        pytest.skip("pandas DataFrame not available")
+    path = tmp_path / "vitals.csv"
+    reader = LatestVitalsReader()
+    for i in range(30):
+        row = {"timestamp": f"2024-05-01 10:{i:02d}:00", "SBP": 100 + i if i % 3 else "", "HR": 70 + i % 5}
+        if i == 7:
+            row["adrenaline"] = 0.05
+        save_vitals_to_csv(row, path)
+        got = reader.read(path)
+        last = pd.read_csv(path).ffill().iloc[-1]
+        assert got == {k: (None if pd.isna(v) else v) for k, v in last.items()}
+
+
+def test_stale_marker_is_not_forward_filled(tmp_path):
+    path = tmp_path / "vitals.csv"
+    write(path, "timestamp,HR,Stale\nt0,120,\nt1,,3\n")
+    reader = LatestVitalsReader()
+    assert reader.read(path) == {"timestamp": "t1", "HR": 120, "Stale": 3}
+    write(path, "t2,130,\n", "a")
+    assert reader.read(path) == {"timestamp": "t2", "HR": 130, "Stale": None}
@@ -0,0 +1,46 @@
+import subprocess
+import sys
+from pathlib import Path
+
+from lazy_import import LazyModule, available, lazy_import
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def test_module_is_imported_on_first_attribute_access():
+    mod = lazy_import("colorsys")
+    assert "not loaded" in repr(mod)
+    assert mod.rgb_to_hsv(1, 0, 0)[0] == 0
+    assert "loaded" in repr(mod)
+    assert available(mod)
+
+
+def test_missing_module_behaves_like_none_fallback():
+    mod = lazy_import("surely_not_an_installed_module")
+    assert not available(mod)
+    assert not available(None)
+    try:
+        mod.anything
+    except ImportError:
+        pass
+    else:  # pragma: no cover
+        raise AssertionError("ImportError expected")
+
+
+def test_setattr_reaches_real_module(monkeypatch):
+    import colorsys
+
+    mod = LazyModule("colorsys")
+    monkeypatch.setattr(mod, "ONE_THIRD", 0.5)
+    assert colorsys.ONE_THIRD == 0.5
+
+
+def test_panels_do_not_import_vital_reader_or_heavy_modules():
+    code = (
+        "import sys, gas_panel, ph_risk_panel, blood_gas_panel, vital_reader\n"
+        "heavy = [m for m in ('cv2', 'torch', 'tensorflow', 'google.cloud.vision', 'PIL.Image') if m in sys.modules]\n"
+        "print(','.join(heavy))\n"
+    )
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, timeout=120)
+    assert out.returncode == 0, out.stderr
+    assert out.stdout.strip() == ""
@@ -0,0 +1,36 @@
+import pytest
+
+import main_surgery as ms
+
+
+class Evaluated(Exception):
+    pass
+
+
+def test_frozen_rows_are_not_evaluated(monkeypatch, tmp_path):
+    rows = iter([
+        {"timestamp": "2024-05-01 10:01:00", "HR": 120, "SBP": 90, "Stale": 3},
+        {"timestamp": "2024-05-01 10:01:00", "HR": 120, "SBP": 90, "Stale": 3},
+        {"timestamp": "2024-05-01 10:02:00", "HR": 130, "SBP": 95, "Stale": None},
+    ])
+    monkeypatch.setattr(ms, "get_latest_vitals", lambda path: next(rows))
+    monkeypatch.setattr(ms, "load_tree", lambda path: None)
+    monkeypatch.setattr(ms, "default_store", lambda: None)
+    monkeypatch.setattr(ms, "check_sbp_trend", lambda path: None)
+    monkeypatch.setattr(ms.time, "sleep", lambda s: None)
+
+    def evaluate_all(vitals, *args, **kwargs):
+        raise Evaluated(vitals)
+
+    monkeypatch.setattr(ms, "evaluate_all", evaluate_all)
+    with pytest.raises(Evaluated) as exc:
+        ms.main_loop(tmp_path / "vitals.csv", thresholds={}, surgery_state={})
+    # 固まった画面の行（前方補完された古い値）は判定せず、次の生きた行で判定する
+    assert exc.value.args[0]["timestamp"] == "2024-05-01 10:02:00"
+
+
+def test_stale_frames():
+    assert ms.stale_frames({"Stale": 3}) == 3
+    assert ms.stale_frames({"Stale": "2"}) == 2
+    assert ms.stale_frames({"Stale": None}) == 0
+    assert ms.stale_frames({}) == 0
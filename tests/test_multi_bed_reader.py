@@ -0,0 +1,80 @@
+import csv
+
+import pytest
+
+np = pytest.importorskip("numpy")
+cv2 = pytest.importorskip("cv2")
+
+import vital_reader
+from bed_coords import BED_COORDS_8
+from ocr_backends import OCRBackend
+
+
+class CountingBackend(OCRBackend):
+    def __init__(self):
+        self.batches = []
+
+    def read_batch(self, images):
+        self.batches.append(len(images))
+        return ["42"] * len(images)
+
+
+def test_read_beds_from_image_decodes_once_and_writes_each_bed(tmp_path, monkeypatch):
+    image_path = tmp_path / "093000.png"
+    cv2.imwrite(str(image_path), np.zeros((1440, 1920, 3), dtype=np.uint8))
+
+    reads = []
+    real_imread = vital_reader.cv2.imread
+
+    def counting_imread(path, *a):
+        reads.append(path)
+        return real_imread(path, *a)
+
+    backend = CountingBackend()
+    monkeypatch.setattr(vital_reader.cv2, "imread", counting_imread)
+    monkeypatch.setattr(vital_reader, "ocr_backend", backend)
+    cvp_batches = []
+
+    def fake_cvp_batch(crops):
+        cvp_batches.append(len(crops))
+        return [("8", 0.99)] * len(crops)
+
+    monkeypatch.setattr(vital_reader, "predict_cvp_batch", fake_cvp_batch)
+    monkeypatch.setattr(
+        vital_reader, "detect_spontaneous_breath_batch", lambda img, coords: {bed: False for bed in coords}
+    )
+
+    csv_paths = vital_reader.prepare_bed_csvs(tmp_path, sorted(BED_COORDS_8))
+    results = vital_reader.read_beds_from_image(image_path, BED_COORDS_8, csv_paths)
+
+    assert len(reads) == 1
+    assert backend.batches == [len(BED_COORDS_8) * (1 + len(BED_COORDS_8[2]["vital_crop"]))]
+    assert cvp_batches == [len(BED_COORDS_8)]
+    assert sorted(results) == sorted(BED_COORDS_8)
+    for bed, path in csv_paths.items():
+        assert path.endswith(f"vitals_history_{bed}.csv")
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            rows = list(csv.DictReader(f))
+        assert len(rows) == 1
+        assert rows[0]["HR"] == "42"
+        assert rows[0]["CVP"] == "8"
+
+
+def test_rows_are_stamped_with_the_capture_time(tmp_path, monkeypatch):
+    image_path = tmp_path / "20240101" / "093000.png"
+    monkeypatch.setattr(vital_reader, "load_frame", lambda path, coords_by_bed: np.zeros((1, 1, 3)))
+    monkeypatch.setattr(
+        vital_reader, "ocr_beds_from_frame", lambda img, coords_by_bed, mode: {bed: {"HR": "80"} for bed in coords_by_bed}
+    )
+    csv_paths = vital_reader.prepare_bed_csvs(tmp_path, [2])
+    vital_reader.read_beds_from_image(image_path, {2: BED_COORDS_8[2]}, csv_paths)
+    with open(csv_paths[2], newline="", encoding="utf-8-sig") as f:
+        assert [r["timestamp"] for r in csv.DictReader(f)] == ["2024-01-01 09:30:00"]
+
+
+def test_select_display_rejects_unknown_bed(tmp_path):
+    with pytest.raises(ValueError):
+        vital_reader.select_display(tmp_path, "8", ["1"])
+    display, paths = vital_reader.select_display(tmp_path, "4", None)
+    assert display == "4"
+    assert sorted(paths) == [1, 2, 3, 4]
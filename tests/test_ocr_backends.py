@@ -0,0 +1,41 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+cv2 = pytest.importorskip("cv2")
+
+import vital_reader
+from ocr_backends import TemplateDigitBackend, segment_glyphs
+
+
+def render(text, color=(255, 255, 255)):
+    img = np.zeros((32, 16 * len(text) + 8, 3), dtype=np.uint8)
+    cv2.putText(img, text, (4, 26), cv2.FONT_HERSHEY_SIMPLEX, 0.8, color, 2)
+    return img
+
+
+def test_segment_glyphs_counts_characters():
+    assert len(segment_glyphs(render("120"))) == 3
+    assert segment_glyphs(np.zeros((20, 20, 3), dtype=np.uint8)) == []
+
+
+def test_template_backend_reads_trained_font(tmp_path):
+    backend = TemplateDigitBackend()
+    counts = backend.fit([(render("0123456789"), "0123456789"), (render("1.5"), "1.5")])
+    assert counts["7"] == 1
+    path = tmp_path / "templates.npz"
+    backend.save(path)
+
+    loaded = TemplateDigitBackend.load(path)
+    text, conf = loaded.read_with_confidence(render("907"))
+    assert text == "907"
+    assert conf > 0.9
+    assert loaded.read_batch([render("36.5"), render("21")]) == ["36.5", "21"]
+    assert loaded.read_with_confidence(np.zeros((20, 20, 3), dtype=np.uint8)) == ("", 0.0)
+
+
+def test_ocr_crops_uses_local_backend(monkeypatch):
+    backend = TemplateDigitBackend()
+    backend.fit([(render("0123456789"), "0123456789")])
+    monkeypatch.setattr(vital_reader, "ocr_backend", backend)
+    texts = vital_reader.ocr_crops({"HR": render("128"), "SpO2": render("95")}, mode="batch")
+    assert texts == {"HR": "128", "SpO2": "95"}
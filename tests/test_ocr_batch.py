@@ -0,0 +1,77 @@
+from types import SimpleNamespace
+
+import vital_reader
+
+
+class FakeFeature:
+    class Type:
+        TEXT_DETECTION = "TEXT_DETECTION"
+
+    def __init__(self, type_=None):
+        self.type_ = type_
+
+
+fake_vision = SimpleNamespace(
+    Feature=FakeFeature,
+    Image=lambda content: SimpleNamespace(content=content),
+    AnnotateImageRequest=lambda image, features: SimpleNamespace(image=image, features=features),
+)
+
+
+def annotation(text):
+    return SimpleNamespace(
+        text_annotations=[SimpleNamespace(description=text)] if text else [],
+        error=SimpleNamespace(message=""),
+    )
+
+
+class FakeClient:
+    def __init__(self):
+        self.batches = []
+
+    def batch_annotate_images(self, requests):
+        self.batches.append(len(requests))
+        responses = []
+        for req in requests:
+            text = req.image.content.decode()
+            if text == "bad":
+                responses.append(SimpleNamespace(
+                    text_annotations=[], error=SimpleNamespace(message="quota")
+                ))
+            else:
+                responses.append(annotation(text))
+        return SimpleNamespace(responses=responses)
+
+    def text_detection(self, image):
+        return annotation(image.content.decode())
+
+
+def setup(monkeypatch):
+    client = FakeClient()
+    monkeypatch.setattr(vital_reader, "vision", fake_vision)
+    monkeypatch.setattr(vital_reader, "client", client)
+    monkeypatch.setattr(vital_reader, "_encode_png", lambda img: img.encode())
+    return client
+
+
+def test_batch_maps_responses_back_to_fields(monkeypatch):
+    client = setup(monkeypatch)
+    crops = {(bed, f"F{i}"): f"{bed}-{i}" for bed in (2, 3) for i in range(10)}
+    texts = vital_reader.ocr_crops(crops, mode="batch")
+    assert client.batches == [16, 4]
+    assert texts == crops
+
+
+def test_batch_error_response_yields_blank(monkeypatch):
+    setup(monkeypatch)
+    texts = vital_reader.ocr_crops({"HR": "120", "SpO2": "bad"}, mode="batch")
+    assert texts == {"HR": "120", "SpO2": ""}
+
+
+def test_single_and_batch_modes_agree(monkeypatch):
+    setup(monkeypatch)
+    crops = {"BP": "120/80(95)", "I_E": "01:02.5", "HR": "130"}
+    single = vital_reader.parse_ocr_texts(vital_reader.ocr_crops(crops, mode="single"))
+    batch = vital_reader.parse_ocr_texts(vital_reader.ocr_crops(crops, mode="batch"))
+    assert single == batch
+    assert batch == {"SBP": "120", "DBP": "80", "MAP": "95", "I_E": "1:2.5", "HR": "130"}
@@ -0,0 +1,76 @@
+import pytest
+
+import vital_reader
+from ocr_backends import OCRBackend
+
+
+class ScriptedBackend(OCRBackend):
+    """Local tier whose answer for each crop is given by the crop itself."""
+
+    def read_with_confidence(self, img):
+        return img
+
+    def read_batch(self, images):
+        return [img[0] for img in images]
+
+
+def test_cascade_escalates_low_confidence_and_invalid_fields():
+    cascade = vital_reader.build_ocr_cascade(ScriptedBackend(), {"default": 0.8, "SpO2": 0.95})
+    crops = {
+        (2, "HR"): ("72", 0.97),
+        (2, "SpO2"): ("98", 0.9),  # 項目別の閾値を下回る
+        (2, "BP"): ("120/80", 0.99),  # parse_bp_map で分解できない
+        (2, "I_E"): ("1:2.0", 0.99),
+        (2, "RR"): ("1?", 0.5),
+        (2, "Tskin"): ("36.5", 0.6),
+    }
+    sent = []
+
+    def vision(doubtful):
+        sent.append(sorted(doubtful))
+        return {k: {"SpO2": "99", "BP": "120/80(95)", "RR": "", "Tskin": ""}[k[1]] for k in doubtful}
+
+    texts = cascade.read(crops, vision)
+    assert sent == [[(2, "BP"), (2, "RR"), (2, "SpO2"), (2, "Tskin")]]
+    assert texts == {
+        (2, "HR"): "72",
+        (2, "SpO2"): "99",
+        (2, "BP"): "120/80(95)",
+        (2, "I_E"): "1:2.0",
+        (2, "RR"): "",  # Vision が空で、ローカルの読みも形式が合わなければ空欄
+        (2, "Tskin"): "36.5",  # 形式が正しく確信度だけ低いものは残す
+    }
+    st = cascade.stats()
+    assert st["SpO2"]["low_confidence"] == 1
+    assert st["BP"]["invalid"] == 1
+    assert st["HR"]["escalated"] == 0
+    assert st["RR"]["blanked"] == 1 and st["Tskin"]["blanked"] == 0
+    assert "escalated 4" in cascade.summary()
+    assert "1 left blank" in cascade.summary()
+
+
+def test_doubtful_fields_are_blank_when_vision_is_unavailable():
+    cascade = vital_reader.build_ocr_cascade(ScriptedBackend())
+    crops = {"BP": ("12O/8", 0.99), "HR": ("72", 0.4)}
+    texts = cascade.read(crops, lambda doubtful: {k: "" for k in doubtful})
+    assert texts == {"BP": "", "HR": "72"}
+
+
+def test_confident_frame_makes_no_vision_call(monkeypatch):
+    cascade = vital_reader.build_ocr_cascade(ScriptedBackend())
+    monkeypatch.setattr(vital_reader, "ocr_cascade", cascade)
+    monkeypatch.setattr(vital_reader, "ocr_backend", None)
+    monkeypatch.setattr(vital_reader, "roi_cache", None)
+
+    def no_vision(images):
+        raise AssertionError("Vision must not be called")
+
+    monkeypatch.setattr(vital_reader, "ocr_google_vision_batch", no_vision)
+    texts = vital_reader.ocr_crops({"HR": ("72", 0.99), "FiO2": ("40", 0.93)}, mode="batch")
+    assert texts == {"HR": "72", "FiO2": "40"}
+
+    batches = []
+    monkeypatch.setattr(vital_reader, "ocr_google_vision_batch", lambda images: batches.append(images) or ["41"])
+    texts = vital_reader.ocr_crops({"HR": ("72", 0.99), "FiO2": ("4O", 0.93)}, mode="batch")
+    assert texts == {"HR": "72", "FiO2": "41"}
+    assert batches == [[("4O", 0.93)]]
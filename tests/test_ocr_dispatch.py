@@ -0,0 +1,93 @@
+import threading
+import time
+
+from ocr_dispatch import ConcurrentOCRDispatcher
+
+
+def test_dispatch_runs_in_parallel_and_caps_in_flight():
+    lock = threading.Lock()
+    state = {"current": 0, "peak": 0}
+
+    def read(crop):
+        with lock:
+            state["current"] += 1
+            state["peak"] = max(state["peak"], state["current"])
+        time.sleep(0.05)
+        with lock:
+            state["current"] -= 1
+        return crop.upper()
+
+    d = ConcurrentOCRDispatcher(read, max_in_flight=4, timeout=2.0)
+    crops = {f"F{i}": f"v{i}" for i in range(8)}
+    t0 = time.monotonic()
+    out = d.dispatch(crops)
+    elapsed = time.monotonic() - t0
+    d.close()
+    assert out == {k: v.upper() for k, v in crops.items()}
+    assert list(out) == list(crops)
+    assert state["peak"] == 4
+    assert elapsed < 0.3
+
+
+def test_timed_out_field_is_blank_and_others_complete():
+    def read(crop):
+        if crop == "slow":
+            time.sleep(1.0)
+        return crop
+
+    d = ConcurrentOCRDispatcher(read, max_in_flight=2, timeout=0.1, retries=1, frame_timeout=1.0)
+    t0 = time.monotonic()
+    out = d.dispatch({"HR": "120", "SpO2": "slow", "RR": "20"})
+    assert time.monotonic() - t0 < 0.5
+    assert out == {"HR": "120", "SpO2": "", "RR": "20"}
+    assert d.stats["timeouts"] == 2
+    assert d.stats["blank"] == 1
+    d.close()
+
+
+def test_failed_request_is_retried():
+    calls = {"n": 0}
+
+    def read(crop):
+        calls["n"] += 1
+        if calls["n"] == 1:
+            raise RuntimeError("503")
+        return crop
+
+    d = ConcurrentOCRDispatcher(read, max_in_flight=1, timeout=1.0, retries=1)
+    assert d.dispatch({"HR": "98"}) == {"HR": "98"}
+    assert d.stats["errors"] == 1
+    assert d.stats["retries"] == 1
+    d.close()
+
+
+def test_deadline_starts_when_attempt_runs():
+    def read(crop):
+        time.sleep(0.3 if crop == "slow" else 0.05)
+        return crop
+
+    d = ConcurrentOCRDispatcher(read, max_in_flight=1, timeout=0.1, retries=0, frame_timeout=1.0)
+    # "fast" は打ち切られた "slow" の後ろで待つが、待ち時間は締め切りに数えない
+    out = d.dispatch({"HR": "slow", "RR": "fast"})
+    assert out == {"HR": "", "RR": "fast"}
+    assert d.stats["timeouts"] == 1
+    assert len(d._pool._threads) == 1
+    d.close()
+
+
+def test_frame_deadline_bounds_hung_workers():
+    release = threading.Event()
+
+    def read(crop):
+        release.wait(2.0)
+        return crop
+
+    d = ConcurrentOCRDispatcher(read, max_in_flight=2, timeout=0.1, retries=1)
+    t0 = time.monotonic()
+    out = d.dispatch({"HR": "98", "RR": "20", "SpO2": "97"})
+    # 全ワーカーが止まっても timeout * (retries + 1) で返る
+    assert time.monotonic() - t0 < 0.4
+    assert out == {"HR": "", "RR": "", "SpO2": ""}
+    assert d.stats["expired"] == 3
+    release.set()
+    d.close()
@@ -0,0 +1,113 @@
+import time
+from types import SimpleNamespace
+
+import vital_reader
+from ocr_cache import PersistentOCRCache
+
+
+def test_cache_survives_reopen(tmp_path):
+    path = tmp_path / "ocr.sqlite3"
+    cache = PersistentOCRCache(path)
+    cache.put("abc", "vision", "1", "21")
+    cache.put("empty", "vision", "1", "")
+    cache.close()
+
+    cache = PersistentOCRCache(path)
+    assert cache.get("abc", "vision", "1") == "21"
+    assert cache.get("abc", "template", "1") is None
+    assert cache.get("empty", "vision", "1") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 2
+    cache.close()
+
+
+def test_lru_eviction_keeps_recently_used(tmp_path):
+    cache = PersistentOCRCache(tmp_path / "ocr.sqlite3", max_entries=10)
+    for i in range(10):
+        cache.put(f"d{i}", "vision", "1", str(i))
+    assert cache.get("d0", "vision", "1") == "0"  # d0 を最近使用にする
+    for i in range(10, 12):
+        cache.put(f"d{i}", "vision", "1", str(i))
+    assert len(cache) == 10
+    assert cache.evictions == 2
+    assert cache.get("d0", "vision", "1") == "0"
+    assert cache.get("d1", "vision", "1") is None
+    cache.close()
+
+
+def test_hits_do_not_write_until_flushed(tmp_path):
+    path = tmp_path / "ocr.sqlite3"
+    cache = PersistentOCRCache(path)
+    cache.put("abc", "vision", "1", "21")
+    stored = cache._conn.execute("SELECT last_used FROM ocr_cache").fetchone()[0]
+    written = cache._conn.total_changes
+    time.sleep(0.01)
+    for _ in range(50):
+        assert cache.get("abc", "vision", "1") == "21"
+    assert cache._conn.total_changes == written
+    cache.close()  # close で最終使用時刻をまとめて書く
+    cache = PersistentOCRCache(path)
+    assert cache._conn.execute("SELECT last_used FROM ocr_cache").fetchone()[0] > stored
+    cache.close()
+
+
+def test_replacing_entries_does_not_trigger_eviction(tmp_path):
+    cache = PersistentOCRCache(tmp_path / "ocr.sqlite3", max_entries=10)
+    for i in range(10):
+        cache.put(f"d{i}", "vision", "1", str(i))
+    for _ in range(5):
+        cache.put("d0", "vision", "1", "0")
+    assert len(cache) == 10
+    assert cache.evictions == 0
+    cache.close()
+
+
+class FakeClient:
+    def __init__(self):
+        self.sent = []
+
+    def batch_annotate_images(self, requests):
+        self.sent.append([r.image.content.decode() for r in requests])
+        return SimpleNamespace(responses=[
+            SimpleNamespace(
+                text_annotations=[SimpleNamespace(description=r.image.content.decode())],
+                error=SimpleNamespace(message=""),
+            )
+            for r in requests
+        ])
+
+    def text_detection(self, image):
+        self.sent.append([image.content.decode()])
+        return SimpleNamespace(text_annotations=[SimpleNamespace(description=image.content.decode())])
+
+
+class FakeFeature:
+    class Type:
+        TEXT_DETECTION = "TEXT_DETECTION"
+
+    def __init__(self, type_=None):
+        self.type_ = type_
+
+
+def test_vision_calls_consult_cache_first(tmp_path, monkeypatch):
+    client = FakeClient()
+    monkeypatch.setattr(vital_reader, "client", client)
+    monkeypatch.setattr(vital_reader, "vision", SimpleNamespace(
+        Feature=FakeFeature,
+        Image=lambda content: SimpleNamespace(content=content),
+        AnnotateImageRequest=lambda image, features: SimpleNamespace(image=image, features=features),
+    ))
+    monkeypatch.setattr(vital_reader, "_encode_png", lambda img: img.encode())
+    cache = PersistentOCRCache(tmp_path / "ocr.sqlite3")
+    monkeypatch.setattr(vital_reader, "ocr_result_cache", cache)
+
+    assert vital_reader.ocr_google_vision_batch(["21", "5", "21"]) == ["21", "5", "21"]
+    assert vital_reader.ocr_google_vision_batch(["5", "36.5"]) == ["5", "36.5"]
+    assert vital_reader.ocr_google_vision("21") == "21"
+    assert client.sent == [["21", "5", "21"], ["36.5"]]
+
+    # 全部キャッシュにあれば Vision のリクエストは組み立てない
+    monkeypatch.setattr(vital_reader, "vision", None)
+    assert vital_reader.ocr_google_vision_batch(["21", "36.5"]) == ["21", "36.5"]
+    assert len(client.sent) == 2
+    cache.close()
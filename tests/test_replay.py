@@ -0,0 +1,99 @@
+import csv
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+np = pytest.importorskip("numpy")
+cv2 = pytest.importorskip("cv2")
+
+import replay
+import vital_reader
+from bed_coords import BED_COORDS_8
+
+
+@pytest.fixture
+def day_folder(tmp_path):
+    folder = tmp_path / "20250101"
+    folder.mkdir()
+    rng = np.random.default_rng(0)
+    for name in ("093002.png", "093000.png", "093001.png", "notes.png"):
+        small = rng.integers(0, 255, (144, 192, 3), dtype=np.uint8)
+        cv2.imwrite(str(folder / name), cv2.resize(small, (1920, 1440), interpolation=cv2.INTER_NEAREST))
+    return folder
+
+
+@pytest.fixture
+def mock_pipeline(monkeypatch):
+    monkeypatch.setattr(vital_reader, "ocr_backend", replay.MockOCRBackend())
+    monkeypatch.setattr(vital_reader, "cvp_model", replay.MockCVPModel())
+    monkeypatch.setattr(vital_reader, "roi_cache", None)
+    monkeypatch.setattr(vital_reader, "frozen_detector", None)
+
+
+def read_csv(path):
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        return list(csv.DictReader(f))
+
+
+def test_frames_are_replayed_in_timestamp_order(day_folder, tmp_path, mock_pipeline):
+    csv_path = str(tmp_path / "bed2.csv")
+    timings = replay.replay(day_folder, {2: BED_COORDS_8[2]}, {2: csv_path}, tmp_path / "timing.csv")
+
+    assert [t["frame"] for t in timings] == ["093000.png", "093001.png", "093002.png"]
+    rows = read_csv(csv_path)
+    assert [r["timestamp"] for r in rows] == [
+        "2025-01-01 09:30:00", "2025-01-01 09:30:01", "2025-01-01 09:30:02",
+    ]
+    assert all(r["CVP"] == "na" for r in rows)
+    assert rows[0]["HR"] != ""
+    report = read_csv(tmp_path / "timing.csv")
+    assert [r["frame"] for r in report] == [t["frame"] for t in timings]
+    assert all(float(r["process_ms"]) > 0 for r in report)
+
+
+def test_mock_backend_is_deterministic(day_folder, tmp_path, mock_pipeline):
+    a, b = str(tmp_path / "a.csv"), str(tmp_path / "b.csv")
+    replay.replay(day_folder, {2: BED_COORDS_8[2]}, {2: a})
+    replay.replay(day_folder, {2: BED_COORDS_8[2]}, {2: b})
+    assert read_csv(a) == read_csv(b)
+
+
+def test_speed_factor_paces_frames(day_folder, tmp_path, mock_pipeline):
+    t0 = time.perf_counter()
+    replay.replay(day_folder, {2: BED_COORDS_8[2]}, {2: str(tmp_path / "v.csv")}, speed=10)
+    # 2 秒分の撮影を 10 倍速で再生
+    assert time.perf_counter() - t0 >= 0.2
+
+
+def test_multiple_beds_and_time_window(day_folder, tmp_path, mock_pipeline):
+    beds = {bed: BED_COORDS_8[bed] for bed in (2, 3)}
+    csv_paths = {bed: str(tmp_path / f"bed{bed}.csv") for bed in beds}
+    timings = replay.replay(day_folder, beds, csv_paths, start="093001", limit=1)
+    assert [t["frame"] for t in timings] == ["093001.png"]
+    assert timings[0]["beds"] == 2
+    for path in csv_paths.values():
+        assert [r["timestamp"] for r in read_csv(path)] == ["2025-01-01 09:30:01"]
+
+
+def test_main_writes_csv_and_report(day_folder, tmp_path, monkeypatch):
+    monkeypatch.setattr(vital_reader, "roi_cache", None)
+    monkeypatch.setattr(vital_reader, "frozen_detector", None)
+    monkeypatch.setattr(vital_reader, "ocr_backend", None)
+    monkeypatch.setattr(vital_reader, "cvp_model", None)
+    out = tmp_path / "out"
+    assert replay.main([str(day_folder), "--bed", "3", "--out-dir", str(out)]) == 0
+    assert len(read_csv(out / "vitals_history_3.csv")) == 3
+    assert len(read_csv(out / "replay_timing.csv")) == 3
+
+
+def test_vital_reader_replay_entry_point():
+    root = Path(__file__).resolve().parent.parent
+    out = subprocess.run(
+        [sys.executable, str(root / "vital_reader.py"), "replay", "--help"],
+        capture_output=True, text=True, cwd=root, timeout=120,
+    )
+    assert out.returncode == 0
+    assert "vital_reader.py replay" in out.stdout
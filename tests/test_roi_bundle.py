@@ -0,0 +1,57 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+cv2 = pytest.importorskip("cv2")
+
+import vital_reader
+from bed_coords import BED_COORDS_8
+from frame_source import FRAME_PATTERNS, FrameSource
+from roi_bundle import RoiBundle, bed_rects, display_rects, is_complete_bundle
+
+
+def random_frame(shape=(1440, 1920, 3)):
+    return np.random.default_rng(0).integers(0, 256, size=shape, dtype=np.uint8)
+
+
+def test_bundle_round_trip_restores_every_roi(tmp_path):
+    frame = random_frame()
+    rects = display_rects("8")
+    path = RoiBundle.from_frame(frame, rects, timestamp_ns=5).save(tmp_path / "093000.npz")
+    assert is_complete_bundle(path)
+    assert not (tmp_path / "093000.npz.tmp").exists()
+
+    bundle = RoiBundle.load(path)
+    assert bundle.timestamp_ns == 5
+    assert bundle.covers(bed_rects(BED_COORDS_8))
+    restored = bundle.to_frame()
+    assert restored.shape == frame.shape
+    for x, y, w, h in rects:
+        assert (restored[y:y + h, x:x + w] == frame[y:y + h, x:x + w]).all()
+    # 全画面PNGより一桁以上小さい（無圧縮の生画素と比べても）
+    assert path.stat().st_size * 10 < frame.nbytes
+
+
+def test_bundle_clips_rects_outside_frame():
+    frame = random_frame((100, 100, 3))
+    bundle = RoiBundle.from_frame(frame, [(90, 90, 20, 20), (200, 200, 5, 5)])
+    assert bundle.rects.tolist() == [[90, 90, 10, 10]]
+    assert not bundle.covers([(90, 90, 20, 20)])
+
+
+def test_reader_consumes_bundles_natively(tmp_path, monkeypatch):
+    frame = random_frame()
+    RoiBundle.from_frame(frame, display_rects("all")).save(tmp_path / "093000.npz")
+
+    seen = []
+    monkeypatch.setattr(
+        vital_reader,
+        "ocr_beds_from_frame",
+        lambda img, coords_by_bed, mode: seen.append(img) or {bed: {} for bed in coords_by_bed},
+    )
+    src = FrameSource(tmp_path, pattern=FRAME_PATTERNS, mode="poll").start()
+    path = src.get(timeout=1)
+    assert path.name == "093000.npz"
+    csv_paths = vital_reader.prepare_bed_csvs(tmp_path, [2])
+    assert vital_reader.read_beds_from_image(path, {2: BED_COORDS_8[2]}, csv_paths) == {2: {}}
+    x, y, w, h = BED_COORDS_8[2]["CVP_COORDS"]
+    assert (seen[0][y:y + h, x:x + w] == frame[y:y + h, x:x + w]).all()
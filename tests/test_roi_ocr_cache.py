@@ -0,0 +1,43 @@
+import pytest
+
+import vital_reader
+from ocr_backends import OCRBackend
+from ocr_cache import RoiOCRCache, crop_digest
+
+
+class RecordingBackend(OCRBackend):
+    def __init__(self):
+        self.seen = []
+
+    def read_batch(self, images):
+        self.seen.append(list(images))
+        return ["" if img == "blank" else img for img in images]
+
+
+def test_unchanged_crops_skip_ocr(monkeypatch):
+    backend = RecordingBackend()
+    cache = RoiOCRCache()
+    monkeypatch.setattr(vital_reader, "ocr_backend", backend)
+    monkeypatch.setattr(vital_reader, "roi_cache", cache)
+
+    frame1 = {(2, "PEEPset"): "5", (2, "HR"): "120", (2, "RR"): "blank"}
+    assert vital_reader.ocr_crops(frame1) == {(2, "PEEPset"): "5", (2, "HR"): "120", (2, "RR"): ""}
+    frame2 = {(2, "PEEPset"): "5", (2, "HR"): "118", (2, "RR"): "blank"}
+    assert vital_reader.ocr_crops(frame2) == {(2, "PEEPset"): "5", (2, "HR"): "118", (2, "RR"): ""}
+
+    # 2フレーム目は変化した HR と、空文字でキャッシュされない RR のみ OCR される
+    assert backend.seen[1] == ["118", "blank"]
+    stats = cache.stats()
+    assert stats["PEEPset"] == {"hits": 1, "misses": 1, "hit_rate": 0.5}
+    assert stats["HR"]["hits"] == 0
+    assert "hits 1 / misses 5" in cache.summary()
+
+
+def test_crop_digest_depends_on_pixels_and_shape():
+    np = pytest.importorskip("numpy")
+    a = np.zeros((4, 6, 3), dtype=np.uint8)
+    b = a.copy()
+    assert crop_digest(a) == crop_digest(b)
+    b[1, 2, 0] = 1
+    assert crop_digest(a) != crop_digest(b)
+    assert crop_digest(a) != crop_digest(a.reshape(6, 4, 3))
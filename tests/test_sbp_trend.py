@@ -5,8 +5,8 @@ import tempfile
 from vitals.sbp_trend import check_sbp_trend
 
 
-def create_csv(rows):
-    tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".csv", mode="w", newline="")
+def create_csv(rows, encoding=None):
+    tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".csv", mode="w", newline="", encoding=encoding)
     writer = csv.DictWriter(tmp, fieldnames=["timestamp", "SBP"])
     writer.writeheader()
     for r in rows:
@@ -41,3 +41,16 @@ def test_sbp_decrease_triggers_vasopressor_instruction():
         assert "昇圧剤" in result["instruction"]
     finally:
         os.unlink(path)
+
+
+def test_csv_starting_with_bom_is_read():
+    # save_vitals_to_csv は utf-8-sig で書くので、先頭の BOM で timestamp 列を見失わないこと
+    path = create_csv([
+        {"timestamp": "2024-01-01 00:00:00", "SBP": 100},
+        {"timestamp": "2024-01-01 00:10:00", "SBP": 85},
+    ], encoding="utf-8-sig")
+    try:
+        result = check_sbp_trend(path)
+        assert result and result["change"] == -15
+    finally:
+        os.unlink(path)
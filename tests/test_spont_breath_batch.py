@@ -0,0 +1,59 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("cv2")
+
+import vital_reader
+
+
+def line_frame(beds_with_line):
+    img = np.zeros((60, 200, 3), dtype=np.uint8)
+    for bed in beds_with_line:
+        img[10 * bed + 5, 20:80] = 255
+    return img
+
+
+def test_batch_heuristic_returns_result_per_bed(monkeypatch):
+    monkeypatch.setattr(vital_reader, "spont_breath_model", None)
+    coords = {bed: [(20, 10 * bed, 60, 10)] for bed in (1, 2, 3)}
+    assert vital_reader.detect_spontaneous_breath_batch(line_frame([2]), coords) == {
+        1: False,
+        2: True,
+        3: False,
+    }
+    assert vital_reader.detect_spontaneous_breath_batch(line_frame([]), {4: []}) == {4: False}
+
+
+def test_cnn_runs_once_on_guard_survivors(monkeypatch):
+    torch = pytest.importorskip("torch")
+    pytest.importorskip("PIL")
+
+    batches = []
+
+    class FakeModel(torch.nn.Module):
+        def forward(self, x):
+            batches.append(x.shape[0])
+            assert not torch.is_grad_enabled()
+            return torch.full((x.shape[0], 1), 10.0)
+
+    monkeypatch.setattr(vital_reader, "spont_breath_model", FakeModel())
+    monkeypatch.setattr(vital_reader, "spont_breath_meta", {"threshold": 0.5})
+    monkeypatch.setattr(
+        vital_reader, "spont_breath_transform", lambda pil: torch.zeros(3, 8, 32)
+    )
+    # ガードはベッド2の領域だけ通す
+    monkeypatch.setattr(
+        vital_reader, "guard_ok", lambda crop: (bool(crop.any()), {})
+    )
+    coords = {bed: [(20, 10 * bed, 60, 10), (100, 10 * bed, 60, 10)] for bed in (1, 2, 3)}
+    result = vital_reader.detect_spontaneous_breath_batch(line_frame([2]), coords)
+    assert result == {1: False, 2: True, 3: False}
+    assert batches == [1]
+
+    batches.clear()
+    assert vital_reader.detect_spontaneous_breath_batch(line_frame([]), coords) == {
+        1: False,
+        2: False,
+        3: False,
+    }
+    assert batches == []
@@ -1,3 +1,6 @@
+import pytest
+
+import vital_reader
 from vital_reader import detect_spontaneous_breath
 
 
@@ -15,3 +18,24 @@ def test_detect_spontaneous_breath():
     assert not detect_spontaneous_breath(make_image(False), coords)
 
 
+
+
+def test_vectorized_counts_match_pixel_loop():
+    np = pytest.importorskip("numpy")
+    rng = np.random.default_rng(0)
+    for shape in [(5, 380, 3), (5, 380)]:
+        rows = rng.integers(150, 256, size=shape, dtype=np.uint8)
+        expected = [vital_reader._bright_pixels(list(r)) for r in rows]
+        assert vital_reader._bright_pixels_array(rows).tolist() == expected
+
+
+def test_multi_row_vote():
+    np = pytest.importorskip("numpy")
+    img = np.zeros((40, 40, 3), dtype=np.uint8)
+    img[20, 5:35] = 255  # 中央の1行だけ明るい
+    coords = [(5, 10, 30, 20)]
+    assert vital_reader._bright_line_detected(img, coords)
+    assert vital_reader._bright_line_detected(img, coords, rows=3, min_votes=1)
+    assert not vital_reader._bright_line_detected(img, coords, rows=3, min_votes=2)
+    img[15:26, 5:35] = 255
+    assert vital_reader._bright_line_detected(img, coords, rows=3, min_votes=2)
@@ -0,0 +1,265 @@
+import random
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import vital_reader
+from ocr_backends import OCRBackend
+from ocr_cache import RoiOCRCache
+from vision_client import (
+    CircuitBreaker,
+    FakeVisionClient,
+    ResilientVisionClient,
+    RetryBudget,
+    TokenBucket,
+    VisionUnavailable,
+    is_retryable,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.t = 0.0
+
+    def __call__(self):
+        return self.t
+
+    def sleep(self, dt):
+        self.t += dt
+
+
+def image(text):
+    return SimpleNamespace(content=text.encode())
+
+
+def resilient(fake, **kw):
+    kw.setdefault("sleep", lambda dt: None)
+    kw.setdefault("rng", random.Random(0))
+    return ResilientVisionClient(fake, **kw)
+
+
+def test_token_bucket_limits_rate():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=10, burst=5, clock=clock, sleep=clock.sleep)
+    for _ in range(25):
+        bucket.acquire()
+    # 5 枠は即時、残り 20 は 10/秒
+    assert clock.t == pytest.approx(2.0)
+    assert not bucket.acquire(5, timeout=0.1)
+
+
+def test_quota_error_is_retried_with_backoff():
+    fake = FakeVisionClient()
+    fake.outage()
+    delays = []
+    rvc = resilient(fake, max_attempts=3, base_delay=1.0, sleep=delays.append)
+    fake_calls = {"n": 0}
+    inner = fake.text_detection
+
+    def flaky(image, **kw):
+        fake_calls["n"] += 1
+        if fake_calls["n"] == 3:
+            fake.recover()
+        return inner(image, **kw)
+
+    rvc.client = SimpleNamespace(text_detection=flaky)
+    res = rvc.text_detection(image=image("98"))
+    assert res.text_annotations[0].description == "98"
+    assert rvc.stats["retries"] == 2
+    assert 0 <= delays[0] <= 1.0 and 0 <= delays[1] <= 2.0
+
+
+def test_non_retryable_error_fails_immediately():
+    class PermissionDenied(Exception):
+        code = 7
+
+    def denied(image, **kw):
+        raise PermissionDenied("bad credentials")
+
+    rvc = resilient(SimpleNamespace(text_detection=denied))
+    with pytest.raises(VisionUnavailable):
+        rvc.text_detection(image=image("1"))
+    assert rvc.stats["calls"] == 1
+    assert not is_retryable(PermissionDenied())
+    assert is_retryable(TimeoutError())
+
+
+def test_retry_budget_caps_retries_during_outage():
+    fake = FakeVisionClient()
+    fake.outage()
+    rvc = resilient(
+        fake,
+        max_attempts=4,
+        budget=RetryBudget(ratio=0.1, max_retries=2),
+        breaker=CircuitBreaker(failure_threshold=100),
+    )
+    for _ in range(10):
+        with pytest.raises(VisionUnavailable):
+            rvc.text_detection(image=image("1"))
+    # 予算がなければ 10 * 4 回呼ばれる
+    assert fake.calls <= 10 + 3
+    assert rvc.stats["budget_exhausted"] > 0
+
+
+def test_breaker_opens_and_recovers_through_half_open():
+    clock = FakeClock()
+    fake = FakeVisionClient()
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30, clock=clock)
+    rvc = resilient(fake, max_attempts=1, breaker=breaker)
+    fake.outage()
+    for _ in range(2):
+        with pytest.raises(VisionUnavailable):
+            rvc.text_detection(image=image("1"))
+    assert breaker.state == "open"
+    calls = fake.calls
+    with pytest.raises(VisionUnavailable):
+        rvc.text_detection(image=image("1"))
+    assert fake.calls == calls and rvc.stats["rejected"] == 1
+
+    clock.t += 31
+    fake.recover()
+    assert rvc.text_detection(image=image("7")).text_annotations[0].description == "7"
+    assert breaker.state == "closed"
+
+
+def test_retries_stop_at_the_callers_deadline():
+    clock = FakeClock()
+    fake = FakeVisionClient()
+    fake.outage()
+    budget = RetryBudget(ratio=0.0, max_retries=10)
+    rvc = resilient(fake, max_attempts=4, base_delay=1.0, max_delay=1.0, budget=budget, clock=clock, sleep=clock.sleep)
+    rvc.rng = SimpleNamespace(uniform=lambda lo, hi: hi)
+    seen = []
+    inner = fake.text_detection
+    rvc.client = SimpleNamespace(text_detection=lambda image, **kw: seen.append(kw.get("timeout")) or inner(image))
+
+    with pytest.raises(VisionUnavailable):
+        rvc.text_detection(image=image("1"), timeout=5.0, deadline=1.5)
+    # 1 秒待って再試行した後、次の待ちは締め切りを越えるので打ち切る
+    assert fake.calls == 2 and seen == [1.5, 0.5]
+    assert rvc.stats["expired"] == 1 and budget.tokens == 9
+
+    # 締め切りを過ぎた呼び出しは Vision にも送らない
+    with pytest.raises(VisionUnavailable):
+        rvc.text_detection(image=image("1"), deadline=clock.t)
+    assert fake.calls == 2 and rvc.stats["expired"] == 2
+
+
+def test_expired_half_open_trial_does_not_wedge_the_breaker():
+    clock = FakeClock()
+    fake = FakeVisionClient()
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30, clock=clock)
+    rvc = resilient(fake, max_attempts=1, breaker=breaker, clock=clock)
+    fake.outage()
+    with pytest.raises(VisionUnavailable):
+        rvc.text_detection(image=image("1"))
+    assert breaker.state == "open"
+
+    clock.t += 31
+    fake.recover()
+    # 半開の試行が Vision を呼ぶ前に締め切りを過ぎても、次の試行は通る
+    with pytest.raises(VisionUnavailable, match="deadline"):
+        rvc.text_detection(image=image("1"), deadline=clock.t)
+    assert rvc.text_detection(image=image("7")).text_annotations[0].description == "7"
+    assert breaker.state == "closed"
+
+
+def test_concurrent_mode_passes_the_request_deadline(monkeypatch):
+    deadlines = []
+
+    class Recording(ResilientVisionClient):
+        def text_detection(self, image, deadline=None, **kwargs):
+            deadlines.append((deadline, kwargs.get("timeout"), time.monotonic()))
+            return super().text_detection(image, deadline=deadline, **kwargs)
+
+    monkeypatch.setattr(vital_reader, "vision", fake_vision)
+    monkeypatch.setattr(vital_reader, "client", Recording(FakeVisionClient(), max_attempts=1))
+    monkeypatch.setattr(vital_reader, "_encode_png", lambda img: img.encode())
+    monkeypatch.setattr(vital_reader, "roi_cache", None)
+    monkeypatch.setattr(vital_reader, "ocr_result_cache", None)
+    monkeypatch.setattr(vital_reader, "ocr_dispatcher", None)
+    vital_reader.configure_ocr_dispatch(max_in_flight=2, timeout=3.0)
+    try:
+        assert vital_reader.ocr_crops({"HR": "88"}, mode="concurrent") == {"HR": "88"}
+    finally:
+        vital_reader.ocr_dispatcher.close()
+    (deadline, timeout, called), = deadlines
+    assert timeout == 3.0 and called < deadline <= called + 3.0
+
+
+def test_rate_limit_keeps_fake_quota_happy():
+    fake = FakeVisionClient(quota=40)
+    rvc = ResilientVisionClient(fake, rate=30, burst=16, max_attempts=1)
+    reqs = [SimpleNamespace(image=image(str(i))) for i in range(16)]
+    t0 = time.monotonic()
+    for _ in range(4):
+        rvc.batch_annotate_images(requests=reqs)
+    assert fake.quota_errors == 0
+    assert time.monotonic() - t0 >= 1.5
+
+
+class FakeFeature:
+    class Type:
+        TEXT_DETECTION = "TEXT_DETECTION"
+
+    def __init__(self, type_=None):
+        self.type_ = type_
+
+
+fake_vision = SimpleNamespace(
+    Feature=FakeFeature,
+    Image=lambda content: SimpleNamespace(content=content),
+    AnnotateImageRequest=lambda image, features: SimpleNamespace(image=image, features=features),
+)
+
+
+class TemplateStub(OCRBackend):
+    """Local reader echoing the crop (a string here) with low confidence."""
+
+    def read_with_confidence(self, img):
+        return img, 0.5
+
+    def read_batch(self, images):
+        return list(images)
+
+
+def test_vital_reader_falls_back_to_local_backend_while_open(monkeypatch):
+    fake = FakeVisionClient()
+    fake.outage()
+    rvc = resilient(fake, max_attempts=1, breaker=CircuitBreaker(failure_threshold=1))
+    monkeypatch.setattr(vital_reader, "vision", fake_vision)
+    monkeypatch.setattr(vital_reader, "client", rvc)
+    monkeypatch.setattr(vital_reader, "_encode_png", lambda img: img.encode())
+    monkeypatch.setattr(vital_reader, "roi_cache", None)
+    monkeypatch.setattr(vital_reader, "ocr_result_cache", None)
+    monkeypatch.setattr(vital_reader, "vision_fallback", vital_reader.build_ocr_cascade(TemplateStub()))
+
+    texts = vital_reader.ocr_crops({"HR": "88", "RR": "20"}, mode="batch")
+    assert texts == {"HR": "88", "RR": "20"}
+    assert rvc.breaker.state == "open"
+    assert vital_reader.ocr_crops({"SpO2": "97"}, mode="single") == {"SpO2": "97"}
+    assert rvc.stats["rejected"] == 1
+
+    monkeypatch.setattr(vital_reader, "vision_fallback", None)
+    assert vital_reader.ocr_crops({"SpO2": "97"}, mode="single") == {"SpO2": ""}
+
+
+def test_local_fallback_is_format_checked_and_not_cached(monkeypatch):
+    fake = FakeVisionClient()
+    fake.outage()
+    rvc = resilient(fake, max_attempts=1, breaker=CircuitBreaker(failure_threshold=1))
+    cache = RoiOCRCache()
+    monkeypatch.setattr(vital_reader, "vision", fake_vision)
+    monkeypatch.setattr(vital_reader, "client", rvc)
+    monkeypatch.setattr(vital_reader, "_encode_png", lambda img: img.encode())
+    monkeypatch.setattr(vital_reader, "roi_cache", cache)
+    monkeypatch.setattr(vital_reader, "ocr_result_cache", None)
+    monkeypatch.setattr(vital_reader, "vision_fallback", vital_reader.build_ocr_cascade(TemplateStub()))
+
+    crops = {"HR": "88", "RR": "2-0", "BP": "120/80"}
+    # 形式の合わないローカルの読みは空欄にする
+    assert vital_reader.ocr_crops(crops, mode="batch") == {"HR": "88", "RR": "", "BP": ""}
+    assert vital_reader.ocr_crops(crops, mode="batch") == {"HR": "88", "RR": "", "BP": ""}
+    # 代替の読みはキャッシュせず、次のフレームでも読み直す
+    assert cache.misses["HR"] == 2 and not cache.hits
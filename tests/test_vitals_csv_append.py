@@ -0,0 +1,63 @@
+import csv
+
+import vitals_csv
+from vitals_csv import save_vitals_to_csv
+
+
+def read_rows(path):
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        return list(csv.DictReader(f))
+
+
+def test_covered_row_is_appended_without_rewriting(tmp_path):
+    path = tmp_path / "vitals.csv"
+    save_vitals_to_csv({"timestamp": "2024-01-01 00:00:00", "SBP": 100}, path)
+    before = path.read_bytes()
+    save_vitals_to_csv({"timestamp": "2024-01-01 00:01:00", "SBP": 110}, path)
+    after = path.read_bytes()
+    assert after.startswith(before)
+    assert after.count(b"\xef\xbb\xbf") == 1
+    assert after[len(before):].count(b"\n") == 1
+    assert [r["SBP"] for r in read_rows(path)] == ["100", "110"]
+
+
+def test_drug_columns_carried_forward_from_cached_last_row(tmp_path):
+    path = tmp_path / "vitals.csv"
+    save_vitals_to_csv({"timestamp": "t0", "SBP": 100, "adrenaline": 0.05, "furosemide_mg": 10}, path)
+    save_vitals_to_csv({"timestamp": "t1", "SBP": 105}, path)
+    save_vitals_to_csv({"timestamp": "t2", "SBP": 108}, path)
+    rows = read_rows(path)
+    assert [r["adrenaline"] for r in rows] == ["0.05"] * 3
+    assert [r["furosemide_mg"] for r in rows] == ["10", "", ""]
+
+
+def test_external_write_invalidates_cache(tmp_path):
+    path = tmp_path / "vitals.csv"
+    save_vitals_to_csv({"timestamp": "t0", "SBP": 100, "adrenaline": 0.05}, path)
+    # drug_panel などが別経路で 1 行追記した場合
+    with open(path, "a", newline="", encoding="utf-8") as f:
+        header = next(csv.reader(open(path, encoding="utf-8-sig")))
+        csv.DictWriter(f, fieldnames=header).writerow({"timestamp": "t1", "adrenaline": 0.2})
+    save_vitals_to_csv({"timestamp": "t2", "SBP": 90}, path)
+    assert read_rows(path)[-1]["adrenaline"] == "0.2"
+
+
+def test_new_column_triggers_compaction(tmp_path):
+    path = tmp_path / "vitals.csv"
+    save_vitals_to_csv({"timestamp": "t0", "SBP": 100}, path)
+    save_vitals_to_csv({"timestamp": "t1", "SBP": 101, "noradrenaline": 0.1}, path)
+    save_vitals_to_csv({"timestamp": "t2", "SBP": 102}, path)
+    rows = read_rows(path)
+    assert [r["noradrenaline"] for r in rows] == ["", "0.1", "0.1"]
+    assert vitals_csv._tails[path]["fieldnames"][-1] == "noradrenaline"
+    assert not (tmp_path / "vitals.csv.tmp").exists()
+
+
+def test_file_without_trailing_newline_and_large_tail(tmp_path):
+    path = tmp_path / "vitals.csv"
+    long_note = "x" * (3 * vitals_csv._TAIL_BLOCK)
+    path.write_text("timestamp,SBP,note\nt0,90," + long_note, encoding="utf-8")
+    save_vitals_to_csv({"timestamp": "t1", "SBP": 95}, path)
+    rows = read_rows(path)
+    assert [r["SBP"] for r in rows] == ["90", "95"]
+    assert rows[-1]["note"] == long_note
@@ -0,0 +1,147 @@
+import csv
+import threading
+
+import pytest
+
+import vitals_store
+from vitals.sbp_trend import check_sbp_trend_store
+from vitals_csv import save_vitals_to_csv
+from vitals_store import VitalsStore, bed_for_path, day_start_for_path
+
+
+@pytest.fixture
+def store(tmp_path):
+    st = VitalsStore(tmp_path / "vitals.db")
+    yield st
+    st.close()
+
+
+@pytest.fixture
+def default_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(vitals_store, "_default_store", None)
+    monkeypatch.setattr(vitals_store, "_default_path", None)
+    monkeypatch.setattr(vitals_store, "_configured", False)
+    monkeypatch.setenv("VITALS_DB", str(tmp_path / "shared.db"))
+    yield vitals_store.default_store()
+    vitals_store.set_default_store(None)
+
+
+def test_latest_is_forward_filled_last_row(store):
+    store.insert(2, {"timestamp": "2024-05-01 10:00:00", "SBP": 120, "HR": 80, "I_E": "1:2"})
+    store.insert(2, {"timestamp": "2024-05-01 10:01:00", "SBP": "", "HR": "85", "adrenaline": 0.05})
+    store.insert(3, {"timestamp": "2024-05-01 10:02:00", "SBP": 99})
+    # 過去時刻の記録は最新値を上書きしない
+    store.insert(2, {"timestamp": "2024-05-01 09:00:00", "HR": 60})
+    latest = store.latest(2)
+    assert latest == {"timestamp": "2024-05-01 10:01:00", "SBP": 120.0, "HR": 85.0, "I_E": "1:2", "adrenaline": 0.05}
+    assert store.latest("2", keys=["SBP"]) == {"timestamp": "2024-05-01 10:01:00", "SBP": 120.0}
+    assert store.latest(2, since="2024-05-01 10:01:00") == {"timestamp": "2024-05-01 10:01:00", "HR": 85.0, "adrenaline": 0.05}
+    assert store.latest(4) is None
+    assert store.beds() == ["2", "3"]
+
+
+def test_windowed_queries(store):
+    for minute in range(30):
+        store.insert(2, {"timestamp": f"2024-05-01 10:{minute:02d}:00", "SBP": 100 + minute})
+    assert store.value_at(2, "SBP") == ("2024-05-01 10:29:00", 129.0)
+    assert store.value_at(2, "SBP", "2024-05-01 10:19:30") == ("2024-05-01 10:19:00", 119.0)
+    assert [v for _, v in store.series(2, "SBP", "2024-05-01 10:10:00", "2024-05-01 10:12:00")] == [110.0, 111.0, 112.0]
+    rows = store.window(2, start="2024-05-01 10:28:00")
+    assert rows == [{"timestamp": "2024-05-01 10:28:00", "SBP": 128.0}, {"timestamp": "2024-05-01 10:29:00", "SBP": 129.0}]
+
+    trend = check_sbp_trend_store(store, 2, threshold=10, window_minutes=10)
+    assert trend["alarm"] and trend["change"] == 10
+    assert check_sbp_trend_store(store, 2, window_minutes=60) is None
+
+
+def test_sbp_trend_falls_back_to_the_csv_when_the_store_lacks_the_window(store, tmp_path):
+    path = tmp_path / "vitals_history_2.csv"
+    with open(path, "w", newline="", encoding="utf-8-sig") as f:
+        f.write("timestamp,SBP\r\n2024-05-01 10:00:00,100\r\n2024-05-01 10:10:00,85\r\n")
+    # 読み取り側が VITALS_DB に書いていない
+    assert check_sbp_trend_store(store, 2) is None
+    assert check_sbp_trend_store(store, 2, csv_path=path)["change"] == -15
+    # 途中から有効化したので窓より古い SBP がない
+    store.insert(2, {"timestamp": "2024-05-01 10:10:00", "SBP": 85})
+    assert check_sbp_trend_store(store, 2, csv_path=path)["change"] == -15
+
+
+def test_csv_export_and_import_round_trip(store, tmp_path):
+    store.insert(2, {"timestamp": "2024-05-01 10:00:00", "SBP": 120, "HR": 80})
+    store.insert(2, {"timestamp": "2024-05-01 10:01:00", "HR": 81, "adrenaline": 0.05})
+    out = tmp_path / "vitals_history_2.csv"
+    assert store.export_csv(2, out) == 2
+    with open(out, newline="", encoding="utf-8-sig") as f:
+        rows = list(csv.DictReader(f))
+    assert rows[0]["SBP"] == "120" and rows[1]["SBP"] == ""
+    assert rows[1]["adrenaline"] == "0.05"
+
+    other = VitalsStore(tmp_path / "other.db")
+    assert other.import_csv(bed_for_path(out), out) == 4
+    assert other.latest(2) == store.latest(2)
+    other.close()
+
+
+def test_concurrent_writers_on_separate_connections(tmp_path):
+    path = tmp_path / "vitals.db"
+    VitalsStore(path).close()
+
+    def writer(bed):
+        st = VitalsStore(path)
+        for i in range(100):
+            st.insert(bed, {"timestamp": f"2024-05-01 10:{i // 60:02d}:{i % 60:02d}", "SBP": i, "HR": i})
+        st.close()
+
+    threads = [threading.Thread(target=writer, args=(bed,)) for bed in range(2, 6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    st = VitalsStore(path)
+    assert [st.latest(bed)["SBP"] for bed in range(2, 6)] == [99.0] * 4
+    assert len(st.window(3)) == 100
+    st.close()
+
+
+def test_csv_writers_mirror_into_default_store(default_store, tmp_path):
+    day = tmp_path / "20240501"
+    day.mkdir()
+    path = day / "vitals_history_3.csv"
+    default_store.insert(3, {"timestamp": "2024-04-30 23:00:00", "CVP": 12})
+    save_vitals_to_csv({"timestamp": "2024-05-01 10:00:00", "SBP": 120, "adrenaline": 0.05}, path)
+    save_vitals_to_csv({"timestamp": "2024-05-01 10:01:00", "SBP": 118}, path)
+
+    # 引き継いだ薬剤列は 2 行目にはストアへ書かない
+    assert [v for _, v in default_store.series(3, "adrenaline")] == [0.05]
+    latest = default_store.latest(bed_for_path(path), since=day_start_for_path(path))
+    assert latest == {"timestamp": "2024-05-01 10:01:00", "SBP": 118.0, "adrenaline": 0.05}
+
+
+def test_failed_csv_write_is_not_mirrored(default_store, tmp_path, monkeypatch):
+    import vitals_csv
+
+    def fail(*args, **kwargs):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(vitals_csv, "write_rows", fail)
+    path = tmp_path / "vitals_history_3.csv"
+    save_vitals_to_csv({"timestamp": "2024-05-01 10:00:00", "SBP": 120}, path)
+    # CSV にない行は DB にも入れない
+    assert default_store.latest(3) is None
+
+
+def test_latest_vitals_come_from_the_csv(default_store, tmp_path):
+    from main_surgery import get_latest_vitals
+
+    day = tmp_path / "20240501"
+    day.mkdir()
+    path = day / "vitals_history_3.csv"
+    # VITALS_DB を設定する前の行はストアにない
+    with open(path, "w", newline="", encoding="utf-8-sig") as f:
+        f.write("timestamp,SBP,CVP,I_E\r\n2024-05-01 09:00:00,125,8,1:2\r\n")
+    save_vitals_to_csv({"timestamp": "2024-05-01 10:00:00", "SBP": "98"}, path)
+    default_store.insert(3, {"timestamp": "2024-05-01 11:00:00", "SBP": 60})
+
+    latest = get_latest_vitals(path)
+    assert latest["timestamp"] == "2024-05-01 10:00:00"
+    assert latest["SBP"] == 98 and latest["CVP"] == 8 and latest["I_E"] == "1:2"
@@ -0,0 +1,151 @@
+import csv
+import os
+import time
+from datetime import datetime
+
+import pytest
+
+import drug_panel
+import vitals_csv
+import vitals_write_queue
+from vitals_csv import save_vitals_to_csv
+from vitals_write_queue import VitalsWriteQueue, spool_path
+
+
+def read_rows(path):
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        return list(csv.DictReader(f))
+
+
+def drug(path, write_queue=None):
+    panel = drug_panel.DrugPanel.__new__(drug_panel.DrugPanel)
+    panel.csv_path = path
+    panel.write_queue = write_queue
+    return panel
+
+
+def test_rows_within_window_share_one_fsynced_commit(tmp_path, monkeypatch):
+    synced = []
+    real_fsync = os.fsync
+    monkeypatch.setattr(vitals_csv.os, "fsync", lambda fd: synced.append(fd) or real_fsync(fd))
+    path = tmp_path / "vitals.csv"
+    q = VitalsWriteQueue(window=0.2)
+    t0 = time.perf_counter()
+    for i in range(20):
+        save_vitals_to_csv({"timestamp": f"t{i:02d}", "SBP": 100 + i}, path, write_queue=q)
+    assert time.perf_counter() - t0 < 0.1
+    assert q.flush(5)
+    q.close()
+    assert [r["SBP"] for r in read_rows(path)] == [str(100 + i) for i in range(20)]
+    m = q.metrics()
+    assert m["commits"] == 1 and m["batch_max"] == 20 and m["rows"] == 20
+    assert m["depth"] == 0 and m["depth_max"] == 20 and m["errors"] == 0
+    assert m["latency_p95_ms"] >= 0 and len(synced) == 1
+
+
+def test_queued_rows_match_synchronous_writes(tmp_path):
+    def write_all(path, write_queue):
+        save_vitals_to_csv({"timestamp": "2024-05-01 10:00:00", "SBP": 120}, path, write_queue=write_queue)
+        drug(path, write_queue)._append_to_csv(datetime(2024, 5, 1, 10, 0, 30), {"adrenaline": 0.05})
+        save_vitals_to_csv({"timestamp": "2024-05-01 10:01:00", "SBP": 118, "furosemide_mg": 10}, path, write_queue=write_queue)
+        save_vitals_to_csv({"timestamp": "2024-05-01 10:02:00", "pH": 7.3}, path, write_queue=write_queue)
+        drug(path, write_queue)._append_to_csv(datetime(2024, 5, 1, 10, 2, 30), {"adrenaline": 0.1})
+        save_vitals_to_csv({"timestamp": "2024-05-01 10:03:00", "SBP": 110}, path, write_queue=write_queue)
+
+    sync_path = tmp_path / "sync.csv"
+    write_all(sync_path, None)
+    queued_path = tmp_path / "queued.csv"
+    q = VitalsWriteQueue(window=0.5)
+    write_all(queued_path, q)
+    q.close()
+    assert q.metrics()["commits"] == 1
+    assert read_rows(queued_path) == read_rows(sync_path)
+    assert read_rows(queued_path)[-1]["adrenaline"] == "0.1"
+
+
+def test_close_commits_pending_rows_and_rejects_new_ones(tmp_path):
+    path = tmp_path / "vitals.csv"
+    q = VitalsWriteQueue(window=10)
+    save_vitals_to_csv({"timestamp": "t0", "SBP": 100}, path, write_queue=q)
+    assert q.depth() == 1
+    q.close()
+    assert q.depth() == 0 and read_rows(path)[0]["SBP"] == "100"
+    with pytest.raises(RuntimeError):
+        q.submit(path, {"timestamp": "t1"})
+    assert "1 rows in 1 commits" in q.summary()
+
+
+def test_failed_commit_is_spooled_and_written_later(tmp_path, monkeypatch):
+    path = tmp_path / "vitals.csv"
+    real_write_rows = vitals_write_queue.write_rows
+    down = {"on": True}
+
+    def flaky(csv_path, items, fsync=False):
+        if down["on"]:
+            raise PermissionError("locked by Excel")
+        return real_write_rows(csv_path, items, fsync=fsync)
+
+    monkeypatch.setattr(vitals_write_queue, "write_rows", flaky)
+    q = VitalsWriteQueue(window=0.01, retry_interval=0.05)
+    save_vitals_to_csv({"timestamp": "t0", "SBP": 100}, path, write_queue=q)
+    drug(path, q)._append_to_csv(datetime(2024, 5, 1, 10, 0), {"adrenaline": 0.05})
+    assert q.flush(5)
+    assert not path.exists()
+    assert len(vitals_write_queue._read_spool(path)) == 2
+    assert q.metrics()["errors"] >= 1 and q.metrics()["spooled"] == 2
+
+    # 新しい行を待たずに、再試行で退避分が順番どおり書かれる
+    down["on"] = False
+    deadline = time.monotonic() + 5
+    while os.path.exists(spool_path(path)) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    save_vitals_to_csv({"timestamp": "t1", "SBP": 101}, path, write_queue=q)
+    q.close()
+    rows = read_rows(path)
+    assert [r["timestamp"] for r in rows] == ["t0", "2024-05-01 10:00:00", "t1"]
+    assert rows[-1]["adrenaline"] == "0.05"
+    assert not os.path.exists(spool_path(path)) and q.metrics()["lost"] == 0
+
+
+def test_rows_spooled_at_close_are_written_by_the_next_queue(tmp_path, monkeypatch):
+    path = tmp_path / "vitals.csv"
+    real_write_rows = vitals_write_queue.write_rows
+
+    def broken(csv_path, items, fsync=False):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(vitals_write_queue, "write_rows", broken)
+    q = VitalsWriteQueue(window=0.01)
+    save_vitals_to_csv({"timestamp": "t0", "SBP": 100}, path, write_queue=q)
+    q.close()
+    assert os.path.exists(spool_path(path)) and q.metrics()["lost"] == 0
+
+    monkeypatch.setattr(vitals_write_queue, "write_rows", real_write_rows)
+    with VitalsWriteQueue(window=0.01) as q2:
+        save_vitals_to_csv({"timestamp": "t1", "SBP": 101}, path, write_queue=q2)
+    assert [r["SBP"] for r in read_rows(path)] == ["100", "101"]
+    assert not os.path.exists(spool_path(path))
+
+
+def test_spool_that_cannot_be_removed_is_not_written_twice(tmp_path, monkeypatch):
+    path = tmp_path / "vitals.csv"
+    vitals_write_queue._append_spool(path, [({"timestamp": "t0", "SBP": 100}, True)], fsync=False)
+    real_open = open
+
+    def locked(*args, **kwargs):
+        raise PermissionError("spool is open in another process")
+
+    def no_truncate(file, mode="r", *args, **kwargs):
+        if os.fspath(file) == spool_path(path) and "w" in mode:
+            raise PermissionError("spool is open in another process")
+        return real_open(file, mode, *args, **kwargs)
+
+    monkeypatch.setattr(vitals_write_queue.os, "remove", locked)
+    monkeypatch.setattr("builtins.open", no_truncate)
+    with VitalsWriteQueue(window=0.01) as q:
+        save_vitals_to_csv({"timestamp": "t1", "SBP": 101}, path, write_queue=q)
+        assert q.flush(5)
+        save_vitals_to_csv({"timestamp": "t2", "SBP": 102}, path, write_queue=q)
+    # 書き込み済みの退避行は、消せなくても再送しない
+    assert [r["SBP"] for r in read_rows(path)] == ["100", "101", "102"]
+    assert q.metrics()["errors"] == 0 and q.metrics()["spooled"] == 0
@@ -0,0 +1,421 @@
+"""Rate limiting, retries and a circuit breaker around the Vision client.
+
+The bare ``ImageAnnotatorClient`` has no retry policy and no rate limit, so
+a quota error or a short outage turns into a burst of blank CSV fields.
+:class:`ResilientVisionClient` keeps the client's interface
+(``text_detection`` and ``batch_annotate_images``) and adds:
+
+* a :class:`TokenBucket` shared by every bed and thread, charged one token
+  per image;
+* jittered exponential backoff for transient errors (quota, 429/5xx,
+  timeouts), bounded per call and by a :class:`RetryBudget` so retries
+  cannot multiply the load during an outage;
+* a :class:`CircuitBreaker` that stops calling Vision after repeated
+  failures and raises :class:`VisionUnavailable` immediately while open.
+  ``vital_reader`` then answers from the OCR cache or the local backend.
+
+:class:`FakeVisionClient` stands in for the service (latency, quota and
+failures) so the behaviour and throughput can be tested offline.
+"""
+from __future__ import annotations
+
+import random
+import threading
+import time
+from types import SimpleNamespace
+from typing import Callable, Optional
+
+# gRPC / HTTP codes treated as transient
+RETRYABLE_CODES = {4, 8, 13, 14, 408, 429, 500, 502, 503, 504}
+RETRYABLE_NAMES = {
+    "ResourceExhausted",
+    "TooManyRequests",
+    "ServiceUnavailable",
+    "DeadlineExceeded",
+    "InternalServerError",
+    "GatewayTimeout",
+    "RetryError",
+}
+
+
+class VisionUnavailable(RuntimeError):
+    """Vision was not called (breaker open) or failed after all retries."""
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """Return True for quota errors, 429/5xx responses and timeouts."""
+    if isinstance(exc, (TimeoutError, ConnectionError)):
+        return True
+    if type(exc).__name__ in RETRYABLE_NAMES:
+        return True
+    code = getattr(exc, "code", None)
+    code = getattr(code, "value", code)
+    if isinstance(code, tuple):  # grpc.StatusCode.value は (番号, 名前)
+        code = code[0]
+    return code in RETRYABLE_CODES
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled at ``rate`` tokens per second."""
+
+    def __init__(
+        self,
+        rate: float,
+        burst: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        if rate <= 0:
+            raise ValueError("rate must be > 0")
+        self.rate = float(rate)
+        self.capacity = float(burst if burst is not None else rate)
+        self.tokens = self.capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.waited = 0.0
+        self._last = clock()
+        self._lock = threading.Lock()
+
+    def _refill_locked(self) -> None:
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def acquire(self, n: float = 1, timeout: Optional[float] = None) -> bool:
+        """Take ``n`` tokens, waiting for them; False if ``timeout`` expires first.
+
+        Requests larger than the bucket are clamped to its capacity.
+        """
+        n = min(float(n), self.capacity)
+        deadline = None if timeout is None else self.clock() + timeout
+        while True:
+            with self._lock:
+                self._refill_locked()
+                if self.tokens >= n - 1e-9:
+                    self.tokens = max(0.0, self.tokens - n)
+                    return True
+                wait = (n - self.tokens) / self.rate
+            if deadline is not None and self.clock() + wait > deadline:
+                return False
+            self.waited += wait
+            self.sleep(wait)
+
+
+class RetryBudget:
+    """Allow retries for at most ``ratio`` of the requests.
+
+    Every request deposits ``ratio`` tokens and every retry withdraws one; the
+    balance is capped at ``max_retries``.  During an outage the retry traffic
+    therefore stays a fraction of the normal load.
+    """
+
+    def __init__(self, ratio: float = 0.2, max_retries: int = 10) -> None:
+        self.ratio = ratio
+        self.max_tokens = float(max_retries)
+        self.tokens = float(max_retries)
+        self._lock = threading.Lock()
+
+    def deposit(self) -> None:
+        with self._lock:
+            self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        with self._lock:
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+
+class CircuitBreaker:
+    """Open after ``failure_threshold`` consecutive failures.
+
+    While open every call is refused for ``reset_timeout`` seconds; then one
+    trial call is let through (half-open).  Its success closes the breaker,
+    its failure opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened = 0
+        self._opened_at = 0.0
+        self._trial = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.OPEN:
+                if self.clock() - self._opened_at < self.reset_timeout:
+                    return False
+                self.state = self.HALF_OPEN
+                self._trial = False
+            if self.state == self.HALF_OPEN:
+                if self._trial:
+                    return False
+                self._trial = True
+            return True
+
+    def release(self) -> None:
+        """Give back a half-open trial that ended before Vision was called."""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._trial = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != self.CLOSED:
+                print("[INFO] Vision 回復: サーキットブレーカーを閉じます")
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or (
+                self.state == self.CLOSED and self.failures >= self.failure_threshold
+            ):
+                if self.state == self.CLOSED:
+                    print(f"[WARN] Vision が{self.failures}回連続で失敗: {self.reset_timeout:.0f}秒間呼び出しを停止します")
+                self.state = self.OPEN
+                self.opened += 1
+                self._opened_at = self.clock()
+
+
+class ResilientVisionClient:
+    """Vision client proxy with rate limit, backoff and circuit breaker.
+
+    Parameters
+    ----------
+    client :
+        ``vision.ImageAnnotatorClient`` (or :class:`FakeVisionClient`).
+    rate : float, default 10.0
+        Images per second allowed across all callers.
+    burst : float, optional
+        Bucket size; defaults to one full batch of 16 images.
+    max_attempts : int, default 4
+        Attempts per call, including the first.
+    base_delay, max_delay : float
+        Backoff is uniform in ``[0, min(max_delay, base_delay * 2**k)]``
+        ("full jitter") before the ``k+1``-th retry.
+    breaker, budget :
+        Shared :class:`CircuitBreaker` and :class:`RetryBudget`.
+
+    ``text_detection`` and ``batch_annotate_images`` also accept ``deadline``,
+    a :func:`time.monotonic` time after which the caller no longer waits for
+    the result (e.g. the per-request timeout of
+    :class:`ocr_dispatch.ConcurrentOCRDispatcher`).  No attempt, rate-limit
+    wait or backoff is started past it, so an abandoned call does not keep
+    spending the shared token bucket and retry budget; ``timeout`` is cut to
+    the time left.
+
+    Non-transient errors (e.g. invalid credentials) are not retried but do
+    count as breaker failures.  Both surface as :class:`VisionUnavailable`.
+    """
+
+    def __init__(
+        self,
+        client,
+        rate: float = 10.0,
+        burst: Optional[float] = None,
+        max_attempts: int = 4,
+        base_delay: float = 0.5,
+        max_delay: float = 8.0,
+        breaker: Optional[CircuitBreaker] = None,
+        budget: Optional[RetryBudget] = None,
+        sleep: Callable[[float], None] = time.sleep,
+        rng: Optional[random.Random] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.client = client
+        self.bucket = TokenBucket(rate, burst if burst is not None else max(16.0, rate), sleep=sleep)
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker = breaker or CircuitBreaker()
+        self.budget = budget or RetryBudget()
+        self.sleep = sleep
+        self.rng = rng or random.Random()
+        self.clock = clock
+        self.stats = {
+            "calls": 0,
+            "images": 0,
+            "retries": 0,
+            "failures": 0,
+            "rejected": 0,
+            "budget_exhausted": 0,
+            "expired": 0,
+        }
+        self._lock = threading.Lock()
+
+    def _count(self, key: str, n: int = 1) -> None:
+        with self._lock:
+            self.stats[key] += n
+
+    def backoff(self, attempt: int) -> float:
+        return self.rng.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def _remaining(self, deadline: Optional[float]) -> Optional[float]:
+        return None if deadline is None else deadline - self.clock()
+
+    def _expired(self) -> VisionUnavailable:
+        # 半開の試行枠を握ったまま戻ると、ブレーカーが二度と閉じない
+        self.breaker.release()
+        self._count("expired")
+        return VisionUnavailable("deadline passed")
+
+    def _call(self, fn, images: int, deadline: Optional[float] = None, **kwargs):
+        if not self.breaker.allow():
+            self._count("rejected")
+            raise VisionUnavailable("circuit breaker open")
+        self.budget.deposit()
+        timeout = kwargs.get("timeout")
+        attempt = 0
+        while True:
+            if not self.bucket.acquire(images, timeout=self._remaining(deadline)):
+                raise self._expired()
+            left = self._remaining(deadline)
+            if left is not None:
+                if left <= 0:
+                    raise self._expired()
+                if timeout is not None:
+                    kwargs["timeout"] = min(timeout, left)
+            self._count("calls")
+            self._count("images", images)
+            try:
+                result = fn(**kwargs)
+            except Exception as e:
+                retry = is_retryable(e) and attempt + 1 < self.max_attempts
+                delay = self.backoff(attempt) if retry else 0.0
+                left = self._remaining(deadline)
+                if retry and left is not None and delay >= left:
+                    # 呼び出し元はもう待っていないので、再試行で枠と予算を使わない
+                    self._count("expired")
+                    retry = False
+                if retry and not self.budget.withdraw():
+                    self._count("budget_exhausted")
+                    retry = False
+                if not retry:
+                    self._count("failures")
+                    self.breaker.record_failure()
+                    raise VisionUnavailable(f"Vision OCR失敗: {e}") from e
+                self._count("retries")
+                self.sleep(delay)
+                attempt += 1
+                continue
+            self.breaker.record_success()
+            return result
+
+    def text_detection(self, image, deadline: Optional[float] = None, **kwargs):
+        return self._call(self.client.text_detection, 1, deadline, image=image, **kwargs)
+
+    def batch_annotate_images(self, requests, deadline: Optional[float] = None, **kwargs):
+        return self._call(self.client.batch_annotate_images, len(requests), deadline, requests=requests, **kwargs)
+
+    def summary(self) -> str:
+        st = self.stats
+        return (
+            f"{st['calls']} calls / {st['images']} images, retries {st['retries']}, "
+            f"failures {st['failures']}, breaker {self.breaker.state} "
+            f"(opened {self.breaker.opened}, rejected {st['rejected']}), "
+            f"rate-limit wait {self.bucket.waited:.1f} s"
+        )
+
+
+# =========================
+# オフライン試験用の疑似 Vision
+# =========================
+
+
+class ResourceExhausted(Exception):
+    """Quota error raised by :class:`FakeVisionClient` (gRPC code 8)."""
+
+    code = 8
+
+
+class ServiceUnavailable(Exception):
+    """Transient failure raised by :class:`FakeVisionClient` (gRPC code 14)."""
+
+    code = 14
+
+
+class FakeVisionClient:
+    """In-process stand-in for ``ImageAnnotatorClient``.
+
+    ``responder(content)`` returns the text of one image (default: the
+    content decoded as UTF-8).  ``latency`` seconds are spent per call,
+    more than ``quota`` images per second raise :class:`ResourceExhausted`
+    and ``fail_rate`` of the calls raise :class:`ServiceUnavailable`.
+    :meth:`outage` makes every call fail until :meth:`recover`.
+    """
+
+    def __init__(
+        self,
+        responder: Optional[Callable[[bytes], str]] = None,
+        latency: float = 0.0,
+        quota: Optional[float] = None,
+        fail_rate: float = 0.0,
+        seed: int = 0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.responder = responder or (lambda content: content.decode("utf-8", "replace"))
+        self.latency = latency
+        self.quota = quota
+        self.fail_rate = fail_rate
+        self.clock = clock
+        self.rng = random.Random(seed)
+        self.calls = 0
+        self.images = 0
+        self.quota_errors = 0
+        self.down = False
+        self._window = []
+        self._lock = threading.Lock()
+
+    def outage(self) -> None:
+        self.down = True
+
+    def recover(self) -> None:
+        self.down = False
+
+    def _serve(self, n: int) -> None:
+        with self._lock:
+            self.calls += 1
+            if self.down or self.rng.random() < self.fail_rate:
+                raise ServiceUnavailable("503 service unavailable")
+            if self.quota is not None:
+                now = self.clock()
+                self._window = [t for t in self._window if now - t < 1.0]
+                if len(self._window) + n > self.quota:
+                    self.quota_errors += 1
+                    raise ResourceExhausted("429 quota exceeded")
+                self._window.extend([now] * n)
+            self.images += n
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _annotate(self, image):
+        text = self.responder(image.content)
+        return SimpleNamespace(
+            text_annotations=[SimpleNamespace(description=text)] if text else [],
+            error=SimpleNamespace(message=""),
+        )
+
+    def text_detection(self, image, timeout=None):
+        self._serve(1)
+        return self._annotate(image)
+
+    def batch_annotate_images(self, requests, timeout=None):
+        self._serve(len(requests))
+        return SimpleNamespace(responses=[self._annotate(r.image) for r in requests])
@@ -1,6 +1,5 @@
-import time
 import os
-import csv
+import sys
 from datetime import datetime
 from pathlib import Path
 import argparse
@@ -11,40 +10,60 @@ try:  # pragma: no cover - optional dependency
 except Exception:  # pragma: no cover
     np = None
 import re
+import time
 
-# Optional heavy dependencies -------------------------------------------------
-try:  # pragma: no cover - optional dependency
-    import cv2  # type: ignore
-except Exception:  # pragma: no cover
-    cv2 = None
-
-try:  # pragma: no cover - optional dependency
-    from google.cloud import vision  # type: ignore
-    from google.oauth2 import service_account  # type: ignore
-except Exception:  # pragma: no cover
-    vision = None
-    service_account = None
-
-try:  # pragma: no cover - optional dependency
-    import tensorflow as tf  # type: ignore
-except Exception:  # pragma: no cover
-    tf = None
-
-try:  # pragma: no cover - optional dependency
-    import torch  # type: ignore
-except Exception:  # pragma: no cover
-    torch = None
+# Optional heavy dependencies, imported on first use ---------------------------
+from lazy_import import available, lazy_import
 
-try:  # pragma: no cover - optional dependency
-    from PIL import Image  # type: ignore
-except Exception:  # pragma: no cover
-    Image = None
+cv2 = lazy_import("cv2")
+vision = lazy_import("google.cloud.vision")
+service_account = lazy_import("google.oauth2.service_account")
+torch = lazy_import("torch")
+Image = lazy_import("PIL.Image")
 
 from bed_coords import BED_COORDS_8
 from bed_coords_4 import BED_COORDS_4
+from ocr_backends import OCRBackend, load_template_backend
+from ocr_dispatch import ConcurrentOCRDispatcher
+from ocr_cascade import RATIO_RE, OCRCascade
+from ocr_cache import PersistentOCRCache, RoiOCRCache, crop_digest
+from cvp_runtime import CVP_BACKENDS, load_cvp_model
+from frame_source import FRAME_PATTERNS, FRAME_SOURCE_MODES, FrameSource, frame_time
+from frame_ring import FrameRing, RingFrameSource
+from frozen_frame import FrozenFrameDetector
+from inference_server import DEFAULT_ADDRESS as DEFAULT_INFERENCE_ADDRESS, InferenceClient, InferenceUnavailable
+from roi_bundle import ROI_BUNDLE_SUFFIX, RoiBundle, bed_rects, load_frame as load_roi_bundle_frame
+from vision_client import CircuitBreaker, ResilientVisionClient, VisionUnavailable
+from vitals_csv import (  # noqa: F401 - re-exported for existing importers
+    ALL_COLUMNS,
+    NON_PERSISTENT_COLUMNS,
+    VITAL_COLUMNS,
+    create_empty_vitals_csv,
+    save_vitals_to_csv,
+)
+from vitals_store import set_default_store
 
 cvp_model = None
 client = None
+# Local OCR backend (None means Google Vision via ``client``)
+ocr_backend = None
+# Thread-pool dispatcher used by ``mode="concurrent"`` (see configure_ocr_dispatch)
+ocr_dispatcher = None
+# Per-ROI change-detection cache (None disables it; enabled by ``__main__``)
+roi_cache = None
+# Content-addressed OCR result store shared across restarts (None disables it)
+ocr_result_cache = None
+# Local-first OCR cascade escalating to Vision (None disables it)
+ocr_cascade = None
+# Frozen-screen detector (None disables it; enabled by ``__main__``)
+frozen_detector = None
+# Client of a shared inference_server.py (None runs the models in this process)
+inference_client = None
+# Local cascade (no remote tier) answering crops Vision cannot read (breaker open); None leaves them blank
+vision_fallback = None
+# Key used for Vision results in ``ocr_result_cache``
+VISION_CACHE_BACKEND = "vision"
+VISION_CACHE_VERSION = "text_detection-1"
 # Optional model and metadata for spontaneous-breathing detection (may be None)
 spont_breath_model = None
 spont_breath_meta = None
@@ -189,52 +208,225 @@ DEFAULT_SPONT_BREATH_MODEL_CANDIDATES = [
 DEFAULT_SPONT_BREATH_META_CANDIDATES = [
     r"C:\\Users\\sakai\\OneDrive\\Desktop\\BOT\\spon\\models\\white_line_cls.meta.json",
 ]
+DEFAULT_OCR_TEMPLATE_CANDIDATES = [
+    str(Path(__file__).with_name("ocr_templates.npz")),
+]
+DEFAULT_OCR_CACHE_DB = Path(__file__).with_name("ocr_cache.sqlite3")
 
 # =========================
 # リソース初期化
 # =========================
 
+OCR_BACKENDS = ("vision", "template", "cascade")
+
 def init_resources(
     model_path: Path,
-    service_account_file: Path,
+    service_account_file: Optional[Path],
     spont_breath_model_path: Optional[Path] = None,
     spont_breath_meta_path: Optional[Path] = None,
+    ocr_backend_name: str = "vision",
+    ocr_templates_path: Optional[Path] = None,
+    cvp_backend: str = "auto",
+    spont_breath_threads: Optional[int] = None,
+    ocr_cascade_thresholds: Optional[dict] = None,
+    vision_options: Optional[dict] = None,
+    inference_server: Optional[str] = None,
 ):
-    """Load optional heavy resources such as ML models and the Vision client."""
+    """Load optional heavy resources such as ML models and the OCR backend.
+
+    The CVP model is loaded through :func:`cvp_runtime.load_cvp_model`;
+    ``cvp_backend="auto"`` runs ``.onnx`` files with ONNX Runtime (no
+    TensorFlow import) and ``.keras`` files with TensorFlow.
+
+    With ``ocr_backend_name="template"`` the numeric fields are read by the
+    local :class:`ocr_backends.TemplateDigitBackend`; the Vision client is then
+    only created when a service account file is available.  With
+    ``ocr_backend_name="cascade"`` the template backend reads every field
+    first and only doubtful crops go to Vision (see :func:`build_ocr_cascade`).
+
+    The Vision client is wrapped in :class:`vision_client.ResilientVisionClient`
+    (rate limit, retries, circuit breaker) configured by ``vision_options``.
+    While Vision is unavailable, crops missing from the OCR cache are read by
+    the template backend when one is loaded (also with
+    ``ocr_backend_name="vision"`` if ``ocr_templates_path`` is given).
+
+    The spontaneous-breathing CNN is optional: if its weights or metadata are
+    missing or fail to load, :func:`detect_spontaneous_breath` keeps using the
+    bright-line heuristic.
+
+    With ``inference_server`` (an address of ``inference_server.py``) neither
+    model is loaded here; CVP and spontaneous-breathing crops are sent to the
+    shared server instead.
+    """
 
-    global cvp_model, client, spont_breath_model, spont_breath_meta, spont_breath_transform
-    try:
-        print(f"Loading CVP model from: {model_path}")
-        cvp_model = tf.keras.models.load_model(str(model_path))
-    except Exception as e:
-        raise RuntimeError(f"CVPモデル読み込み失敗: {model_path} -> {e}")
+    global cvp_model, client, ocr_backend, ocr_cascade, vision_fallback, inference_client, spont_breath_model, spont_breath_meta, spont_breath_transform
+    if ocr_backend_name not in OCR_BACKENDS:
+        raise RuntimeError(f"未知のOCRバックエンド: {ocr_backend_name}")
+    if inference_server:
+        inference_client = InferenceClient(inference_server)
+        print(f"Connecting to inference server: {inference_server}")
+        if not inference_client.wait_ready(timeout=60):
+            raise RuntimeError(f"推論サーバーに接続できません: {inference_server}")
+        print(f"推論サーバーのモデル: {', '.join(inference_client.info.get('models', []))}")
+    else:
+        try:
+            print(f"Loading CVP model from: {model_path} (backend: {cvp_backend})")
+            cvp_model = load_cvp_model(model_path, cvp_backend)
+        except Exception as e:
+            raise RuntimeError(f"CVPモデル読み込み失敗: {model_path} -> {e}")
+    if spont_breath_model_path and spont_breath_meta_path and not inference_server:
+        try:
+            load_spont_breath_model(spont_breath_model_path, spont_breath_meta_path, spont_breath_threads)
+        except Exception as e:
+            print(f"[WARN] 自発呼吸モデル読み込み失敗（輝線判定で代用）: {spont_breath_model_path} -> {e}")
+    if ocr_backend_name == "template":
+        print(f"Loading OCR templates from: {ocr_templates_path}")
+        ocr_backend = load_template_backend(ocr_templates_path)
+        if service_account_file is None:
+            return
+    if ocr_backend_name == "cascade":
+        print(f"Loading OCR templates from: {ocr_templates_path}")
+        # Vision が使えないときにローカルで読み直しても同じ結果なので、代替は設定しない
+        ocr_cascade = build_ocr_cascade(load_template_backend(ocr_templates_path), ocr_cascade_thresholds)
+    elif ocr_backend_name == "vision" and ocr_templates_path is not None:
+        try:
+            vision_fallback = build_ocr_cascade(load_template_backend(ocr_templates_path), ocr_cascade_thresholds)
+        except Exception as e:
+            print(f"[WARN] Vision停止時のローカルOCRを読み込めません: {ocr_templates_path} -> {e}")
     try:
         credentials = service_account.Credentials.from_service_account_file(str(service_account_file))
-        client = vision.ImageAnnotatorClient(credentials=credentials)
+        client = ResilientVisionClient(
+            vision.ImageAnnotatorClient(credentials=credentials), **(vision_options or {})
+        )
     except Exception as e:
         raise RuntimeError(f"Google Vision初期化失敗: {service_account_file} -> {e}")
 
 
 
+def build_ocr_cascade(local, thresholds=None):
+    """Cascade with the format checks of this module's fields.
+
+    BP must split with :func:`parse_bp_map`, I:E must read as ``a:b`` and
+    every other field as a plain number.
+    """
+    validators = {
+        "BP": lambda t: parse_bp_map(t or "")[0] is not None,
+        "I_E": lambda t: bool(RATIO_RE.match(t or "")),
+    }
+    return OCRCascade(local, thresholds=thresholds, validators=validators)
+
+def load_spont_breath_model(model_path, meta_path, threads=None):
+    """Load the spontaneous-breathing CNN saved by ``train_white_line_classifier.py``.
+
+    ``threads`` sets the number of intra-op threads torch uses on the CPU.
+    """
+    global spont_breath_model, spont_breath_meta, spont_breath_transform
+    if not available(torch):
+        raise RuntimeError("torch がインストールされていません")
+    with open(meta_path, "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    model, tfm = build_spont_breath_model(
+        meta.get("backbone", "mobilenet_v3_small"), int(meta["img_h"]), int(meta["img_w"])
+    )
+    model.load_state_dict(torch.load(str(model_path), map_location="cpu"))
+    model.eval()
+    if threads:
+        torch.set_num_threads(int(threads))
+    spont_breath_model, spont_breath_meta, spont_breath_transform = model, meta, tfm
+    print(f"Loaded spontaneous-breathing model: {model_path} (threads: {torch.get_num_threads()})")
+
 # =========================
 # 引数
 # =========================
 
 def parse_args():
     parser = argparse.ArgumentParser()
-    parser.add_argument("--cvp-model", help="Path to CVP model (.keras)")
+    parser.add_argument("--cvp-model", help="Path to CVP model (.keras or .onnx)")
+    parser.add_argument(
+        "--cvp-backend",
+        choices=CVP_BACKENDS,
+        help="CVPモデルの推論バックエンド（auto: 拡張子 .onnx なら ONNX Runtime）",
+    )
     parser.add_argument(
         "--spont-breath-model",
-        help="Path to spontaneous-breathing model (.keras)",
+        help="Path to spontaneous-breathing model weights (.pt)",
     )
     parser.add_argument(
         "--spont-breath-meta",
         help="Path to spontaneous-breathing model metadata (JSON)",
     )
+    parser.add_argument("--spont-breath-threads", type=int, help="自発呼吸CNNのCPUスレッド数（既定: torch の既定値）")
+    parser.add_argument(
+        "--inference-server",
+        nargs="?",
+        const=DEFAULT_INFERENCE_ADDRESS,
+        help="CVP・自発呼吸の推論を inference_server.py に任せる（アドレス省略時: 既定のソケット）",
+    )
+    parser.add_argument("--vitals-db", help="保存した行を SQLite のバイタルストアにも書き込む（VITALS_DB）")
     parser.add_argument("--service-account-file", help="Path to Google Cloud service account JSON")
     parser.add_argument("--image-folder", help="Folder containing monitor images (親Z:\\imageでもOK)")
+    parser.add_argument(
+        "--frame-source",
+        choices=FRAME_SOURCE_MODES,
+        help="新しい画像の検出方法 auto: watchdog があればイベント監視 / watch / poll (既定: auto)",
+    )
+    parser.add_argument(
+        "--skip-to-latest-frame",
+        action="store_true",
+        help="処理が撮影に追いつかないとき、溜まった画像を読み飛ばして最新だけを読む（既定: すべて順に読む）",
+    )
+    parser.add_argument(
+        "--shm",
+        nargs="?",
+        const="vital_frames",
+        help="auto_capture.py --shm の共有メモリからフレームを読む（名前省略時: vital_frames）",
+    )
     parser.add_argument("--vitals-base", help="Folder to store CSVs (親フォルダ)。未指定なら自動推定")
     parser.add_argument("--config", help="Path to config JSON file")
+    parser.add_argument(
+        "--ocr-mode",
+        choices=OCR_MODES,
+        help="single: 1クロップ1リクエスト / batch: フレーム単位でまとめて送信 / concurrent: 並列送信 (既定: batch)",
+    )
+    parser.add_argument("--ocr-max-in-flight", type=int, help="concurrent: 同時リクエスト数の上限 (既定: 8)")
+    parser.add_argument("--ocr-timeout", type=float, help="concurrent: 1リクエストのタイムアウト秒 (既定: 5)")
+    parser.add_argument("--ocr-retries", type=int, help="concurrent: 失敗時の再試行回数 (既定: 1)")
+    parser.add_argument("--vision-rate", type=float, help="Vision に送る画像数の上限（毎秒、全ベッド合計。既定: 10）")
+    parser.add_argument("--vision-max-attempts", type=int, help="Vision の一時的なエラー時の試行回数（初回を含む。既定: 4）")
+    parser.add_argument(
+        "--ocr-cache-db",
+        help="OCR結果の永続キャッシュ(SQLite)。'off' で無効化（既定: スクリプト隣の ocr_cache.sqlite3）",
+    )
+    parser.add_argument("--ocr-cache-max", type=int, help="永続キャッシュの最大件数（既定: 200000）")
+    parser.add_argument(
+        "--no-roi-cache",
+        action="store_true",
+        help="画素が変化していない項目でも毎回OCRする（変化検出キャッシュを無効化）",
+    )
+    parser.add_argument(
+        "--no-frozen-check",
+        action="store_true",
+        help="画面が前回と同一でもOCRする（フリーズ検出を無効化）",
+    )
+    parser.add_argument("--frozen-warn-after", type=int, help="波形が何回同一で続いたら警告してOCRを省略するか（既定: 3）")
+    parser.add_argument(
+        "--ocr-backend",
+        choices=OCR_BACKENDS,
+        help="vision: Google Vision / template: ローカルのテンプレート照合 / cascade: ローカル優先、疑わしい項目のみVision (既定: vision)",
+    )
+    parser.add_argument(
+        "--ocr-cascade-threshold",
+        type=float,
+        help="cascade: この信頼度未満の項目をVisionで読み直す（既定: 0.85、項目別は OCR_CASCADE_THRESHOLDS）",
+    )
+    parser.add_argument("--ocr-templates", help="Path to OCR glyph templates (.npz) for --ocr-backend template")
+    parser.add_argument(
+        "--all-beds",
+        action="store_true",
+        help="1プロセスで画面内の全ベッドを読み取り、ベッドごとのCSVに保存",
+    )
+    parser.add_argument("--display", choices=["4", "8"], help="画面分割（--all-beds 時。未指定ならダイアログ）")
+    parser.add_argument("--beds", help="--all-beds で対象にするベッド番号（例: 2,3,5）。既定は全ベッド")
     return parser.parse_args()
 
 # =========================
@@ -248,21 +440,18 @@ except FileNotFoundError:  # pragma: no cover - fallback for tests
     class_indices = {str(i): i for i in range(16)}
 index_to_label = {v: k for k, v in class_indices.items()}
 
-def predict_cvp_from_image(img):
-    """Return the predicted CVP value from a cropped image.
-
-    The function resizes the image to the model's expected size and applies
-    light-weight preprocessing to improve digit recognition under various
-    lighting conditions.  When the model has only a single channel, the image
-    is converted to grayscale.  For three-channel models, the grayscale output
-    is duplicated across RGB channels so that the preprocessing remains
-    effective regardless of the original model configuration.
-    """
+# この信頼度未満の予測は "na" とする
+CVP_CONFIDENCE_THRESHOLD = 0.8
 
-    input_shape = getattr(cvp_model, "input_shape", None)
-    if not input_shape or len(input_shape) < 4:
-        raise RuntimeError("cvp_model must have 4D input shape")
+def preprocess_cvp_crop(img, input_shape):
+    """Resize and binarise one CVP crop into the model's ``(H, W, C)`` input.
 
+    The crop is converted to grayscale, denoised, contrast-enhanced with CLAHE
+    and Otsu-binarised to improve digit recognition under various lighting
+    conditions.  For three-channel models the binary image is duplicated
+    across channels so that the preprocessing remains effective regardless of
+    the original model configuration.
+    """
     target_h, target_w, channels = input_shape[1], input_shape[2], input_shape[3]
     img_resized = cv2.resize(img, (target_w, target_h))
 
@@ -280,39 +469,82 @@ def predict_cvp_from_image(img):
         img_processed = bin_img[..., np.newaxis]
     else:
         img_processed = cv2.cvtColor(bin_img, cv2.COLOR_GRAY2BGR)
+    return img_processed.astype(np.float32) / 255.0
+
+def _cvp_forward(batch):
+    """Run one forward pass of ``cvp_model`` and return class probabilities.
+
+    ``cvp_model`` is a :mod:`cvp_runtime` backend: Keras models are called
+    directly through a cached ``tf.function`` instead of ``model.predict``,
+    which sets up a data pipeline on every call and dominates the cost for a
+    handful of 64x64 crops; ONNX models run one ONNX Runtime session call.
+    """
+    return np.asarray(cvp_model(batch))
+
+def cvp_probabilities(crops):
+    """Class probabilities of ``cvp_model`` for raw BGR ``crops`` (one row per crop)."""
+    input_shape = getattr(cvp_model, "input_shape", None)
+    if not input_shape or len(input_shape) < 4:
+        raise RuntimeError("cvp_model must have 4D input shape")
+    batch = np.stack([preprocess_cvp_crop(img, input_shape) for img in crops])
+    return _cvp_forward(batch)
 
-    # ----------------------------------------------------------------------
-    img_norm = img_processed / 255.0
-    img_input = np.expand_dims(img_norm, axis=0)
-    pred = cvp_model.predict(img_input)
+def predict_cvp_batch(crops):
+    """Predict CVP for several crops (e.g. one per bed) in a single forward pass.
 
-    pred_index = np.argmax(pred)
-    confidence = pred[0][pred_index]
-    print(f"予測インデックス: {pred_index}, 信頼度: {confidence:.2f}")
-    print(f"index_to_label[{pred_index}] = {index_to_label.get(pred_index, '未定義')}")
-    label = index_to_label.get(pred_index, "")
-    if confidence < 0.8:
-        return "na"
-    return label
+    Returns a list of ``(label, confidence)`` in the order of ``crops``;
+    predictions below :data:`CVP_CONFIDENCE_THRESHOLD` are labelled ``"na"``.
+    With :data:`inference_client` set the crops are sent to the shared
+    inference server; if it does not answer in time every crop is ``"na"``.
+    """
+    if inference_client is not None:
+        if not crops:
+            return []
+        try:
+            pred = np.asarray(inference_client.infer("cvp", crops))
+        except InferenceUnavailable as e:
+            print(f"[WARN] 推論サーバーでCVPを予測できません: {e}")
+            return [("na", 0.0)] * len(crops)
+    else:
+        input_shape = getattr(cvp_model, "input_shape", None)
+        if not input_shape or len(input_shape) < 4:
+            raise RuntimeError("cvp_model must have 4D input shape")
+        if not crops:
+            return []
+        pred = cvp_probabilities(crops)
+
+    out = []
+    for row in pred:
+        pred_index = int(np.argmax(row))
+        confidence = float(row[pred_index])
+        print(f"予測インデックス: {pred_index}, 信頼度: {confidence:.2f}")
+        print(f"index_to_label[{pred_index}] = {index_to_label.get(pred_index, '未定義')}")
+        label = index_to_label.get(pred_index, "")
+        out.append(("na" if confidence < CVP_CONFIDENCE_THRESHOLD else label, confidence))
+    return out
+
+def predict_cvp_from_image(img):
+    """Return the predicted CVP value from a cropped image.
+
+    Thin wrapper around :func:`predict_cvp_batch` for a single crop.
+    """
+    return predict_cvp_batch([img])[0][0]
 
 # =========================
-# CSV作成・保存など
+# 表示モード・ベッド選択
 # =========================
 
-VITAL_COLUMNS = [
-    "timestamp", "SBP", "DBP", "MAP", "HR", "SpO2", "BSR1", "BSR2",
-    "Tskin", "Trect", "etCO2", "RR", "Ppeak", "Pmean", "PEEPact", "RRact",
-    "I_E", "FiO2", "VTe", "VTi", "PEEPset", "VTset", "CVP",
-    "pH", "PaCO2", "pO2", "Hct", "K", "Na", "Cl", "Ca", "Glu", "Lac",
-    "tBil", "HCO3", "BE", "Alb"
-]
+def ask_display_mode(root):
+    """画面分割(4 or 8)をダイアログで聞いて返す"""
+    from tkinter import simpledialog, messagebox
 
-def create_empty_vitals_csv(path):
-    if not os.path.exists(path):
-        import pandas as pd
-        df = pd.DataFrame(columns=VITAL_COLUMNS)
-        df.to_csv(path, index=False, encoding="utf-8-sig")
-        print(f"[INFO] 空のバイタルCSVを作成: {path}")
+    while True:
+        display = simpledialog.askstring(
+            "表示選択", "画面分割を入力してください（4 or 8）:", parent=root
+        )
+        if display in ("4", "8"):
+            return display
+        messagebox.showerror("エラー", "4または8を入力してください。", parent=root)
 
 def select_display_and_bed(vitals_base_dir: Path):
     """画面分割(4 or 8)とベッド番号を聞いてCSVパスとともに返す"""
@@ -325,13 +557,7 @@ def select_display_and_bed(vitals_base_dir: Path):
     root = tk.Tk()
     root.withdraw()
 
-    while True:
-        display = simpledialog.askstring(
-            "表示選択", "画面分割を入力してください（4 or 8）:", parent=root
-        )
-        if display in ("4", "8"):
-            break
-        messagebox.showerror("エラー", "4または8を入力してください。", parent=root)
+    display = ask_display_mode(root)
 
     valid_beds = ["1", "2", "3", "4"] if display == "4" else ["2", "3", "4", "5"]
     while True:
@@ -351,6 +577,37 @@ def select_display_and_bed(vitals_base_dir: Path):
             parent=root,
         )
 
+def select_display(vitals_base_dir: Path, display: Optional[str] = None, beds=None):
+    """全ベッドモード用: 画面分割の全ベッド(または ``beds``)のCSVパスを返す。
+
+    ``display`` が未指定ならダイアログで聞く。戻り値は
+    ``(display, {bed: csv_path})``。
+    """
+    if display not in ("4", "8"):
+        import tkinter as tk
+
+        root = tk.Tk()
+        root.withdraw()
+        display = ask_display_mode(root)
+        root.destroy()
+    table = BED_COORDS_4 if display == "4" else BED_COORDS_8
+    beds = sorted(table) if not beds else [int(b) for b in beds]
+    unknown = [b for b in beds if b not in table]
+    if unknown:
+        raise ValueError(f"{display}分割画面に存在しないベッド: {unknown}")
+    return display, prepare_bed_csvs(vitals_base_dir, beds)
+
+def prepare_bed_csvs(vitals_base_dir: Path, beds):
+    """``vitals_base_dir/YYYYMMDD/vitals_history_{bed}.csv`` を作成して返す"""
+    today_dir = vitals_base_dir / datetime.now().strftime("%Y%m%d")
+    today_dir.mkdir(parents=True, exist_ok=True)
+    paths = {}
+    for bed in beds:
+        path = today_dir / f"vitals_history_{bed}.csv"
+        create_empty_vitals_csv(str(path))
+        paths[bed] = str(path)
+    return paths
+
 # =========================
 # 画像処理・OCR
 # =========================
@@ -367,13 +624,127 @@ def enhance_red_text(img):
     red_enhanced = cv2.merge([np.zeros_like(b), np.zeros_like(g), r])
     return cv2.convertScaleAbs(red_enhanced, alpha=2, beta=0)
 
-def ocr_google_vision(img):
+# Vision API の batch_annotate_images は 1 リクエストあたり最大 16 画像
+VISION_BATCH_LIMIT = 16
+
+def _encode_png(img):
     _, encoded_image = cv2.imencode(".png", img)
-    image = vision.Image(content=encoded_image.tobytes())
-    response = client.text_detection(image=image)
+    return encoded_image.tobytes()
+
+def _text_from_response(response):
     texts = response.text_annotations
     return texts[0].description.strip().replace("\n", "") if texts else ""
 
+def _cached_vision_text(digest):
+    if ocr_result_cache is None:
+        return None
+    return ocr_result_cache.get(digest, VISION_CACHE_BACKEND, VISION_CACHE_VERSION)
+
+def _store_vision_text(digest, text):
+    if ocr_result_cache is not None:
+        ocr_result_cache.put(digest, VISION_CACHE_BACKEND, VISION_CACHE_VERSION, text)
+
+def _vision_fallback(crops, texts):
+    """Fill the ``None`` entries of ``texts`` (Vision not asked) locally.
+
+    The crops are read by :data:`vision_fallback`, whose format checks blank
+    fields the local backend cannot read reliably; without it they stay blank.
+    """
+    unread = {key: crops[key] for key, text in texts.items() if text is None}
+    if not unread:
+        return texts
+    local = vision_fallback.read(unread, lambda doubtful: {}) if vision_fallback is not None else {}
+    return {key: local.get(key, "") if text is None else text for key, text in texts.items()}
+
+def ocr_google_vision(img, timeout=None, deadline=None):
+    """Vision text of one crop; ``deadline`` (monotonic) stops the client's retries.
+
+    Returns ``None`` when Vision could not be asked
+    (:class:`vision_client.VisionUnavailable`).
+    """
+    digest = crop_digest(img) if ocr_result_cache is not None else None
+    cached = _cached_vision_text(digest) if digest else None
+    if cached is not None:
+        return cached
+    image = vision.Image(content=_encode_png(img))
+    try:
+        kwargs = {}
+        if timeout is not None:
+            kwargs["timeout"] = timeout
+        if deadline is not None and isinstance(client, ResilientVisionClient):
+            kwargs["deadline"] = deadline
+        response = client.text_detection(image=image, **kwargs)
+    except VisionUnavailable:
+        return None
+    text = _text_from_response(response)
+    if digest:
+        _store_vision_text(digest, text)
+    return text
+
+def ocr_google_vision_batch(images):
+    """Run Vision text detection for ``images`` using batched requests.
+
+    All crops are sent through ``batch_annotate_images`` in chunks of
+    :data:`VISION_BATCH_LIMIT`, so a frame with ~20 crops per bed needs only a
+    few round trips instead of one per crop.  The returned list of texts is in
+    the same order as ``images``; crops whose individual response carries an
+    error yield an empty string.  Crops already present in
+    :data:`ocr_result_cache` are answered from the cache and not sent; if a
+    chunk cannot be sent (:class:`vision_client.VisionUnavailable`), its crops
+    yield ``None``.
+    """
+    texts = [None] * len(images)
+    digests = [None] * len(images)
+    if ocr_result_cache is not None:
+        for i, img in enumerate(images):
+            digests[i] = crop_digest(img)
+            texts[i] = _cached_vision_text(digests[i])
+    todo = [i for i, t in enumerate(texts) if t is None]
+    if not todo:
+        return texts
+    feature = vision.Feature(type_=vision.Feature.Type.TEXT_DETECTION)
+    for start in range(0, len(todo), VISION_BATCH_LIMIT):
+        chunk = todo[start:start + VISION_BATCH_LIMIT]
+        requests = [
+            vision.AnnotateImageRequest(
+                image=vision.Image(content=_encode_png(images[i])),
+                features=[feature],
+            )
+            for i in chunk
+        ]
+        try:
+            response = client.batch_annotate_images(requests=requests)
+        except VisionUnavailable:
+            continue
+        for i, res in zip(chunk, response.responses):
+            error = getattr(res, "error", None)
+            if error is not None and getattr(error, "message", ""):
+                print(f"[WARN] Vision OCR失敗: {error.message}")
+                texts[i] = ""
+            else:
+                texts[i] = _text_from_response(res)
+                if digests[i]:
+                    _store_vision_text(digests[i], texts[i])
+    return texts
+
+class VisionBackend(OCRBackend):
+    """:class:`ocr_backends.OCRBackend` adapter for the Google Vision client."""
+
+    name = "vision"
+
+    def __init__(self, batch: bool = True) -> None:
+        self.batch = batch
+
+    def read(self, img):
+        return ocr_google_vision(img) or ""
+
+    def read_batch(self, images):
+        if self.batch:
+            texts = ocr_google_vision_batch(list(images))
+        else:
+            texts = [ocr_google_vision(img) for img in images]
+        return [text or "" for text in texts]
+
 def parse_bp_map(text):
     text = text.replace(" ", "").replace("O", "0")
     match = re.search(r"(\d{2,3})[\/](\d{2,3})[\(（](\d{2,3})[\)）]?", text)
@@ -389,43 +760,132 @@ def sharpen(img):
     return cv2.filter2D(img, -1, kernel)
 
 
-def detect_spontaneous_breath(img, coords_list):
-    """Detect spontaneous breathing by scanning ``coords_list``.
-
-    If a trained CNN and its metadata were loaded via :func:`init_resources`,
-    the model and a guard routine are used to evaluate each region of
-    interest.  When those heavy dependencies are unavailable, the function
-    falls back to a lightweight heuristic that simply checks for a bright
-    horizontal line across the region.
-    """
-    if not coords_list:
-        return False
-
-    use_cnn = (
+def _spont_breath_cnn_ready():
+    if inference_client is not None:
+        return inference_client.has_model("spont")
+    return (
         spont_breath_model is not None
         and spont_breath_transform is not None
-        and torch is not None
-        and cv2 is not None
+        and available(torch)
+        and available(cv2)
         and np is not None
-        and Image is not None
+        and available(Image)
     )
 
-    if use_cnn:
-        thr = float(spont_breath_meta.get("threshold", 0.5)) if spont_breath_meta else 0.5
-        for x, y, w, h in coords_list:
+def detect_spontaneous_breath_batch(img, coords_by_bed):
+    """Detect spontaneous breathing for several beds of one frame.
+
+    ``coords_by_bed`` maps a bed to its list of ``(x, y, w, h)`` regions.
+    With the CNN loaded, the cheap :func:`guard_ok` check runs first; only
+    the regions it accepts are stacked into one tensor and classified in a
+    single ``torch.inference_mode`` forward pass (on the shared inference
+    server when :data:`inference_client` is set).  Returns ``{bed: bool}``.
+    Without the CNN, or when the server does not answer in time, each bed
+    uses the bright-line heuristic.
+    """
+    if not _spont_breath_cnn_ready():
+        return {bed: _bright_line_detected(img, coords) for bed, coords in coords_by_bed.items()}
+
+    detected = {bed: False for bed in coords_by_bed}
+    owners, crops = [], []
+    for bed, coords_list in coords_by_bed.items():
+        for x, y, w, h in coords_list or []:
             crop = img[y:y + h, x:x + w]
             if crop.size == 0:
                 continue
-            pil = Image.fromarray(cv2.cvtColor(crop, cv2.COLOR_BGR2RGB))
-            xt = spont_breath_transform(pil).unsqueeze(0)
-            with torch.no_grad():
-                prob = torch.sigmoid(spont_breath_model(xt)).item()
+            # ガードで落ちる領域はCNNに通さない
             ok, _ = guard_ok(crop)
-            if prob >= thr and ok:
-                return True
+            if not ok:
+                continue
+            crops.append(crop)
+            owners.append(bed)
+    if not crops:
+        return detected
+
+    if inference_client is not None:
+        thr = float(inference_client.info.get("spont_threshold", 0.5))
+        try:
+            probs = inference_client.infer("spont", crops)
+        except InferenceUnavailable as e:
+            print(f"[WARN] 推論サーバーで自発呼吸を判定できません（輝線判定で代用）: {e}")
+            return {bed: _bright_line_detected(img, coords) for bed, coords in coords_by_bed.items()}
+    else:
+        thr = float(spont_breath_meta.get("threshold", 0.5)) if spont_breath_meta else 0.5
+        probs = spont_breath_probabilities(crops)
+    for bed, prob in zip(owners, probs):
+        if prob >= thr:
+            detected[bed] = True
+    return detected
+
+def spont_breath_probabilities(crops):
+    """Probabilities of the spontaneous-breathing CNN for BGR ``crops``, in one forward pass."""
+    tensors = [spont_breath_transform(Image.fromarray(cv2.cvtColor(c, cv2.COLOR_BGR2RGB))) for c in crops]
+    with torch.inference_mode():
+        return torch.sigmoid(spont_breath_model(torch.stack(tensors))).view(-1).tolist()
+
+def detect_spontaneous_breath(img, coords_list):
+    """Detect spontaneous breathing by scanning ``coords_list``.
+
+    If a trained CNN and its metadata were loaded via :func:`init_resources`,
+    a guard routine and the model are used to evaluate each region of
+    interest (see :func:`detect_spontaneous_breath_batch`).  When those heavy
+    dependencies are unavailable, the function falls back to a lightweight
+    heuristic that simply checks for a bright horizontal line across the
+    region.
+    """
+    if not coords_list:
         return False
+    return detect_spontaneous_breath_batch(img, {None: coords_list})[None]
+
+# 輝線判定（フォールバック）の設定: 中央付近から何行を調べ、何行で明るければ検出とするか
+SPONT_FALLBACK_ROWS = 1
+SPONT_FALLBACK_MIN_VOTES = 1
+BRIGHT_GRAY_THRESHOLD = 200
+BRIGHT_WIDTH_RATIO = 0.4
+
+def _vote_rows(h, n_rows, rows):
+    """Row indices sampled around the middle of a region of height ``h``."""
+    step = max(1, h // (2 * rows))
+    first = h // 2 - ((rows - 1) // 2) * step
+    return [min(max(first + k * step, 0), n_rows - 1) for k in range(rows)]
+
+def _bright_pixels(row):
+    """Count bright pixels of one row given as a list (per-pixel loop)."""
+    bright = 0
+    for pixel in row:
+        if isinstance(pixel, (list, tuple)) or (np is not None and isinstance(pixel, np.ndarray)):
+            gray = 0.114 * pixel[0] + 0.587 * pixel[1] + 0.299 * pixel[2]
+        else:
+            gray = pixel
+        if gray >= BRIGHT_GRAY_THRESHOLD:
+            bright += 1
+    return bright
+
+def _bright_pixels_array(rows):
+    """Vectorised :func:`_bright_pixels` for a ``(k, w)`` or ``(k, w, c)`` array.
 
-    # Fallback heuristic
+    The gray value is computed with the same float64 operations in the same
+    order as the per-pixel loop, so the counts are identical.
+    """
+    if rows.ndim == 3:
+        px = rows.astype(np.float64)
+        gray = 0.114 * px[..., 0] + 0.587 * px[..., 1] + 0.299 * px[..., 2]
+    else:
+        gray = rows
+    return np.count_nonzero(gray >= BRIGHT_GRAY_THRESHOLD, axis=1)
+
+def _bright_line_detected(img, coords_list, rows=None, min_votes=None):
+    """Bright-line heuristic used when the CNN is unavailable.
+
+    ``rows`` rows around the middle of each region are checked and the region
+    counts as a hit when at least ``min_votes`` of them have 40% bright
+    pixels.  NumPy images are processed vectorised; nested lists (as used by
+    the tests) go through the per-pixel loop.
+    """
+    if not coords_list:
+        return False
+    rows = rows or SPONT_FALLBACK_ROWS
+    min_votes = min_votes or SPONT_FALLBACK_MIN_VOTES
     is_numpy = np is not None and isinstance(img, np.ndarray)
 
     for x, y, w, h in coords_list:
@@ -433,51 +893,146 @@ def detect_spontaneous_breath(img, coords_list):
             crop = img[y:y + h, x:x + w]
             if crop.size == 0:
                 continue
-            row = crop[h // 2]
+            counts = _bright_pixels_array(crop[_vote_rows(h, crop.shape[0], rows)])
         else:
             crop_rows = img[y:y + h]
             if not crop_rows:
                 continue
             crop = [row[x:x + w] for row in crop_rows]
-            row = crop[len(crop) // 2]
-
-        bright = 0
-        for pixel in row:
-            if isinstance(pixel, (list, tuple)) or (np is not None and isinstance(pixel, np.ndarray)):
-                gray = 0.114 * pixel[0] + 0.587 * pixel[1] + 0.299 * pixel[2]
-            else:
-                gray = pixel
-            if gray >= 200:
-                bright += 1
-        if bright >= 0.4 * w:
+            counts = [_bright_pixels(crop[i]) for i in _vote_rows(len(crop), len(crop), rows)]
+        votes = sum(1 for c in counts if c >= BRIGHT_WIDTH_RATIO * w)
+        if votes >= min_votes:
             return True
     return False
 
 
-def ocr_vitals_from_image(image_path):
-    img = cv2.imread(image_path)
-    results = {}
-    bp_crop = crop_image(img, BP_COMBINED_COORD)
+OCR_MODES = ("single", "batch", "concurrent")
+
+def configure_ocr_dispatch(max_in_flight=8, timeout=5.0, retries=1):
+    """Create the dispatcher used by ``mode="concurrent"``.
+
+    Each Vision request gets ``timeout`` seconds (also passed to the client,
+    together with the matching deadline, so abandoned calls end on their own
+    instead of retrying in the background), at most ``max_in_flight`` requests are
+    outstanding and failed fields are retried ``retries`` times before being
+    left blank.  A frame gets at most ``timeout * (retries + 1)`` seconds in
+    total, even when every worker hangs.
+    """
+    global ocr_dispatcher
+    if ocr_dispatcher is not None:
+        ocr_dispatcher.close()
+    ocr_dispatcher = ConcurrentOCRDispatcher(
+        lambda img: ocr_google_vision(img, timeout=timeout, deadline=time.monotonic() + timeout),
+        max_in_flight=max_in_flight,
+        timeout=timeout,
+        retries=retries,
+    )
+    return ocr_dispatcher
+
+def current_bed_coords():
+    """Return the coordinate dict of the bed selected in ``__main__``."""
+    return {
+        "BP_COMBINED_COORD": BP_COMBINED_COORD,
+        "CVP_COORDS": CVP_COORDS,
+        "vital_crop": vital_crop,
+        "SPONT_BREATH_COORDS": SPONT_BREATH_COORDS,
+    }
+
+def prepare_ocr_crops(img, coords):
+    """Return ``{field: crop}`` for one bed; ``"BP"`` is the combined BP/MAP crop."""
+    crops = {}
+    bp_crop = crop_image(img, coords["BP_COMBINED_COORD"])
     bp_crop = cv2.resize(bp_crop, (bp_crop.shape[1]*2, bp_crop.shape[0]*2))
     bp_crop = sharpen(bp_crop)
-    bp_enhanced = enhance_red_text(bp_crop)
-    bp_text = ocr_google_vision(bp_enhanced)
-    sbp, dbp, map_val = parse_bp_map(bp_text)
+    crops["BP"] = enhance_red_text(bp_crop)
+    for key, c in coords["vital_crop"].items():
+        crop = crop_image(img, c)
+        if key in ["VTi", "VTe"]:
+            crop = contrast_brightness(crop)
+        crops[key] = crop
+    return crops
+
+def ocr_crops(crops, mode="single", backend=None):
+    """OCR every crop in ``crops`` and return ``{key: text}``.
+
+    When a local ``backend`` (or the module-level :data:`ocr_backend`) is set,
+    it reads all crops and ``mode`` is ignored.  With :data:`ocr_cascade`
+    set, the cascade's local tier reads every crop and only doubtful crops
+    go to Vision in ``mode``.  Otherwise Google Vision is used: ``mode="single"`` issues one ``text_detection`` call per crop (the
+    original behaviour); ``mode="batch"`` sends all crops through
+    :func:`ocr_google_vision_batch`; ``mode="concurrent"`` issues the per-crop
+    requests in parallel through :data:`ocr_dispatcher`, leaving fields that
+    time out blank.
+
+    If :data:`roi_cache` is enabled, crops whose pixels are identical to the
+    previous frame reuse the cached text and are not sent to OCR at all.
+    Crops Vision could not be asked for are read by :data:`vision_fallback`
+    and never cached, so they are read again once Vision is back.
+    """
+    if mode not in OCR_MODES:
+        raise ValueError(f"unknown OCR mode: {mode}")
+    if roi_cache is None:
+        return _vision_fallback(crops, _ocr_uncached(crops, mode, backend))
+    texts = {}
+    digests = {}
+    misses = {}
+    for key, crop in crops.items():
+        digests[key] = crop_digest(crop)
+        cached = roi_cache.lookup(key, digests[key])
+        if cached is None:
+            misses[key] = crop
+        else:
+            texts[key] = cached
+    if misses:
+        read = _ocr_uncached(misses, mode, backend)
+        for key, text in read.items():
+            if text is not None:
+                roi_cache.store(key, digests[key], text)
+        texts.update(_vision_fallback(misses, read))
+    return {key: texts[key] for key in crops}
+
+def _ocr_uncached(crops, mode, backend):
+    backend = backend if backend is not None else ocr_backend
+    if backend is not None:
+        keys = list(crops)
+        return dict(zip(keys, backend.read_batch([crops[k] for k in keys])))
+    if ocr_cascade is not None:
+        return ocr_cascade.read(crops, lambda doubtful: _ocr_vision(doubtful, mode))
+    return _ocr_vision(crops, mode)
+
+def _ocr_vision(crops, mode):
+    keys = list(crops)
+    if mode == "batch":
+        texts = ocr_google_vision_batch([crops[k] for k in keys])
+    elif mode == "concurrent":
+        dispatcher = ocr_dispatcher or configure_ocr_dispatch()
+        return dispatcher.dispatch(crops)
+    else:
+        texts = [ocr_google_vision(crops[k]) for k in keys]
+    return dict(zip(keys, texts))
+
+def parse_ocr_texts(texts):
+    """Convert raw OCR texts of one bed into vital columns."""
+    results = {}
+    sbp, dbp, map_val = parse_bp_map(texts.get("BP", ""))
     results['SBP'] = sbp or ''
     results['DBP'] = dbp or ''
     results['MAP'] = map_val or ''
-    for key, coords in vital_crop.items():
-        crop = crop_image(img, coords)
-        if key in ["VTi", "VTe"]:
-            crop = contrast_brightness(crop)
-        result = ocr_google_vision(crop)
+    for key, result in texts.items():
+        if key == "BP":
+            continue
         if key == "I_E" and result:
             result = re.sub(r"^0*([1-9]):0*([0-9]+(?:\.[0-9]+)?)$", r"\1:\2", result)
         results[key] = result
-    cvp_crop = crop_image(img, CVP_COORDS)
-    results['CVP'] = predict_cvp_from_image(cvp_crop)
+    return results
+
+def _finish_bed_results(img, coords, texts, cvp_label, spont=None):
+    results = parse_ocr_texts(texts)
+    results['CVP'] = cvp_label
 
-    if detect_spontaneous_breath(img, SPONT_BREATH_COORDS):
+    if spont is None:
+        spont = detect_spontaneous_breath(img, coords.get("SPONT_BREATH_COORDS", []))
+    if spont:
         print("自発呼吸検出")
         results['SpontaneousBreath'] = 'detected'
     else:
@@ -485,79 +1040,123 @@ def ocr_vitals_from_image(image_path):
         results['SpontaneousBreath'] = ''
     return results
 
-ALL_COLUMNS = [
-    "SBP", "DBP", "MAP", "HR", "SpO2", "BSR1", "BSR2", "Tskin", "Trect", "etCO2",
-    "RR", "Ppeak", "Pmean", "PEEPact", "RRact", "I_E", "FiO2", "VTe", "VTi",
-    "PEEPset", "VTset", "CVP", "pH", "PaCO2", "pO2", "Hct", "K", "Na", "Cl",
-    "Ca", "Glu", "Lac", "tBil", "HCO3", "BE", "Alb"
-]
+def ocr_beds_from_frame(img, coords_by_bed, mode="batch"):
+    """Read the vitals of every bed in ``coords_by_bed`` from one decoded frame.
 
-# Columns that represent one-time events and should not be carried forward when
-# appending new vital rows. Currently only the IV bolus dose of furosemide is
-# treated as non-persistent so that it is logged only at the time of entry.
-NON_PERSISTENT_COLUMNS = {"furosemide_mg"}
-
-def save_vitals_to_csv(vitals_dict, csv_path):
-    """Append ``vitals_dict`` to ``csv_path`` while preserving extra columns.
-
-    Existing columns in the CSV that are not part of ``ALL_COLUMNS`` (for
-    example drug doses logged via :mod:`drug_panel`) are carried forward using
-    the most recent values so that the latest row always reflects the current
-    state.
+    In ``"batch"`` mode the crops of all beds are OCR'd together, so an
+    8-split screen costs a handful of Vision round trips in total.  The CVP
+    crops of all beds go through one :func:`predict_cvp_batch` call and the
+    spontaneous-breathing regions through one
+    :func:`detect_spontaneous_breath_batch` call.  Returns ``{bed: results}``.
+
+    With :data:`frozen_detector` enabled, beds whose waveform strip has been
+    identical for ``warn_after`` frames are not read at all; their row only
+    carries the ``Stale`` column (see :func:`stale_bed_results`).
+    """
+    stale = {}
+    if frozen_detector is not None:
+        for bed, coords in coords_by_bed.items():
+            repeats = frozen_detector.check(bed, img, coords)
+            if frozen_detector.is_frozen(repeats):
+                stale[bed] = repeats
+    live = {bed: c for bed, c in coords_by_bed.items() if bed not in stale}
+    results = _read_live_beds(img, live, mode) if live else {}
+    for bed, repeats in stale.items():
+        results[bed] = stale_bed_results(repeats)
+    return {bed: results[bed] for bed in coords_by_bed}
+
+def stale_bed_results(repeats):
+    """Row for a bed whose screen has not changed for ``repeats`` frames.
+
+    The vital columns are left blank (readers forward-fill the last real
+    values) and ``Stale`` records the repeat count.
+    """
+    print(f"画面が前回と同一のためOCRを省略しました（{repeats}回目）")
+    return {"Stale": str(repeats)}
+
+def _read_live_beds(img, coords_by_bed, mode):
+    crops = {}
+    for bed, coords in coords_by_bed.items():
+        for field, crop in prepare_ocr_crops(img, coords).items():
+            crops[(bed, field)] = crop
+    texts = ocr_crops(crops, mode=mode)
+    texts_by_bed = {bed: {} for bed in coords_by_bed}
+    for (bed, field), text in texts.items():
+        texts_by_bed[bed][field] = text
+    cvp = predict_cvp_batch([crop_image(img, c["CVP_COORDS"]) for c in coords_by_bed.values()])
+    spont = detect_spontaneous_breath_batch(
+        img, {bed: c.get("SPONT_BREATH_COORDS", []) for bed, c in coords_by_bed.items()}
+    )
+    return {
+        bed: _finish_bed_results(img, coords, texts_by_bed[bed], cvp_label, spont[bed])
+        for (bed, coords), (cvp_label, _) in zip(coords_by_bed.items(), cvp)
+    }
+
+def load_frame(image_path, coords_by_bed=None):
+    """Decode a screenshot, or expand an ROI bundle (``.npz``) to a frame.
+
+    Returns None if the file cannot be read.
+    """
+    if Path(image_path).suffix.lower() == ROI_BUNDLE_SUFFIX:
+        try:
+            return load_roi_bundle_frame(image_path, bed_rects(coords_by_bed or {}))
+        except Exception as e:
+            print(f"[WARN] ROIバンドル読み込み失敗: {image_path} -> {e}")
+            return None
+    return cv2.imread(str(image_path))
+
+def read_beds_from_image(image_path, coords_by_bed, csv_paths, mode="batch"):
+    """Decode ``image_path`` once and append every bed's vitals to its CSV.
+
+    ``image_path`` may also be an ROI bundle written by
+    ``auto_capture.py --roi-bundle``.  Rows are stamped with the capture time
+    from the file name (see :func:`frame_source.frame_time`), or the current
+    time if the name does not carry one.  Returns ``{bed: results}``; an
+    unreadable image returns ``{}`` without touching the CSVs.
     """
+    img = load_frame(image_path, coords_by_bed)
+    if img is None:
+        print(f"[WARN] 画像を読み込めません: {image_path}")
+        return {}
+    captured = frame_time(image_path)
+    results = ocr_beds_from_frame(img, coords_by_bed, mode=mode)
+    for bed, vitals in results.items():
+        if captured is not None:
+            vitals.setdefault("timestamp", captured.strftime("%Y-%m-%d %H:%M:%S"))
+        save_vitals_to_csv(vitals, csv_paths[bed])
+    return results
 
-    # Start with the standard vital signs
-    row = {k: vitals_dict.get(k, '') for k in ALL_COLUMNS}
-    ts = vitals_dict.get("timestamp")
-    row["timestamp"] = ts if ts else datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+def read_beds_from_ring(ring, seq, coords_by_bed, csv_paths, mode="batch"):
+    """Read frame ``seq`` of a :class:`frame_ring.FrameRing` and append the CSVs.
 
-    # Include any additional columns provided in ``vitals_dict`` such as
-    # drug doses or gas measurements. They will be added to the CSV header
-    # if not already present.
-    for k, v in vitals_dict.items():
-        if k not in row:
-            row[k] = v
+    Only the rectangles of ``coords_by_bed`` are copied out of shared memory
+    (see :func:`roi_bundle.bed_rects`), and the slot is checked right after
+    the copy, so OCR and inference run on private crops however long they
+    take.  If the capture process overwrote the frame during the copy,
+    ``{}`` is returned.  Rows are stamped with the capture time.
+    """
+    frame = ring.read(seq)
+    if frame is None:
+        print(f"[WARN] フレーム {seq} は既に上書きされています")
+        return {}
+    bundle = RoiBundle.from_frame(frame.image, bed_rects(coords_by_bed), frame.timestamp_ns)
+    if not ring.is_intact(frame):
+        print(f"[WARN] 複製中にフレーム {seq} が上書きされたため破棄します")
+        return {}
+    results = ocr_beds_from_frame(bundle.to_frame(), coords_by_bed, mode=mode)
+    ts = datetime.fromtimestamp(frame.timestamp_ns / 1e9).strftime("%Y-%m-%d %H:%M:%S")
+    for bed, vitals in results.items():
+        vitals.setdefault("timestamp", ts)
+        save_vitals_to_csv(vitals, csv_paths[bed])
+    return results
 
-    try:
-        tmp_path = f"{csv_path}.tmp"
-        if os.path.exists(csv_path):
-            with open(csv_path, newline="", encoding="utf-8-sig") as f:
-                reader = csv.DictReader(f)
-                fieldnames = list(reader.fieldnames or [])
-                rows = list(reader)
-
-            # Identify extra columns (e.g., drug doses) that are already in the
-            # CSV but not included in the current ``row``. For these columns we
-            # carry forward the most recent values so that the latest row always
-            # represents the current state.
-            extra_cols = [
-                c
-                for c in fieldnames
-                if c not in ["timestamp"] + ALL_COLUMNS
-                and c not in row
-                and c not in NON_PERSISTENT_COLUMNS
-            ]
-            if rows and extra_cols:
-                last = rows[-1]
-                for c in extra_cols:
-                    row[c] = last.get(c, '')
-            fieldnames = list(dict.fromkeys(fieldnames + list(row.keys())))
-
-            with open(tmp_path, "w", newline="", encoding="utf-8-sig") as f:
-                writer = csv.DictWriter(f, fieldnames=fieldnames)
-                writer.writeheader()
-                writer.writerows(rows)
-                writer.writerow(row)
-            os.replace(tmp_path, csv_path)
-        else:
-            fieldnames = ["timestamp"] + ALL_COLUMNS
-            with open(tmp_path, "w", newline="", encoding="utf-8-sig") as f:
-                writer = csv.DictWriter(f, fieldnames=fieldnames)
-                writer.writeheader()
-                writer.writerow(row)
-            os.replace(tmp_path, csv_path)
-    except Exception as e:  # pragma: no cover - best effort logging
-        print(f"[WARN] CSV書き込み失敗: {e}")
+def ocr_vitals_from_image(image_path, coords=None, mode="single"):
+    if coords is None:
+        coords = current_bed_coords()
+    img = load_frame(image_path, {None: coords})
+    texts = ocr_crops(prepare_ocr_crops(img, coords), mode=mode)
+    cvp_label = predict_cvp_from_image(crop_image(img, coords["CVP_COORDS"]))
+    return _finish_bed_results(img, coords, texts, cvp_label)
 
 # =========================
 # 親Z:\image → 今日 or 最新日付フォルダ 追従
@@ -576,20 +1175,32 @@ def pick_today_or_latest(base: Path) -> Path:
 # =========================
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "replay":
+        # 保存済みの画像フォルダをオフラインで再生する（replay.py）
+        from replay import main as replay_main
+        sys.exit(replay_main(sys.argv[2:]))
+
     args = parse_args()
     config = load_config(args.config)
 
     # Display available 8-screen bed coordinate keys
     print(BED_COORDS_8.keys())
 
-    cvp_model_path = resolve_path(
-        args.cvp_model,
-        "CVP_MODEL_PATH",
-        config,
-        "CVP_MODEL_PATH",
-        candidates=DEFAULT_CVP_MODEL_CANDIDATES,
-        must_exist=True,
-    )
+    inference_server = args.inference_server or os.getenv("INFERENCE_SERVER") or config.get("INFERENCE_SERVER")
+    try:
+        cvp_model_path = resolve_path(
+            args.cvp_model,
+            "CVP_MODEL_PATH",
+            config,
+            "CVP_MODEL_PATH",
+            candidates=DEFAULT_CVP_MODEL_CANDIDATES,
+            must_exist=True,
+        )
+    except ValueError:
+        # 推論サーバーを使う場合はモデルファイル不要
+        if not inference_server:
+            raise
+        cvp_model_path = None
     try:
         spont_breath_model_path = resolve_path(
             args.spont_breath_model,
@@ -612,14 +1223,44 @@ if __name__ == "__main__":
         )
     except ValueError:
         spont_breath_meta_path = None
-    service_account_file = resolve_path(
-        args.service_account_file,
-        "SERVICE_ACCOUNT_FILE",
-        config,
-        "SERVICE_ACCOUNT_FILE",
-        candidates=DEFAULT_SA_JSON_CANDIDATES,
-        must_exist=True,
-    )
+    ocr_backend_name = args.ocr_backend or os.getenv("OCR_BACKEND") or config.get("OCR_BACKEND") or "vision"
+    ocr_templates_path = None
+    if ocr_backend_name in ("template", "cascade"):
+        ocr_templates_path = resolve_path(
+            args.ocr_templates,
+            "OCR_TEMPLATES",
+            config,
+            "OCR_TEMPLATES",
+            candidates=DEFAULT_OCR_TEMPLATE_CANDIDATES,
+            must_exist=True,
+        )
+    else:
+        # Vision 停止中の代替としてテンプレートがあれば使う
+        try:
+            ocr_templates_path = resolve_path(
+                args.ocr_templates,
+                "OCR_TEMPLATES",
+                config,
+                "OCR_TEMPLATES",
+                candidates=DEFAULT_OCR_TEMPLATE_CANDIDATES,
+                must_exist=True,
+            )
+        except ValueError:
+            ocr_templates_path = None
+    try:
+        service_account_file = resolve_path(
+            args.service_account_file,
+            "SERVICE_ACCOUNT_FILE",
+            config,
+            "SERVICE_ACCOUNT_FILE",
+            candidates=DEFAULT_SA_JSON_CANDIDATES,
+            must_exist=True,
+        )
+    except ValueError:
+        # ローカルOCRのみで動かす場合はサービスアカウント不要
+        if ocr_backend_name != "template":
+            raise
+        service_account_file = None
     image_folder = resolve_path(
         args.image_folder,
         "IMAGE_FOLDER",
@@ -643,44 +1284,142 @@ if __name__ == "__main__":
     print(f"[PATH] SERVICE_ACCOUNT_FILE = {service_account_file}")
     print(f"[PATH] IMAGE_FOLDER(base) = {image_folder}")
     print(f"[PATH] VITALS_BASE_DIR = {vitals_base_dir}")
+    print(f"[PATH] OCR_TEMPLATES = {ocr_templates_path}")
+
+    # 項目ごとの閾値は config.json の OCR_CASCADE_THRESHOLDS（例: {"default": 0.85, "BP": 0.9}）
+    ocr_cascade_thresholds = dict(config.get("OCR_CASCADE_THRESHOLDS") or {})
+    if os.getenv("OCR_CASCADE_THRESHOLDS"):
+        ocr_cascade_thresholds.update(json.loads(os.environ["OCR_CASCADE_THRESHOLDS"]))
+    if args.ocr_cascade_threshold is not None:
+        ocr_cascade_thresholds["default"] = args.ocr_cascade_threshold
+    ocr_mode = args.ocr_mode or os.getenv("OCR_MODE") or config.get("OCR_MODE") or "batch"
+    if ocr_mode not in OCR_MODES:
+        # 環境変数や config.json の綴り違いは起動時に止める（フレームごとに失敗させない）
+        raise ValueError(f"unknown OCR mode: {ocr_mode} (choose from {', '.join(OCR_MODES)})")
+    print(f"[OCR] backend = {ocr_backend_name}, mode = {ocr_mode}")
+    if not args.no_roi_cache and str(os.getenv("OCR_ROI_CACHE", config.get("OCR_ROI_CACHE", "1"))).lower() not in ("0", "false", "no", "off"):
+        roi_cache = RoiOCRCache()
+    if not args.no_frozen_check and str(os.getenv("FROZEN_FRAME_CHECK", config.get("FROZEN_FRAME_CHECK", "1"))).lower() not in ("0", "false", "no", "off"):
+        frozen_detector = FrozenFrameDetector(
+            warn_after=int(args.frozen_warn_after or os.getenv("FROZEN_WARN_AFTER") or config.get("FROZEN_WARN_AFTER", 3)),
+        )
+    vitals_db = args.vitals_db or os.getenv("VITALS_DB") or config.get("VITALS_DB")
+    if vitals_db:
+        set_default_store(vitals_db)
+        print(f"[PATH] VITALS_DB = {Path(vitals_db).expanduser()}")
+    ocr_cache_db = args.ocr_cache_db or os.getenv("OCR_CACHE_DB") or config.get("OCR_CACHE_DB") or str(DEFAULT_OCR_CACHE_DB)
+    if ocr_cache_db.lower() not in ("off", "none", "0"):
+        ocr_result_cache = PersistentOCRCache(
+            Path(ocr_cache_db).expanduser(),
+            max_entries=int(args.ocr_cache_max or os.getenv("OCR_CACHE_MAX_ENTRIES") or config.get("OCR_CACHE_MAX_ENTRIES", 200_000)),
+        )
+        print(f"[PATH] OCR_CACHE_DB = {ocr_result_cache.path} ({len(ocr_result_cache)} entries)")
+    if ocr_mode == "concurrent":
+        configure_ocr_dispatch(
+            max_in_flight=int(args.ocr_max_in_flight or os.getenv("OCR_MAX_IN_FLIGHT") or config.get("OCR_MAX_IN_FLIGHT", 8)),
+            timeout=float(args.ocr_timeout or os.getenv("OCR_TIMEOUT") or config.get("OCR_TIMEOUT", 5.0)),
+            retries=int(args.ocr_retries if args.ocr_retries is not None else os.getenv("OCR_RETRIES") or config.get("OCR_RETRIES", 1)),
+        )
 
-    init_resources(cvp_model_path, service_account_file, spont_breath_model_path, spont_breath_meta_path)
+    init_resources(
+        cvp_model_path,
+        service_account_file,
+        spont_breath_model_path,
+        spont_breath_meta_path,
+        ocr_backend_name=ocr_backend_name,
+        ocr_templates_path=ocr_templates_path,
+        cvp_backend=args.cvp_backend or os.getenv("CVP_BACKEND") or config.get("CVP_BACKEND") or "auto",
+        spont_breath_threads=args.spont_breath_threads or os.getenv("SPONT_BREATH_THREADS") or config.get("SPONT_BREATH_THREADS"),
+        ocr_cascade_thresholds=ocr_cascade_thresholds,
+        inference_server=inference_server,
+        vision_options=dict(
+            rate=float(args.vision_rate or os.getenv("VISION_RATE_LIMIT") or config.get("VISION_RATE_LIMIT", 10.0)),
+            max_attempts=int(args.vision_max_attempts or os.getenv("VISION_MAX_ATTEMPTS") or config.get("VISION_MAX_ATTEMPTS", 4)),
+            breaker=CircuitBreaker(
+                failure_threshold=int(os.getenv("VISION_BREAKER_THRESHOLD") or config.get("VISION_BREAKER_THRESHOLD", 5)),
+                reset_timeout=float(os.getenv("VISION_BREAKER_RESET") or config.get("VISION_BREAKER_RESET", 30.0)),
+            ),
+        ),
+    )
 
     # ==== 表示モード & ベッド選択 ====
-    display_mode, VITALS_PATH, bed_num = select_display_and_bed(vitals_base_dir)
-    print(f"選択された画面分割: {display_mode}")
-    print(f"選択されたベッド番号: {bed_num}")
-    print(f"保存先CSV: {VITALS_PATH}")
+    if args.all_beds:
+        display_mode, csv_paths = select_display(
+            vitals_base_dir, args.display, args.beds.split(",") if args.beds else None
+        )
+        print(f"選択された画面分割: {display_mode}（全ベッドモード）")
+        for bed, path in csv_paths.items():
+            print(f"ベッド{bed} 保存先CSV: {path}")
+    else:
+        display_mode, VITALS_PATH, bed_num = select_display_and_bed(vitals_base_dir)
+        csv_paths = {bed_num: VITALS_PATH}
+        print(f"選択された画面分割: {display_mode}")
+        print(f"選択されたベッド番号: {bed_num}")
+        print(f"保存先CSV: {VITALS_PATH}")
 
-    coords = (BED_COORDS_4 if display_mode == "4" else BED_COORDS_8)[bed_num]
-    BP_COMBINED_COORD = coords["BP_COMBINED_COORD"]
-    CVP_COORDS = coords["CVP_COORDS"]
-    vital_crop = coords["vital_crop"]
-    SPONT_BREATH_COORDS = coords.get("SPONT_BREATH_COORDS", [])
+    table = BED_COORDS_4 if display_mode == "4" else BED_COORDS_8
+    coords_by_bed = {bed: table[bed] for bed in csv_paths}
+    if not args.all_beds:
+        coords = coords_by_bed[bed_num]
+        BP_COMBINED_COORD = coords["BP_COMBINED_COORD"]
+        CVP_COORDS = coords["CVP_COORDS"]
+        vital_crop = coords["vital_crop"]
+        SPONT_BREATH_COORDS = coords.get("SPONT_BREATH_COORDS", [])
 
     # ==== 画像フォルダの実体化 ====
     image_folder = Path(image_folder)
     image_folder.mkdir(parents=True, exist_ok=True)
 
-    # 親(Z:\\image)を渡された場合は今日 or 最新日付フォルダに自動で降りる
-    if image_folder.is_dir():
-        has_dated_subdir = any(p.is_dir() and re.fullmatch(r"\d{8}", p.name) for p in image_folder.iterdir())
-        if has_dated_subdir:
-            chosen = pick_today_or_latest(image_folder)
-            print(f"画像フォルダ自動選択: {chosen}")
-            image_folder = chosen
+    # 親(Z:\\image)を渡された場合は日付フォルダごと監視し、日付が変わっても追従する
+    has_dated_subdir = image_folder.is_dir() and any(
+        p.is_dir() and re.fullmatch(r"\d{8}", p.name) for p in image_folder.iterdir()
+    )
+    if has_dated_subdir:
+        print(f"画像フォルダ自動選択: {pick_today_or_latest(image_folder)}（日付フォルダを監視）")
+
+    frame_shm = args.shm or os.getenv("FRAME_SHM") or config.get("FRAME_SHM")
+    if frame_shm:
+        print("auto_capture.py の起動を待っています…")
+        ring = FrameRing.attach(frame_shm, wait=3600)
+        frame_source = RingFrameSource(ring)
+        print(f"[FRAME] source = shared memory ({frame_shm})")
+    else:
+        ring = None
+        frame_source = FrameSource(
+            image_folder,
+            pattern=FRAME_PATTERNS,
+            recursive=has_dated_subdir,
+            mode=args.frame_source or os.getenv("FRAME_SOURCE") or config.get("FRAME_SOURCE") or "auto",
+            skip_to_latest=args.skip_to_latest_frame
+            or str(os.getenv("FRAME_SKIP_TO_LATEST", config.get("FRAME_SKIP_TO_LATEST", "0"))).lower() in ("1", "true", "yes", "on"),
+        )
+        print(f"[FRAME] source = {frame_source.mode} ({image_folder})")
 
     print("自動OCR＆CSV保存ループを開始します（Ctrl+Cで停止）")
     try:
-        while True:
-            files = list(image_folder.glob("*.png"))
-            if not files:
-                print("画像が見つかりませんでした。")
-            else:
-                latest_image = max(files, key=lambda p: p.stat().st_mtime)
-                vitals = ocr_vitals_from_image(str(latest_image))
-                save_vitals_to_csv(vitals, VITALS_PATH)
-                print(f"{datetime.now()} 画像:{latest_image.name} のバイタルを保存しました")
-            time.sleep(60)
+        with frame_source:
+            while True:
+                frame = frame_source.get(timeout=60)
+                if frame is None:
+                    print("新しい画像が見つかりませんでした。")
+                    continue
+                if ring is not None:
+                    # auto_capture の再起動後は frame_source が新しいリングに繋ぎ直している
+                    results = read_beds_from_ring(frame_source.ring, frame, coords_by_bed, csv_paths, mode=ocr_mode)
+                    label = f"フレーム:{frame}"
+                else:
+                    results = read_beds_from_image(frame, coords_by_bed, csv_paths, mode=ocr_mode)
+                    label = f"画像:{frame.name}"
+                if results:
+                    beds_str = ",".join(str(b) for b in results)
+                    print(f"{datetime.now()} {label} のバイタルを保存しました（ベッド{beds_str}）")
+                    if roi_cache is not None:
+                        print(f"[OCR cache] {roi_cache.summary()}")
+                    if ocr_result_cache is not None:
+                        print(f"[OCR store] {ocr_result_cache.summary()}")
+                    if ocr_cascade is not None:
+                        print(f"[OCR cascade] {ocr_cascade.summary()}")
+                    if isinstance(client, ResilientVisionClient):
+                        print(f"[Vision] {client.summary()}")
     except KeyboardInterrupt:
         print("中断されました。")
@@ -29,7 +29,7 @@ def check_sbp_trend(
         otherwise ``None``.
     """
     try:
-        with open(csv_path, newline="", encoding="utf-8") as f:
+        with open(csv_path, newline="", encoding="utf-8-sig") as f:
             rows = list(csv.DictReader(f))
     except Exception:
         return None
@@ -54,7 +54,46 @@ def check_sbp_trend(
         return None
     past = past_candidates[-1]
 
-    diff = latest["SBP"] - past["SBP"]
+    return _trend_alarm(latest["SBP"] - past["SBP"], threshold)
+
+
+def check_sbp_trend_store(
+    store,
+    bed: Union[str, int],
+    threshold: float = 10.0,
+    window_minutes: int = 10,
+    since: Optional[str] = None,
+    csv_path: Union[Path, str, None] = None,
+) -> Optional[Dict[str, Any]]:
+    """Same check as :func:`check_sbp_trend` against a ``VitalsStore``.
+
+    Only two indexed lookups are made (the newest SBP and the last SBP at or
+    before the cutoff) instead of reading the whole history.  ``since``
+    ignores values older than that timestamp (e.g. an earlier case).
+
+    The store only holds rows mirrored since ``VITALS_DB`` was set, by the
+    processes that have it set.  When it has no SBP since ``since`` or none
+    older than the window, the check is made on ``csv_path`` instead (if
+    given) rather than silently reporting no change.
+    """
+    try:
+        newest = store.value_at(bed, "SBP")
+        past = None
+        if newest is not None and (since is None or newest[0] >= since):
+            latest_ts = datetime.fromisoformat(newest[0])
+            past = store.value_at(bed, "SBP", latest_ts - timedelta(minutes=window_minutes))
+        if past is None or (since is not None and past[0] < since):
+            # ストアに窓を覆う SBP がない（読み取り側が未設定、途中から有効化など）
+            if csv_path is not None:
+                return check_sbp_trend(csv_path, threshold, window_minutes)
+            return None
+        diff = float(newest[1]) - float(past[1])
+    except Exception:
+        return None
+    return _trend_alarm(diff, threshold)
+
+
+def _trend_alarm(diff: float, threshold: float) -> Optional[Dict[str, Any]]:
     if diff >= threshold:
         return {
             "alarm": True,
@@ -0,0 +1,408 @@
+"""Vitals CSV persistence shared by ``vital_reader`` and the entry panels.
+
+Only the standard library is imported here, so the panels that merely
+append a row (``gas_panel``, ``ph_risk_panel``, ``blood_gas_panel``) do not
+pay for OpenCV, torch or the Vision client.  ``vital_reader`` re-exports
+these names.
+"""
+import csv
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+from vitals_store import mirror_row
+
+try:  # POSIX
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+try:  # Windows
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+
+class _PathLock:
+    def __init__(self):
+        self.rlock = threading.RLock()
+        self.depth = 0
+        self.handle = None
+
+
+_path_locks = {}
+_path_locks_guard = threading.Lock()
+
+
+def _os_lock(handle):
+    if fcntl is not None:
+        fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+    elif msvcrt is not None:  # pragma: no cover - Windows
+        handle.seek(0)
+        while True:
+            try:
+                msvcrt.locking(handle.fileno(), msvcrt.LK_LOCK, 1)
+                return
+            except OSError:
+                continue  # LK_LOCK は約 10 秒で諦めるので取れるまで繰り返す
+
+
+def _os_unlock(handle):
+    if fcntl is not None:
+        fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+    elif msvcrt is not None:  # pragma: no cover - Windows
+        handle.seek(0)
+        msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+@contextmanager
+def csv_write_lock(csv_path):
+    """Hold the exclusive writer lock of ``csv_path`` (threads and processes).
+
+    Every writer of a vitals CSV (this module, ``drug_panel``,
+    ``fluid_panel``) wraps its read-modify-write in this lock, so rows
+    appended by one writer are never lost to another writer's rewrite.  The
+    advisory lock (``fcntl.flock`` / ``msvcrt.locking``) is taken on a
+    sidecar ``<csv>.lock`` file because rewrites replace the CSV itself.  The
+    lock is reentrant within a process.
+    """
+    key = os.path.abspath(os.fspath(csv_path))
+    with _path_locks_guard:
+        lock = _path_locks.setdefault(key, _PathLock())
+    with lock.rlock:
+        if lock.depth == 0:
+            handle = open(key + ".lock", "a+b")
+            try:
+                _os_lock(handle)
+            except BaseException:
+                handle.close()
+                raise
+            lock.handle = handle
+        lock.depth += 1
+        try:
+            yield
+        finally:
+            lock.depth -= 1
+            if lock.depth == 0:
+                handle, lock.handle = lock.handle, None
+                try:
+                    _os_unlock(handle)
+                finally:
+                    handle.close()
+
+
+VITAL_COLUMNS = [
+    "timestamp", "SBP", "DBP", "MAP", "HR", "SpO2", "BSR1", "BSR2",
+    "Tskin", "Trect", "etCO2", "RR", "Ppeak", "Pmean", "PEEPact", "RRact",
+    "I_E", "FiO2", "VTe", "VTi", "PEEPset", "VTset", "CVP",
+    "pH", "PaCO2", "pO2", "Hct", "K", "Na", "Cl", "Ca", "Glu", "Lac",
+    "tBil", "HCO3", "BE", "Alb"
+]
+
+def create_empty_vitals_csv(path):
+    with csv_write_lock(path):
+        if os.path.exists(path):
+            return
+        with open(path, "w", newline="", encoding="utf-8-sig") as f:
+            csv.writer(f).writerow(VITAL_COLUMNS)
+    print(f"[INFO] 空のバイタルCSVを作成: {path}")
+
+ALL_COLUMNS = [
+    "SBP", "DBP", "MAP", "HR", "SpO2", "BSR1", "BSR2", "Tskin", "Trect", "etCO2",
+    "RR", "Ppeak", "Pmean", "PEEPact", "RRact", "I_E", "FiO2", "VTe", "VTi",
+    "PEEPset", "VTset", "CVP", "pH", "PaCO2", "pO2", "Hct", "K", "Na", "Cl",
+    "Ca", "Glu", "Lac", "tBil", "HCO3", "BE", "Alb"
+]
+
+# Columns that represent one-time events and should not be carried forward when
+# appending new vital rows. The IV bolus dose of furosemide is logged only at
+# the time of entry, and ``Stale`` only marks rows written for frozen screens.
+NON_PERSISTENT_COLUMNS = {"furosemide_mg", "Stale"}
+
+# Header and last row of every CSV this process appended to, keyed by path.
+# ``stat`` is (size, mtime_ns) right after our own write; when it no longer
+# matches, somebody else (a panel, pandas, another reader) touched the file
+# and the entry is reloaded from disk.
+_tails = {}
+
+_TAIL_BLOCK = 4096
+
+
+def _stat_key(path):
+    st = os.stat(path)
+    return st.st_size, st.st_mtime_ns
+
+
+def _read_tail(path):
+    """Return ``(fieldnames, last_row, ends_with_newline)`` without reading the whole file.
+
+    The header is the first line and the last row is found by reading blocks
+    backwards from the end, so the cost does not grow with the file length.
+    Values with embedded newlines are not supported (none are ever written).
+    """
+    with open(path, "rb") as f:
+        header = f.readline()
+        f.seek(0, os.SEEK_END)
+        end = f.tell()
+        pos = end
+        tail = b""
+        while pos > len(header):
+            step = min(_TAIL_BLOCK, pos - len(header))
+            pos -= step
+            f.seek(pos)
+            tail = f.read(step) + tail
+            if tail.rstrip(b"\r\n").count(b"\n") >= 1 or pos <= len(header):
+                break
+    fieldnames = next(csv.reader([header.decode("utf-8-sig")]), [])
+    lines = [ln for ln in tail.decode("utf-8", errors="replace").splitlines() if ln.strip()]
+    last = {}
+    if lines:
+        values = next(csv.reader([lines[-1]]), [])
+        last = dict(zip(fieldnames, values))
+    ends_with_newline = end == 0 or (tail or header).endswith(b"\n")
+    return fieldnames, last, ends_with_newline
+
+
+def _tail(path):
+    key = _stat_key(path)
+    cached = _tails.get(path)
+    if cached is None or cached["stat"] != key:
+        fieldnames, last, newline = _read_tail(path)
+        cached = {"fieldnames": fieldnames, "last": last, "newline": newline, "stat": key}
+        _tails[path] = cached
+    return cached
+
+
+def _sync(f, fsync):
+    if fsync:
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _rewrite(csv_path, fieldnames, new_rows, fsync=False):
+    """Rewrite ``csv_path`` with a widened header plus ``new_rows`` (compaction)."""
+    tmp_path = f"{csv_path}.tmp"
+    rows = []
+    if os.path.exists(csv_path):
+        with open(csv_path, newline="", encoding="utf-8-sig") as f:
+            rows = list(csv.DictReader(f))
+    with open(tmp_path, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
+        writer.writerows(new_rows)
+        _sync(f, fsync)
+    os.replace(tmp_path, csv_path)
+
+
+def vitals_row(vitals_dict):
+    """Return the CSV row for ``vitals_dict``: every vital column plus its extra keys."""
+    # Start with the standard vital signs
+    row = {k: vitals_dict.get(k, '') for k in ALL_COLUMNS}
+    ts = vitals_dict.get("timestamp")
+    row["timestamp"] = ts if ts else datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    # Include any additional columns provided in ``vitals_dict`` such as
+    # drug doses or gas measurements. They will be added to the CSV header
+    # if not already present.
+    for k, v in vitals_dict.items():
+        if k not in row:
+            row[k] = v
+    return row
+
+
+def write_rows(csv_path, items, fsync=False):
+    """Write ``items`` (``(row, carry_forward)`` pairs) to ``csv_path`` in one go.
+
+    Rows with ``carry_forward`` take the extra columns they lack (drug doses
+    and the like, except :data:`NON_PERSISTENT_COLUMNS`) from the row written
+    before them.  When the header covers every row they are appended with a
+    single write; otherwise the file is rewritten once with the widened
+    header.  With ``fsync`` the data is on disk before this returns.
+    """
+    try:
+        with csv_write_lock(csv_path):
+            exists = os.path.exists(csv_path) and os.path.getsize(csv_path) > 0
+            if exists:
+                tail = _tail(csv_path)
+                fieldnames = list(tail["fieldnames"])
+                last, newline = tail["last"], tail["newline"]
+            else:
+                fieldnames = ["timestamp"] + ALL_COLUMNS
+                last, newline = {}, True
+
+            rows = []
+            for row, carry_forward in items:
+                row = dict(row)
+                if carry_forward:
+                    # Identify extra columns (e.g., drug doses) that are already in
+                    # the CSV but not included in the current ``row``. For these
+                    # columns we carry forward the most recent values so that the
+                    # latest row always represents the current state.
+                    for c in fieldnames:
+                        if c not in ["timestamp"] + ALL_COLUMNS and c not in row and c not in NON_PERSISTENT_COLUMNS:
+                            row[c] = last.get(c, '')
+                last = {k: "" if v is None else str(v) for k, v in row.items()}
+                fieldnames = list(dict.fromkeys(fieldnames + list(row.keys())))
+                rows.append(row)
+            if not rows:
+                return
+
+            if exists and len(fieldnames) == len(tail["fieldnames"]):
+                with open(csv_path, "a", newline="", encoding="utf-8") as f:
+                    if not newline:
+                        f.write("\r\n")
+                    csv.DictWriter(f, fieldnames=fieldnames).writerows(rows)
+                    _sync(f, fsync)
+            else:
+                _rewrite(csv_path, fieldnames, rows, fsync)
+                tail = _tails.setdefault(csv_path, {})
+            tail.update(fieldnames=fieldnames, last=last, newline=True, stat=_stat_key(csv_path))
+    except Exception:
+        # 途中で失敗したらキャッシュを捨てて次回ファイルから読み直す
+        _tails.pop(csv_path, None)
+        raise
+
+
+def save_vitals_to_csv(vitals_dict, csv_path, write_queue=None):
+    """Append ``vitals_dict`` to ``csv_path`` while preserving extra columns.
+
+    Existing columns in the CSV that are not part of ``ALL_COLUMNS`` (for
+    example drug doses logged via :mod:`drug_panel`) are carried forward using
+    the most recent values so that the latest row always reflects the current
+    state.
+
+    When the header already covers the row a single line is appended, so the
+    cost is independent of the file length.  Only a row that introduces new
+    columns rewrites the file once with the widened header.  Both happen
+    under :func:`csv_write_lock`.  With ``write_queue`` (a
+    :class:`vitals_write_queue.VitalsWriteQueue`) the row is only queued and
+    this returns immediately.
+    """
+    row = vitals_row(vitals_dict)
+    if write_queue is not None:
+        write_queue.submit(csv_path, row)
+        return
+    try:
+        write_rows(csv_path, [(row, True)])
+        # VITALS_DB には呼び出し元の値だけを入れる（引き継いだ薬剤列は既にある）
+        # CSV に書けなかった行は DB にも入れない
+        mirror_row(csv_path, row)
+    except Exception as e:  # pragma: no cover - best effort logging
+        print(f"[WARN] CSV書き込み失敗: {e}")
+
+
+# Cell texts pandas.read_csv treats as missing by default.
+NA_VALUES = {
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND",
+    "1.#QNAN", "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+}
+
+
+def _cell_value(text):
+    """Return ``None`` for a missing cell, a number for numeric text, else the text."""
+    if text in NA_VALUES:
+        return None
+    try:
+        return int(text)
+    except ValueError:
+        pass
+    try:
+        return float(text)
+    except ValueError:
+        return text
+
+
+class LatestVitalsReader:
+    """Forward-filled last row of vitals CSVs, parsing only appended lines.
+
+    For every path the byte offset of the last complete line, the header and
+    the last non-missing value of each column are remembered, so a call costs
+    as much as the lines written since the previous call.  The result equals
+    ``pd.read_csv(path).ffill().iloc[-1]`` with missing values as ``None``,
+    except that :data:`NON_PERSISTENT_COLUMNS` (e.g. ``Stale``) hold only the
+    last row's own value.
+
+    The file is reloaded from the start when it was replaced (``os.replace``
+    by a compaction), truncated, its header changed, or the bytes just before
+    the remembered offset differ (a writer that rewrote the file in place).
+    A final line without its newline is used for the result but read again
+    on the next call.
+    """
+
+    _FINGERPRINT = 64
+
+    def __init__(self):
+        self._state = {}
+
+    def read(self, path):
+        """Return the forward-filled latest row of ``path`` or ``None`` when it has no rows."""
+        path = os.fspath(path)
+        st = os.stat(path)
+        with open(path, "rb") as f:
+            state = self._state.get(path)
+            if state is None or not self._unchanged(f, st, state):
+                f.seek(0)
+                header = f.readline()
+                if not header.strip():
+                    self._state.pop(path, None)
+                    return None
+                fieldnames = next(csv.reader([header.decode("utf-8-sig")]))
+                state = {
+                    "ino": st.st_ino,
+                    "header": header,
+                    "fieldnames": fieldnames,
+                    "values": dict.fromkeys(fieldnames),
+                    "rows": 0,
+                    "offset": len(header),
+                    "fingerprint": header[-self._FINGERPRINT:],
+                }
+                self._state[path] = state
+            f.seek(state["offset"])
+            chunk = f.read()
+
+        end = chunk.rfind(b"\n") + 1
+        complete, partial = chunk[:end], chunk[end:]
+        if complete:
+            state["rows"] += self._apply(state, complete, state["values"])
+            state["offset"] += len(complete)
+            state["fingerprint"] = (state["fingerprint"] + complete)[-self._FINGERPRINT:]
+        values, rows = state["values"], state["rows"]
+        if partial.strip():
+            values = dict(values)
+            rows += self._apply(state, partial, values)
+        if not rows:
+            return None
+        return dict(values)
+
+    def forget(self, path):
+        self._state.pop(os.fspath(path), None)
+
+    def _unchanged(self, f, st, state):
+        if st.st_ino != state["ino"] or st.st_size < state["offset"]:
+            return False
+        header = state["header"]
+        if f.read(len(header)) != header:
+            return False
+        fp = state["fingerprint"]
+        f.seek(state["offset"] - len(fp))
+        return f.read(len(fp)) == fp
+
+    @staticmethod
+    def _apply(state, data, values):
+        """Forward-fill ``values`` with the CSV lines in ``data``; returns the row count."""
+        fieldnames = state["fieldnames"]
+        rows = 0
+        for cells in csv.reader(data.decode("utf-8", errors="replace").splitlines()):
+            if not cells:
+                continue  # pandas と同じく空行は数えない
+            rows += 1
+            # 投与量や Stale はその行だけの値なので前方補完しない
+            for name in NON_PERSISTENT_COLUMNS:
+                if name in values:
+                    values[name] = None
+            for name, text in zip(fieldnames, cells):
+                value = _cell_value(text)
+                if value is not None:
+                    values[name] = value
+        return rows
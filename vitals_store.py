@@ -0,0 +1,334 @@
+"""SQLite store for the vitals written by the reader, the panels and the main loop.
+
+Every value is one row of a long-format table ``(ts, bed, key, value)``, so
+adding a drug or a blood gas item never changes the schema, and writers only
+ever insert.  A small ``latest`` table keeps the newest value per
+``(bed, key)``, which makes :meth:`VitalsStore.latest` a lookup of a few dozen
+rows instead of a scan of the day's history.  The database runs in WAL mode so
+``vital_reader``, the panels and ``main_surgery`` can use the same file from
+separate processes.
+
+The CSV files stay the primary record; when ``VITALS_DB`` is set the rows are
+mirrored here as they are written, and :meth:`VitalsStore.export_csv` writes
+the wide ``vitals_history_{bed}.csv`` layout back out.
+
+Example::
+
+    python vitals_store.py import --db vitals.db --bed 2 vitals_history_2.csv
+    python vitals_store.py export --db vitals.db --bed 2 out.csv
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import math
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple, Union
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+BED_FROM_CSV_RE = re.compile(r"vitals_history_([^./\\]+)\.csv$")
+
+
+def ts_text(ts: Union[str, datetime, None]) -> str:
+    """Return ``ts`` as ``YYYY-mm-dd HH:MM:SS`` text (now when ``None``)."""
+    if ts is None or ts == "":
+        ts = datetime.now()
+    if isinstance(ts, datetime):
+        return ts.strftime(TIMESTAMP_FORMAT)
+    return str(ts).replace("T", " ")
+
+
+def encode_value(value: Any) -> Any:
+    """Return the value to store, or ``None`` for an empty cell.
+
+    Numbers (including numeric strings read back from a CSV) are stored as
+    REAL so windowed queries can compare them; anything else such as the
+    ``I_E`` ratio is kept as text.
+    """
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, (int, float)):
+        return None if math.isnan(value) else float(value)
+    text = str(value).strip()
+    if not text or text.lower() == "nan":
+        return None
+    try:
+        return float(text)
+    except ValueError:
+        return text
+
+
+def bed_for_path(csv_path: Union[str, Path]) -> str:
+    """Bed id of a ``vitals_history_{bed}.csv`` path (the file stem otherwise)."""
+    name = Path(csv_path).name
+    m = BED_FROM_CSV_RE.search(name)
+    return m.group(1) if m else Path(name).stem
+
+
+def day_start_for_path(csv_path: Union[str, Path]) -> Optional[str]:
+    """Start of the day of a ``.../YYYYMMDD/vitals_history_{bed}.csv`` path.
+
+    The CSV files are per day (and so per patient); readers pass this as
+    ``since`` so an earlier case on the same bed is not mixed in.
+    """
+    try:
+        return datetime.strptime(Path(csv_path).parent.name, "%Y%m%d").strftime(TIMESTAMP_FORMAT)
+    except ValueError:
+        return None
+
+
+class VitalsStore:
+    """Long-format vitals history in SQLite (WAL).
+
+    The connection is shared between threads behind a lock, as in
+    :class:`ocr_cache.PersistentOCRCache`.  Each :meth:`insert` is one
+    transaction; other processes wait up to ``timeout`` seconds for the
+    write lock.
+    """
+
+    def __init__(self, path: Union[str, Path], timeout: float = 10.0) -> None:
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=timeout)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS vitals (
+                    ts TEXT NOT NULL,
+                    bed TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value
+                )"""
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS vitals_bed_ts ON vitals(bed, ts)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS vitals_bed_key_ts ON vitals(bed, key, ts)")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS latest (
+                    bed TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    ts TEXT NOT NULL,
+                    value,
+                    PRIMARY KEY (bed, key)
+                )"""
+            )
+
+    # ---------- 書き込み ----------
+    def insert(self, bed: Union[str, int], values: Mapping[str, Any], ts=None) -> int:
+        """Insert one wide row; returns the number of values stored.
+
+        ``ts`` defaults to ``values["timestamp"]`` and then to now.  Empty
+        cells are skipped, so the newest stored value of a key is its
+        forward-filled value.
+        """
+        return self.insert_many(bed, [values], ts=ts)
+
+    def insert_many(self, bed: Union[str, int], rows: Iterable[Mapping[str, Any]], ts=None) -> int:
+        bed = str(bed)
+        items: List[Tuple[str, str, str, Any]] = []
+        for row in rows:
+            row_ts = ts_text(ts if ts is not None else row.get("timestamp"))
+            for key, value in row.items():
+                if key == "timestamp":
+                    continue
+                value = encode_value(value)
+                if value is not None:
+                    items.append((row_ts, bed, str(key), value))
+        if not items:
+            return 0
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT INTO vitals(ts, bed, key, value) VALUES (?, ?, ?, ?)", items)
+            # 過去時刻の入力（輸液の時間帯記録など）で最新値を巻き戻さない
+            self._conn.executemany(
+                "INSERT INTO latest(ts, bed, key, value) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(bed, key) DO UPDATE SET ts=excluded.ts, value=excluded.value "
+                "WHERE excluded.ts >= latest.ts",
+                items,
+            )
+        return len(items)
+
+    # ---------- 読み出し ----------
+    def latest(self, bed: Union[str, int], keys: Optional[Iterable[str]] = None, since=None) -> Optional[Dict[str, Any]]:
+        """Newest value of every key plus the newest ``timestamp``.
+
+        Equivalent to forward-filling the wide CSV and taking its last row.
+        Keys whose newest value is older than ``since`` are left out.
+        Returns ``None`` when nothing has been stored for ``bed``.
+        """
+        sql = "SELECT key, ts, value FROM latest WHERE bed=?"
+        params: List[Any] = [str(bed)]
+        if since is not None:
+            sql += " AND ts>=?"
+            params.append(ts_text(since))
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        if not rows:
+            return None
+        wanted = set(keys) if keys is not None else None
+        out: Dict[str, Any] = {"timestamp": max(ts for _, ts, _ in rows)}
+        for key, _, value in rows:
+            if wanted is None or key in wanted:
+                out[key] = value
+        return out
+
+    def value_at(self, bed: Union[str, int], key: str, ts=None) -> Optional[Tuple[str, Any]]:
+        """``(ts, value)`` of the last ``key`` value at or before ``ts`` (newest if ``None``)."""
+        sql = "SELECT ts, value FROM vitals WHERE bed=? AND key=?"
+        params: List[Any] = [str(bed), key]
+        if ts is not None:
+            sql += " AND ts<=?"
+            params.append(ts_text(ts))
+        with self._lock:
+            return self._conn.execute(sql + " ORDER BY ts DESC, rowid DESC LIMIT 1", params).fetchone()
+
+    def series(self, bed: Union[str, int], key: str, start=None, end=None) -> List[Tuple[str, Any]]:
+        """``[(ts, value), ...]`` of ``key`` with ``start <= ts <= end``."""
+        sql = "SELECT ts, value FROM vitals WHERE bed=? AND key=?"
+        params: List[Any] = [str(bed), key]
+        if start is not None:
+            sql += " AND ts>=?"
+            params.append(ts_text(start))
+        if end is not None:
+            sql += " AND ts<=?"
+            params.append(ts_text(end))
+        with self._lock:
+            return self._conn.execute(sql + " ORDER BY ts, rowid", params).fetchall()
+
+    def window(self, bed: Union[str, int], start=None, end=None) -> List[Dict[str, Any]]:
+        """Wide rows (one per timestamp) with ``start <= ts <= end``."""
+        sql = "SELECT ts, key, value FROM vitals WHERE bed=?"
+        params: List[Any] = [str(bed)]
+        if start is not None:
+            sql += " AND ts>=?"
+            params.append(ts_text(start))
+        if end is not None:
+            sql += " AND ts<=?"
+            params.append(ts_text(end))
+        with self._lock:
+            items = self._conn.execute(sql + " ORDER BY ts, rowid", params).fetchall()
+        rows: List[Dict[str, Any]] = []
+        for ts, key, value in items:
+            if not rows or rows[-1]["timestamp"] != ts:
+                rows.append({"timestamp": ts})
+            rows[-1][key] = value
+        return rows
+
+    def beds(self) -> List[str]:
+        with self._lock:
+            return [r[0] for r in self._conn.execute("SELECT DISTINCT bed FROM latest ORDER BY bed")]
+
+    # ---------- CSV 互換 ----------
+    def export_csv(self, bed: Union[str, int], csv_path: Union[str, Path], start=None, end=None) -> int:
+        """Write the wide ``vitals_history`` layout; returns the number of rows."""
+        from vitals_csv import ALL_COLUMNS
+
+        rows = self.window(bed, start, end)
+        extra = [k for row in rows for k in row if k != "timestamp" and k not in ALL_COLUMNS]
+        fieldnames = ["timestamp"] + ALL_COLUMNS + list(dict.fromkeys(extra))
+        tmp_path = f"{csv_path}.tmp"
+        with open(tmp_path, "w", newline="", encoding="utf-8-sig") as f:
+            writer = csv.DictWriter(f, fieldnames=fieldnames)
+            writer.writeheader()
+            for row in rows:
+                writer.writerow({k: _csv_cell(v) for k, v in row.items()})
+        os.replace(tmp_path, csv_path)
+        return len(rows)
+
+    def import_csv(self, bed: Union[str, int], csv_path: Union[str, Path]) -> int:
+        """Load an existing wide CSV (e.g. to backfill); returns values stored."""
+        with open(csv_path, newline="", encoding="utf-8-sig") as f:
+            return self.insert_many(bed, csv.DictReader(f))
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def _csv_cell(value: Any) -> Any:
+    # 整数値の REAL は CSV では 120.0 ではなく 120 と書く
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+# ---------- プロセス内の既定ストア ----------
+_default_store: Optional[VitalsStore] = None
+_default_path: Optional[str] = None
+_configured = False
+
+
+def set_default_store(path: Union[str, Path, None]) -> Optional[VitalsStore]:
+    """Open the store that CSV writers mirror into; ``None`` turns mirroring off.
+
+    Either call overrides ``VITALS_DB`` for this process (``replay`` uses
+    ``None`` so archived frames never reach the live store).
+    """
+    global _default_store, _default_path, _configured
+    _configured = True
+    path = str(Path(path).expanduser()) if path else None
+    if path == _default_path:
+        return _default_store
+    if _default_store is not None:
+        _default_store.close()
+    _default_store = VitalsStore(path) if path else None
+    _default_path = path
+    return _default_store
+
+
+def default_store() -> Optional[VitalsStore]:
+    """The configured store, opened from ``VITALS_DB`` on first use."""
+    if not _configured and os.getenv("VITALS_DB"):
+        try:
+            set_default_store(os.environ["VITALS_DB"])
+        except Exception as e:
+            set_default_store(None)
+            print(f"[WARN] VITALS_DB を開けません: {e}")
+    return _default_store
+
+
+def mirror_row(csv_path: Union[str, Path], row: Mapping[str, Any]) -> None:
+    """Insert ``row`` written to ``csv_path`` into the default store, if any."""
+    store = default_store()
+    if store is None:
+        return
+    try:
+        store.insert(bed_for_path(csv_path), row)
+    except Exception as e:  # CSV が主記録なので失敗しても止めない
+        print(f"[WARN] VITALS_DB 書き込み失敗: {e}")
+
+
+def parse_args(argv=None):
+    ap = argparse.ArgumentParser(description="Import/export vitals between CSV and the SQLite store")
+    ap.add_argument("command", choices=["import", "export"])
+    ap.add_argument("csv_path")
+    ap.add_argument("--db", default=os.getenv("VITALS_DB"), required=not os.getenv("VITALS_DB"))
+    ap.add_argument("--bed", help="bed id (default: taken from vitals_history_{bed}.csv)")
+    ap.add_argument("--start")
+    ap.add_argument("--end")
+    return ap.parse_args(argv)
+
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
+    store = VitalsStore(args.db)
+    bed = args.bed or bed_for_path(args.csv_path)
+    try:
+        if args.command == "import":
+            n = store.import_csv(bed, args.csv_path)
+            print(f"[INFO] {args.csv_path} から {n} 件を取り込みました (bed {bed})")
+        else:
+            n = store.export_csv(bed, args.csv_path, args.start, args.end)
+            print(f"[INFO] {n} 行を {args.csv_path} に書き出しました (bed {bed})")
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,347 @@
+"""Asynchronous group-commit writer for the vitals CSV files.
+
+The panels run on the Tk thread, where a synchronous CSV write (and, for
+the drug and fluid panels, a rewrite of the whole file) freezes the UI on
+long cases.  With a :class:`VitalsWriteQueue` a panel only enqueues its row
+and returns.  A background thread collects the rows arriving within a
+short window and writes each file once per window, with one
+:func:`vitals_csv.write_rows` call and one ``fsync``, under the same
+cross-process lock as every other writer.
+
+A commit that fails (file locked by another program, disk full, ...) is
+not dropped: its rows are appended to ``<csv>.pending.jsonl`` next to the
+CSV and written ahead of the next commit to that file, or by the writer
+every ``retry_interval`` seconds.  Rows left there when the queue closes are
+picked up by the next queue that writes the file.
+
+Example::
+
+    with VitalsWriteQueue(window=0.05) as write_queue:
+        panel = DrugPanel(root, csv_path=path, write_queue=write_queue)
+        root.mainloop()
+    # ここで残りの行は書き込み済み
+"""
+from __future__ import annotations
+
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from vitals_csv import csv_write_lock, write_rows
+from vitals_store import mirror_row
+
+DEFAULT_WINDOW = 0.05
+SPOOL_SUFFIX = ".pending.jsonl"
+
+Item = Tuple[Dict[str, Any], bool]
+
+
+def spool_path(csv_path) -> str:
+    """File holding the rows of ``csv_path`` whose commit failed."""
+    return os.fspath(csv_path) + SPOOL_SUFFIX
+
+
+def _read_spool(csv_path) -> List[Item]:
+    items: List[Item] = []
+    try:
+        with open(spool_path(csv_path), encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # 書きかけの行（退避中のクラッシュ）は読み飛ばす
+                items.append((entry["row"], entry["carry_forward"]))
+    except FileNotFoundError:
+        pass
+    return items
+
+
+def _append_spool(csv_path, items: List[Item], fsync: bool) -> None:
+    lines = "".join(
+        json.dumps({"row": row, "carry_forward": carry_forward}, ensure_ascii=False, default=str) + "\n"
+        for row, carry_forward in items
+    )
+    with open(spool_path(csv_path), "a", encoding="utf-8") as f:
+        f.write(lines)
+        f.flush()
+        if fsync:
+            os.fsync(f.fileno())
+
+
+def _clear_spool(csv_path) -> None:
+    """Remove the spool of ``csv_path``, or empty it if it cannot be removed."""
+    try:
+        os.remove(spool_path(csv_path))
+    except FileNotFoundError:
+        pass
+    except OSError:
+        # 削除できなくても（Windows で開かれている等）中身を空にできれば足りる
+        with open(spool_path(csv_path), "w", encoding="utf-8"):
+            pass
+
+
+def _pct(values, q: float) -> float:
+    data = sorted(values)
+    return data[min(len(data) - 1, int(q * len(data)))] if data else 0.0
+
+
+class _Entry:
+    __slots__ = ("path", "row", "carry_forward", "enqueued")
+
+    def __init__(self, path: str, row: Mapping[str, Any], carry_forward: bool) -> None:
+        self.path = path
+        self.row = dict(row)
+        self.carry_forward = carry_forward
+        self.enqueued = time.monotonic()
+
+
+class VitalsWriteQueue:
+    """Queue CSV rows and commit them in groups from a background thread.
+
+    Parameters
+    ----------
+    window : float, default 0.05
+        Seconds a commit stays open for more rows after the first one.
+    max_batch : int, default 256
+        Rows per commit; a commit closes early when this many are waiting.
+    fsync : bool, default True
+        ``fsync`` every commit so an acknowledged commit survives a crash.
+    retry_interval : float, default 5.0
+        Seconds between attempts to write rows of failed commits while no
+        new rows arrive for their file.
+
+    The writer thread is a daemon so a forgotten queue never blocks exit, but
+    :meth:`close` also runs at interpreter exit and waits until everything
+    queued has been committed or spooled.
+    """
+
+    def __init__(
+        self,
+        window: float = DEFAULT_WINDOW,
+        max_batch: int = 256,
+        fsync: bool = True,
+        retry_interval: float = 5.0,
+    ) -> None:
+        self.window = window
+        self.max_batch = max_batch
+        self.fsync = fsync
+        self.retry_interval = retry_interval
+        self.counts = {
+            "submitted": 0,
+            "rows": 0,
+            "commits": 0,
+            "errors": 0,
+            "spooled": 0,
+            "lost": 0,
+            "depth_max": 0,
+        }
+        self.batch_sizes = deque(maxlen=10_000)
+        self.commit_latency = deque(maxlen=10_000)
+        self.write_time = deque(maxlen=10_000)
+        self._queue: "queue.Queue[Optional[_Entry]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._pending = 0
+        self._stopping = False
+        # 退避に失敗した行（メモリで保持）と、書き戻しを待つ行があるファイル
+        self._held: Dict[str, List[Item]] = {}
+        self._retry_paths: "OrderedDict[str, None]" = OrderedDict()
+        # 書き戻したが退避ファイルから消せなかった先頭の行数
+        self._spool_done: Dict[str, int] = {}
+        self._thread = threading.Thread(target=self._loop, name="vitals-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def __enter__(self) -> "VitalsWriteQueue":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def submit(self, csv_path, row: Mapping[str, Any], carry_forward: bool = True) -> None:
+        """Queue ``row`` for ``csv_path`` and return immediately.
+
+        ``carry_forward`` is ``True`` for vital rows built by
+        :func:`vitals_csv.vitals_row` and ``False`` for the drug and fluid
+        panels, whose rows hold only their own columns.
+        """
+        if self._stopping:
+            raise RuntimeError("VitalsWriteQueue is closed")
+        with self._lock:
+            self._pending += 1
+            self.counts["submitted"] += 1
+            self.counts["depth_max"] = max(self.counts["depth_max"], self._pending)
+        self._queue.put(_Entry(os.fspath(csv_path), row, carry_forward))
+
+    def depth(self) -> int:
+        """Rows submitted but not yet committed."""
+        with self._lock:
+            return self._pending
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every submitted row is committed or spooled; ``False`` on timeout."""
+        with self._idle:
+            return self._idle.wait_for(lambda: self._pending == 0, timeout)
+
+    def close(self) -> None:
+        """Commit what is queued, retry spooled rows once more, then stop the writer.
+
+        There is no timeout: returning earlier would drop the rows still
+        queued when the panel exits.
+        """
+        if not self._stopping:
+            self._stopping = True
+            self._queue.put(None)
+            atexit.unregister(self.close)
+        self._thread.join()
+
+    def _collect(self, first: _Entry) -> List[_Entry]:
+        entries = [first]
+        close_at = first.enqueued + self.window
+        while len(entries) < self.max_batch:
+            try:
+                entry = self._queue.get(timeout=max(0.0, close_at - time.monotonic()))
+            except queue.Empty:
+                break
+            if entry is None:
+                self._queue.put(None)  # 集めた分を書いてから止まる
+                break
+            entries.append(entry)
+        return entries
+
+    def _commit(self, path: str, items: List[Item]) -> bool:
+        """Write earlier failed rows of ``path`` and then ``items``; spool them on failure."""
+        held = self._held.pop(path, [])
+        t0 = time.perf_counter()
+        try:
+            with csv_write_lock(path):
+                spooled = _read_spool(path)
+                if len(spooled) < self._spool_done.get(path, 0):
+                    del self._spool_done[path]  # 退避ファイルが外で消された
+                written = spooled[self._spool_done.get(path, 0):] + held + items
+                write_rows(path, written, fsync=self.fsync)
+                if spooled:
+                    self._discard_spool(path, len(spooled))
+        except Exception as e:
+            print(f"[WARN] CSV書き込み失敗（{len(held) + len(items)} 行を退避して再試行）: {e}")
+            with self._lock:
+                self.counts["errors"] += 1
+            self._stash(path, held + items)
+            return False
+        elapsed = time.perf_counter() - t0
+        self._retry_paths.pop(path, None)
+        with self._lock:
+            self.counts["commits"] += 1
+            self.counts["rows"] += len(written)
+            self.batch_sizes.append(len(written))
+            self.write_time.append(elapsed)
+        for row, _ in written:
+            mirror_row(path, row)
+        return True
+
+    def _discard_spool(self, path: str, n: int) -> None:
+        # 書き込みは済んでいるので、ここで失敗しても行を退避し直さない
+        try:
+            _clear_spool(path)
+        except OSError as e:
+            print(f"[WARN] 退避ファイルを消せません（書き込み済みの {n} 行は再送しません）: {e}")
+            self._spool_done[path] = n
+        else:
+            self._spool_done.pop(path, None)
+
+    def _stash(self, path: str, items: List[Item]) -> None:
+        if not items:
+            self._retry_paths[path] = None
+            return
+        try:
+            _append_spool(path, items, self.fsync)
+        except Exception as e:
+            print(f"[WARN] 退避ファイルにも書けません（メモリに保持して再試行）: {e}")
+            self._held.setdefault(path, []).extend(items)
+        else:
+            with self._lock:
+                self.counts["spooled"] += len(items)
+        self._retry_paths[path] = None
+
+    def _retry(self) -> None:
+        for path in list(self._retry_paths):
+            self._commit(path, [])
+
+    def _stop(self) -> None:
+        self._retry()
+        lost = sum(len(items) for items in self._held.values())
+        if lost:
+            with self._lock:
+                self.counts["lost"] += lost
+            print(f"[ERROR] CSVにも退避ファイルにも書けなかった {lost} 行を破棄しました")
+        for path in self._retry_paths:
+            if os.path.exists(spool_path(path)):
+                print(f"[WARN] 未書き込みの行が {spool_path(path)} に残っています（次回の書き込み時に反映）")
+
+    def _loop(self) -> None:
+        while True:
+            try:
+                first = self._queue.get(timeout=self.retry_interval if self._retry_paths else None)
+            except queue.Empty:
+                self._retry()
+                continue
+            if first is None:
+                self._stop()
+                return
+            entries = self._collect(first)
+            by_path: "OrderedDict[str, List[_Entry]]" = OrderedDict()
+            for entry in entries:
+                by_path.setdefault(entry.path, []).append(entry)
+            for path, group in by_path.items():
+                self._commit(path, [(e.row, e.carry_forward) for e in group])
+                done = time.monotonic()
+                with self._lock:
+                    self.commit_latency.extend(done - e.enqueued for e in group)
+            with self._idle:
+                self._pending -= len(entries)
+                self._idle.notify_all()
+
+    def metrics(self) -> Dict[str, float]:
+        with self._lock:
+            sizes = list(self.batch_sizes)
+            return {
+                **self.counts,
+                "depth": self._pending,
+                "batch_mean": sum(sizes) / len(sizes) if sizes else 0.0,
+                "batch_max": max(sizes) if sizes else 0,
+                "latency_p50_ms": _pct(self.commit_latency, 0.5) * 1000,
+                "latency_p95_ms": _pct(self.commit_latency, 0.95) * 1000,
+                "write_p50_ms": _pct(self.write_time, 0.5) * 1000,
+                "write_p95_ms": _pct(self.write_time, 0.95) * 1000,
+            }
+
+    def summary(self) -> str:
+        m = self.metrics()
+        return (
+            f"{m['rows']} rows in {m['commits']} commits (mean {m['batch_mean']:.1f}/commit), "
+            f"depth {m['depth']} (max {m['depth_max']}), commit latency p50 {m['latency_p50_ms']:.1f} / "
+            f"p95 {m['latency_p95_ms']:.1f} ms, errors {m['errors']} (spooled {m['spooled']}, lost {m['lost']})"
+        )
+
+
+class WriteQueueMixin:
+    """Write-queue wiring shared by the panels that log to a vitals CSV.
+
+    ``write_queue`` stays ``None`` (synchronous writes) unless the panel is
+    given a :class:`VitalsWriteQueue`; the class default also covers panels
+    created without ``__init__`` in tests and benchmarks.
+    """
+
+    write_queue: Optional[VitalsWriteQueue] = None
+
+    def _queue_row(self, row: Mapping[str, Any], carry_forward: bool = True) -> bool:
+        """Queue ``row`` for ``self.csv_path``; ``False`` when the panel writes synchronously."""
+        if self.write_queue is None:
+            return False
+        self.write_queue.submit(self.csv_path, row, carry_forward=carry_forward)
+        return True